@@ -4,10 +4,14 @@ ASTRA Data Schemas Package
 This package contains shared Pydantic models used across all ASTRA services.
 """
 
-from .models import ContentEvent, DetectionRequest, DetectionResult, AnalyticsRecord
+from .models import (ContentEvent, EventLogEntry, EventLogBatch, JobInfo, DetectionRequest, DetectionResult,
+                     AnalyticsRecord)
 
 __all__ = [
     'ContentEvent',
+    'EventLogEntry',
+    'EventLogBatch',
+    'JobInfo',
     'DetectionRequest',
     'DetectionResult',
     'AnalyticsRecord'
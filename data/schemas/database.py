@@ -5,24 +5,117 @@ This module defines the database schema using SQLAlchemy ORM.
 All services use these models for persistent data storage.
 """
 
-from sqlalchemy import create_engine, Column, String, Float, DateTime, Text, Integer
+from sqlalchemy import (create_engine, event, inspect, literal_column, select, text, Column, String, Float,
+                        DateTime, Text, Integer, Index, LargeBinary)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from datetime import datetime
-from typing import Optional, Generator
+from sqlalchemy.orm import deferred, sessionmaker, Session
+from sqlalchemy.pool import QueuePool
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Generator
+import asyncio
+import hashlib
 import os
+import threading
+import time
+
+import fulltext
+import outbox
+import text_codec
+from text_codec import CompressedText
 
 Base = declarative_base()
 
+# Connection-level settings applied to every new SQLite connection. WAL lets
+# readers proceed while a writer commits, and synchronous=NORMAL only fsyncs
+# at checkpoints, which is safe in WAL mode. auto_vacuum only takes effect on
+# new databases (existing ones keep their mode until a full VACUUM); it lets
+# retention return freed pages to the filesystem (see retention.py).
+SQLITE_PRAGMAS = {
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,       # negative = KiB, i.e. 64 MB page cache
+    'mmap_size': 268435456,     # 256 MB memory-mapped I/O
+    'busy_timeout': int(os.getenv('ASTRA_DB_BUSY_TIMEOUT_MS', '5000')),  # ms to wait on a locked database
+    'temp_store': 'MEMORY',
+}
+
+# Rows per executemany() call for bulk inserts
+BULK_INSERT_CHUNK = 5000
+# content_events rows hashed per transaction when upgrading older databases
+HASH_BACKFILL_BATCH = 500
+
+# Connection pools: one serialized writer plus a pool of readers per database
+READER_POOL_SIZE = int(os.getenv('ASTRA_DB_READERS', '4'))
+# Separate query-only connections for long-lived streaming reads (NDJSON, exports)
+STREAM_POOL_SIZE = int(os.getenv('ASTRA_DB_STREAMS', '2'))
+POOL_TIMEOUT = float(os.getenv('ASTRA_DB_POOL_TIMEOUT', '30'))  # s to wait for a pooled connection
+# Prepared statements kept per connection by the sqlite3 driver
+STATEMENT_CACHE_SIZE = int(os.getenv('ASTRA_DB_STATEMENT_CACHE', '256'))
+# Pool waits longer than this count as contended in the lock-wait metrics
+CONTENDED_WAIT_SECONDS = 0.01
+
+
+def default_db_path() -> str:
+    """Database file used when none is given: ``ASTRA_DB_PATH`` or data/astra.db."""
+    workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    return os.getenv('ASTRA_DB_PATH') or os.path.join(workspace_root, 'data', 'astra.db')
+
+
+def compute_content_hash(text_value: str) -> str:
+    """
+    Compute the content-address used to deduplicate ingested text.
+
+    Surrounding whitespace is ignored so that the same body fetched from
+    different feeds (with or without a trailing newline) maps to one row.
+    """
+    return hashlib.sha256(text_value.strip().encode("utf-8")).hexdigest()
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Convert a timezone-aware datetime to naive UTC, the form timestamps are stored in.
+
+    Query parameters like ``since=2026-10-18T00:00:00Z`` arrive timezone-aware
+    and cannot be compared with stored (naive) timestamps; naive values and
+    None are returned unchanged.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class TimeRange(NamedTuple):
+    """A ``since``/``until`` filter in naive UTC."""
+    since: Optional[datetime]
+    until: Optional[datetime]
+
+
+def time_range(since: Optional[datetime] = None, until: Optional[datetime] = None) -> TimeRange:
+    """
+    Read the ``since``/``until`` query parameters as naive UTC.
+
+    Used as a FastAPI dependency (``Depends(time_range)``) by every endpoint
+    that filters on timestamps, so ``...+02:00`` and ``...Z`` select the same
+    rows everywhere.
+    """
+    return TimeRange(to_naive_utc(since), to_naive_utc(until))
+
 
 class ContentEventDB(Base):
     """Database model for ingested content events."""
     
     __tablename__ = 'content_events'
+    # Keyset pagination orders by (timestamp, id)
+    __table_args__ = (Index('ix_content_events_timestamp_id', 'timestamp', 'id'),)
     
     id = Column(String(36), primary_key=True)
     source = Column(String(100), nullable=False, index=True)
-    text = Column(Text, nullable=False)
+    # Optionally compressed (see text_codec); deferred so ORM queries only
+    # load and decompress the body when it is actually accessed
+    text = deferred(Column(CompressedText, nullable=False))
+    content_hash = Column(String(64), unique=True, index=True)  # SHA-256 of text, see compute_content_hash
     metadata_json = Column(Text)  # JSON string for flexible metadata
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
@@ -30,22 +123,163 @@ class ContentEventDB(Base):
         return f"<ContentEvent(id={self.id}, source={self.source})>"
 
 
+class ContentSightingDB(Base):
+    """Database model for repeated sightings of already-stored content."""
+    
+    __tablename__ = 'content_sightings'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(String(36), nullable=False, index=True)  # Canonical content_events.id
+    content_hash = Column(String(64), nullable=False, index=True)
+    source = Column(String(100), nullable=False, index=True)
+    metadata_json = Column(Text)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<ContentSighting(event_id={self.event_id}, source={self.source})>"
+
+
+class CompressionDictionaryDB(Base):
+    """Shared zlib preset dictionaries used by compressed text columns."""
+    
+    __tablename__ = 'compression_dictionaries'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dictionary = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CompressionDictionary(id={self.id}, size={len(self.dictionary or b'')})>"
+
+
+class EventLogDB(Base):
+    """Append-only log of stored content events with monotonically increasing sequence numbers."""
+    
+    __tablename__ = 'event_log'
+    # AUTOINCREMENT guarantees sequence numbers are never reused, even after deletes
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(String(36), nullable=False, index=True)
+    source = Column(String(100))
+    appended_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<EventLog(seq={self.seq}, event_id={self.event_id})>"
+
+
+class ContentOutboxDB(Base):
+    """Change-data-capture outbox: one entry per inserted content event, written by a trigger (see outbox.py)."""
+    
+    __tablename__ = 'content_outbox'
+    # AUTOINCREMENT: sequence numbers are never reused and survive VACUUM
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(String(36), nullable=False)
+    created_at = Column(DateTime, index=True)
+    
+    def __repr__(self):
+        return f"<ContentOutbox(seq={self.seq}, event_id={self.event_id})>"
+
+
+class ConsumerOffsetDB(Base):
+    """Committed event-log position of a named consumer group."""
+    
+    __tablename__ = 'consumer_offsets'
+    
+    consumer_group = Column(String(100), primary_key=True)
+    committed_seq = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ConsumerOffset(group={self.consumer_group}, seq={self.committed_seq})>"
+
+
+class JobDB(Base):
+    """Database model for background jobs (see job_queue.py)."""
+    
+    __tablename__ = 'jobs'
+    __table_args__ = (Index('ix_jobs_claim', 'status', 'run_after'),)
+    
+    id = Column(String(36), primary_key=True)
+    kind = Column(String(100), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    payload_json = Column(Text)
+    result_json = Column(Text)
+    checkpoint_json = Column(Text)  # Handler state for resuming after a crash or retry
+    progress = Column(Float)  # 0.0-1.0 when the total is known
+    progress_message = Column(String(500))
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)  # Not claimable before this time (backoff)
+    lease_expires_at = Column(DateTime)  # Visibility timeout of the current claim
+    worker_id = Column(String(100))
+    cancel_requested = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status})>"
+
+
 class DetectionResultDB(Base):
     """Database model for detection results."""
     
     __tablename__ = 'detection_results'
+    # Reuse lookups: the stored result for a text under a given detector version
+    __table_args__ = (Index('ix_detection_results_hash_version', 'content_hash', 'detector_version'),)
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     event_id = Column(String(36), index=True)
     label = Column(String(50), nullable=False, index=True)
     confidence = Column(Float, nullable=False)
     detector_type = Column(String(50))
+    detector_version = Column(String(100))
+    content_hash = Column(String(64))  # compute_content_hash of the analyzed text
+    metadata_json = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f"<DetectionResult(event_id={self.event_id}, label={self.label}, confidence={self.confidence})>"
 
 
+class DetectionSignatureDB(Base):
+    """MinHash signature of a text whose detection result near-duplicates inherit (see minhash.py)."""
+    
+    __tablename__ = 'detection_signatures'
+    
+    detector_version = Column(String(100), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)  # representative text, stored in detection_results
+    signature = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<DetectionSignature(version={self.detector_version}, content_hash={self.content_hash})>"
+
+
+class EmbeddingDB(Base):
+    """Row of a text's vector in an embedding matrix file (see embeddings.py)."""
+    
+    __tablename__ = 'embeddings'
+    __table_args__ = (
+        Index('ix_embeddings_model_row', 'model', 'matrix_row', unique=True),
+        Index('ix_embeddings_model_event', 'model', 'event_id'),
+    )
+    
+    model = Column(String(200), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)  # compute_content_hash of the embedded text
+    matrix_row = Column(Integer, nullable=False)
+    event_id = Column(String(36))  # first content event with this text, if any
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Embedding(model={self.model}, row={self.matrix_row}, event_id={self.event_id})>"
+
+
 class AnalyticsRecordDB(Base):
     """Database model for analytics records."""
     
@@ -63,60 +297,555 @@ class AnalyticsRecordDB(Base):
         return f"<AnalyticsRecord(event_id={self.event_id}, label={self.detection_label})>"
 
 
+class AnalyticsAggregateDB(Base):
+    """
+    Running totals over ``analytics_records`` for dashboard stats.
+    
+    One row per (dimension, key): dimension is ``total`` (key ``''``),
+    ``label`` or ``source``. Updated in the same transaction as every insert.
+    """
+    
+    __tablename__ = 'analytics_aggregates'
+    
+    dimension = Column(String(20), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AnalyticsAggregate({self.dimension}={self.key!r}, count={self.count})>"
+
+
+class AnalyticsRollupDB(Base):
+    """
+    Time-bucketed analytics counts per (resolution, bucket, label, source).
+    
+    Resolutions are ``minute``, ``hour`` and ``day``; all three are updated in
+    the insert transaction and finer ones are pruned past their retention.
+    ``hist_0``..``hist_9`` count confidences in ten 0.1-wide bins.
+    """
+    
+    __tablename__ = 'analytics_rollups'
+    __table_args__ = (
+        Index('ix_analytics_rollups_bucket', 'resolution', 'bucket_start'),
+    )
+    
+    resolution = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    label = Column(String(50), primary_key=True)
+    source = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    hist_0 = Column(Integer, nullable=False, default=0)
+    hist_1 = Column(Integer, nullable=False, default=0)
+    hist_2 = Column(Integer, nullable=False, default=0)
+    hist_3 = Column(Integer, nullable=False, default=0)
+    hist_4 = Column(Integer, nullable=False, default=0)
+    hist_5 = Column(Integer, nullable=False, default=0)
+    hist_6 = Column(Integer, nullable=False, default=0)
+    hist_7 = Column(Integer, nullable=False, default=0)
+    hist_8 = Column(Integer, nullable=False, default=0)
+    hist_9 = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<AnalyticsRollup({self.resolution} {self.bucket_start} {self.label}/{self.source}: {self.count})>"
+
+
+class AnalyticsSketchDB(Base):
+    """
+    Serialized streaming sketches per (resolution, bucket, label).
+    
+    Holds HyperLogLog sketches of distinct sources and event ids and a KLL
+    sketch of confidences (see ``sketches.py``); buckets merge into any range.
+    """
+    
+    __tablename__ = 'analytics_sketches'
+    
+    resolution = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    label = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    sources_hll = Column(LargeBinary, nullable=False)
+    events_hll = Column(LargeBinary, nullable=False)
+    confidence_kll = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AnalyticsSketch({self.resolution} {self.bucket_start} {self.label}: {self.count})>"
+
+
+class SyncStateDB(Base):
+    """Named high-water marks for incremental synchronization between services."""
+    
+    __tablename__ = 'sync_state'
+    
+    name = Column(String(100), primary_key=True)
+    value = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SyncState(name={self.name}, value={self.value})>"
+
+
 class DatabaseManager:
     """
-    Singleton database manager for ASTRA.
+    Database manager for ASTRA, one instance per database file.
+    
+    Each instance owns two engines on the same SQLite file:
     
-    Provides centralized database connection and session management.
+    - ``engine``: the writer, a single connection that serializes all writes
+      in the process. Transactions start with ``BEGIN IMMEDIATE`` so the
+      database write lock is taken up front (waiting up to ``busy_timeout``)
+      instead of failing on a lock upgrade half-way through.
+    - ``reader``: a pool of ``ASTRA_DB_READERS`` read-only connections. In
+      WAL mode readers never block the writer or each other.
+    - ``streamer``: ``ASTRA_DB_STREAMS`` more read-only connections for
+      streaming responses, which hold a connection for as long as the client
+      keeps reading; slow clients wait for each other here instead of taking
+      the connections ``run_read`` needs.
+    
+    Async code reaches them through ``run_write`` / ``run_read``, which run a
+    blocking function on a dedicated writer thread or on one of
+    ``ASTRA_DB_READERS`` reader threads and return an awaitable future, so the
+    event loop keeps serving other requests while SQLite works.
+    
+    ``DatabaseManager()`` returns the process default database (the first
+    one opened, or the one passed to ``set_default``); ``DatabaseManager(db_path)``
+    returns the manager for that file.
     """
     
-    _instance: Optional['DatabaseManager'] = None
-    _engine = None
-    _SessionLocal = None
+    _instances: Dict[str, 'DatabaseManager'] = {}
+    _default: Optional['DatabaseManager'] = None
+    _lock = threading.Lock()
     
     def __new__(cls, db_path: Optional[str] = None):
-        if cls._instance is None:
-            cls._instance = super(DatabaseManager, cls).__new__(cls)
-        return cls._instance
+        with cls._lock:
+            if db_path is None and cls._default is not None:
+                return cls._default
+            key = os.path.abspath(db_path or default_db_path())
+            if key not in cls._instances:
+                instance = super(DatabaseManager, cls).__new__(cls)
+                instance._initialized = False
+                cls._instances[key] = instance
+            if cls._default is None:
+                cls._default = cls._instances[key]
+            return cls._instances[key]
     
     def __init__(self, db_path: Optional[str] = None):
-        if self._engine is None:
-            if db_path is None:
-                # Default to workspace data directory
-                workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-                db_path = os.path.join(workspace_root, 'data', 'astra.db')
+        with self._lock:
+            if self._initialized:
+                return
+            self.db_path = os.path.abspath(db_path or default_db_path())
             
             # Ensure directory exists
-            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            
+            self.lock_metrics = {"writer": PoolWaitStats(), "reader": PoolWaitStats(), "streamer": PoolWaitStats(),
+                                 "busy": PoolWaitStats()}
+            self._busy_errors = 0
             
-            # Create engine
+            # Writer: one connection, so writes in this process queue in the pool
             self._engine = create_engine(
-                f'sqlite:///{db_path}',
+                f'sqlite:///{self.db_path}',
                 echo=False,  # Set to True for SQL debugging
-                connect_args={'check_same_thread': False}  # Allow multi-threading
+                poolclass=_TimedQueuePool,
+                pool_size=1,
+                max_overflow=0,
+                pool_timeout=POOL_TIMEOUT,
+                connect_args=_connect_args(),
             )
+            self._engine.pool.wait_stats = self.lock_metrics["writer"]
+            self.write_executor = DBExecutor("astra-db-writer", 1)
+            event.listen(self._engine, 'connect', _apply_sqlite_pragmas)
+            event.listen(self._engine, 'connect', _register_sql_functions)
+            event.listen(self._engine, 'connect', _disable_driver_transactions)
+            event.listen(self._engine, 'begin', self._begin_immediate)
+            event.listen(self._engine, 'handle_error', self._count_busy_error)
             
-            # Create session factory
+            # Readers: a pool of query-only connections, plus one for streaming reads
+            self._reader = self._query_only_engine(READER_POOL_SIZE, self.lock_metrics["reader"])
+            self.read_executor = DBExecutor("astra-db-reader", READER_POOL_SIZE)
+            self._streamer = self._query_only_engine(STREAM_POOL_SIZE, self.lock_metrics["streamer"])
+            
+            # Create session factories
             self._SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self._engine)
+            self._ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self._reader)
             
             # Create tables
             Base.metadata.create_all(bind=self._engine)
+            self._upgrade_schema()
+            self._setup_text_compression()
+            self._backfill_content_hashes()
+            self._setup_fulltext()
+            self._setup_outbox()
+            self._initialized = True
+    
+    def _query_only_engine(self, pool_size: int, wait_stats: 'PoolWaitStats'):
+        engine = create_engine(
+            f'sqlite:///{self.db_path}',
+            echo=False,
+            poolclass=_TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=0,
+            pool_timeout=POOL_TIMEOUT,
+            connect_args=_connect_args(),
+        )
+        engine.pool.wait_stats = wait_stats
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+        event.listen(engine, 'connect', _register_sql_functions)
+        event.listen(engine, 'connect', _make_query_only)
+        event.listen(engine, 'handle_error', self._count_busy_error)
+        return engine
+    
+    @classmethod
+    def set_default(cls, db_path: Optional[str] = None) -> 'DatabaseManager':
+        """
+        Make ``db_path`` the database returned by ``DatabaseManager()`` in this process.
+        
+        Services call this at startup with their ``*_DB_PATH`` setting before
+        any store is created.
+        """
+        manager = cls(db_path or default_db_path())
+        with cls._lock:
+            cls._default = manager
+        text_codec.set_dictionary_loader(manager.load_compression_dictionary)
+        return manager
+    
+    def _begin_immediate(self, conn):
+        """Start writer transactions with the write lock held, timing the wait for it."""
+        started = time.perf_counter()
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        self.lock_metrics["busy"].record(time.perf_counter() - started)
+    
+    async def run_write(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking function that writes on the dedicated writer thread.
+        
+        Writes from all coroutines queue here instead of blocking the event
+        loop while they wait for the single writer connection.
+        """
+        return await self.write_executor.run(fn, *args, **kwargs)
+    
+    async def run_read(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking function that only reads on one of the reader threads."""
+        return await self.read_executor.run(fn, *args, **kwargs)
+    
+    def _count_busy_error(self, context):
+        if "database is locked" in str(context.original_exception):
+            self._busy_errors += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Lock-wait metrics.
+        
+        ``writer`` / ``reader`` / ``streamer``: waits for a pooled connection
+        (in-process contention). ``busy``: time ``BEGIN IMMEDIATE`` waited for
+        the database write lock (contention with other processes).
+        ``executors``: queueing of ``run_write`` / ``run_read`` calls.
+        """
+        return {
+            "db_path": self.db_path,
+            "reader_pool_size": READER_POOL_SIZE,
+            "writer": {**self.lock_metrics["writer"].snapshot(), "checked_out": self._engine.pool.checkedout()},
+            "reader": {**self.lock_metrics["reader"].snapshot(), "checked_out": self._reader.pool.checkedout()},
+            "streamer": {**self.lock_metrics["streamer"].snapshot(), "pool_size": STREAM_POOL_SIZE,
+                         "checked_out": self._streamer.pool.checkedout()},
+            "busy": self.lock_metrics["busy"].snapshot(),
+            "busy_errors": self._busy_errors,
+            "executors": {"writer": self.write_executor.snapshot(), "reader": self.read_executor.snapshot()},
+        }
+    
+    def _upgrade_schema(self):
+        """
+        Bring databases created by older versions up to the current models.
+        
+        ``create_all`` only creates missing tables, so new columns are added
+        with ``ALTER TABLE`` and new indexes are created if absent.
+        """
+        with self._engine.begin() as conn:
+            inspector = inspect(conn)
+            for table in Base.metadata.sorted_tables:
+                existing = {col['name'] for col in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        col_type = column.type.compile(dialect=self._engine.dialect)
+                        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+    
+    def _backfill_content_hashes(self):
+        """
+        Fill ``content_events.content_hash`` for rows stored before deduplication.
+        
+        Rows are hashed in batches of HASH_BACKFILL_BATCH, each in its own
+        short transaction. When the same text was stored more than once, the
+        first stored copy becomes the canonical row that new copies are
+        deduplicated against; the later copies keep a NULL hash (the column
+        is unique) and are left as they are.
+        """
+        table = ContentEventDB.__table__
+        rowid = literal_column('content_events.rowid')
+        filled = 0
+        last_rowid = 0
+        while True:
+            with self._engine.begin() as conn:
+                rows = conn.execute(
+                    select(rowid, table.c.text)
+                    .where(table.c.content_hash.is_(None), rowid > last_rowid)
+                    .order_by(rowid)
+                    .limit(HASH_BACKFILL_BATCH)
+                ).all()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                first_rows: Dict[str, int] = {}
+                for row_id, body in rows:
+                    first_rows.setdefault(compute_content_hash(body or ""), row_id)
+                taken = set(conn.execute(
+                    select(table.c.content_hash).where(table.c.content_hash.in_(list(first_rows)))
+                ).scalars())
+                updates = [{"row_id": row_id, "content_hash": content_hash}
+                           for content_hash, row_id in first_rows.items() if content_hash not in taken]
+                if updates:
+                    conn.execute(text('UPDATE content_events SET content_hash = :content_hash WHERE rowid = :row_id'),
+                                 updates)
+                filled += len(updates)
+        if filled:
+            print(f"[DatabaseManager] Backfilled content_hash for {filled} existing content events")
+    
+    def _setup_text_compression(self):
+        """Let the text codec resolve shared dictionaries from this database."""
+        if DatabaseManager._default is self:
+            text_codec.set_dictionary_loader(self.load_compression_dictionary)
+        if text_codec.settings()["mode"] == text_codec.MODE_DICT and not text_codec.settings()["dictionary_id"]:
+            newest = self.latest_compression_dictionary_id()
+            if newest:
+                text_codec.configure(dictionary_id=newest)
+    
+    def _setup_fulltext(self):
+        """Create the FTS5 index over content_events (backfilled on first run)."""
+        with self._engine.begin() as conn:
+            if fulltext.install(conn):
+                print("[DatabaseManager] Built full-text index over content_events")
+    
+    def _setup_outbox(self):
+        """Create the trigger that feeds content_outbox from content_events inserts."""
+        with self._engine.begin() as conn:
+            outbox.install(conn)
+    
+    def latest_compression_dictionary_id(self) -> Optional[int]:
+        """Id of the most recently trained compression dictionary, if any."""
+        with self._reader.connect() as conn:
+            return conn.execute(select(CompressionDictionaryDB.id)
+                                .order_by(CompressionDictionaryDB.id.desc())).scalar()
+    
+    def load_compression_dictionary(self, dictionary_id: int) -> Optional[bytes]:
+        """Fetch a shared compression dictionary by id."""
+        # Reader pool: this runs inside writer transactions (astra_text() in triggers)
+        with self._reader.connect() as conn:
+            return conn.execute(select(CompressionDictionaryDB.dictionary)
+                                .where(CompressionDictionaryDB.id == dictionary_id)).scalar()
+    
+    def save_compression_dictionary(self, dictionary: bytes, sample_count: int) -> int:
+        """Store a trained dictionary and register it with the codec; returns its id."""
+        with self._engine.begin() as conn:
+            dictionary_id = conn.execute(
+                CompressionDictionaryDB.__table__.insert().values(
+                    dictionary=dictionary, sample_count=sample_count, created_at=datetime.utcnow()
+                )
+            ).inserted_primary_key[0]
+        text_codec.register_dictionary(dictionary_id, dictionary)
+        return dictionary_id
     
     @property
     def engine(self):
+        """Writer engine (single serialized connection); use for anything that writes."""
         return self._engine
     
-    def get_session(self) -> Session:
-        """Get a new database session."""
+    @property
+    def reader(self):
+        """Reader engine (pool of query-only connections); use for reads."""
+        return self._reader
+    
+    @property
+    def streamer(self):
+        """Query-only engine for streaming reads that hold a connection while a client reads."""
+        return self._streamer
+    
+    def dispose(self):
+        """Stop the executor threads and close all pooled connections of every engine."""
+        self.write_executor.shutdown()
+        self.read_executor.shutdown()
+        self._engine.dispose()
+        self._reader.dispose()
+        self._streamer.dispose()
+    
+    def get_session(self, readonly: bool = False) -> Session:
+        """Get a new database session (``readonly`` binds it to the reader pool)."""
         if self._SessionLocal is None:
             raise RuntimeError("DatabaseManager not initialized")
-        return self._SessionLocal()
+        return self._ReadSessionLocal() if readonly else self._SessionLocal()
     
     def close_session(self, session: Session):
         """Close a database session."""
         session.close()
 
 
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS to a freshly opened DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def _connect_args() -> Dict[str, Any]:
+    return {
+        'check_same_thread': False,  # Allow multi-threading
+        'cached_statements': STATEMENT_CACHE_SIZE,
+    }
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    """Let SQLAlchemy emit BEGIN itself (see ``DatabaseManager._begin_immediate``)."""
+    dbapi_connection.isolation_level = None
+
+
+def _make_query_only(dbapi_connection, connection_record):
+    """Reader connections reject writes, so a misrouted write fails loudly."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA query_only=1')
+    finally:
+        cursor.close()
+
+
+class PoolWaitStats:
+    """Thread-safe counters for time spent waiting on a connection or lock."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.contended = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > CONTENDED_WAIT_SECONDS:
+                self.contended += 1
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "acquisitions": self.count,
+                "contended": self.contended,
+                "total_wait_ms": round(self.total_seconds * 1000, 3),
+                "avg_wait_ms": round(self.total_seconds * 1000 / self.count, 3) if self.count else 0.0,
+                "max_wait_ms": round(self.max_seconds * 1000, 3),
+            }
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+    
+    wait_stats: Optional[PoolWaitStats] = None
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        connection = super()._do_get()
+        if self.wait_stats is not None:
+            self.wait_stats.record(time.perf_counter() - started)
+        return connection
+    
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class DBExecutor:
+    """
+    Fixed set of named threads that run blocking database calls.
+    
+    ``submit`` returns a ``concurrent.futures.Future``; ``run`` awaits the
+    same call from a coroutine. Threads are started on first use and again
+    after ``shutdown``.
+    """
+    
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.queue_wait = PoolWaitStats()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+    
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` and return a future for its result."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            self._pending += 1
+            return self._pool.submit(self._call, time.perf_counter(), fn, args, kwargs)
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` on this executor and await the result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+    
+    def _call(self, queued_at: float, fn: Callable[..., Any], args, kwargs) -> Any:
+        self.queue_wait.record(time.perf_counter() - queued_at)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+    
+    def shutdown(self):
+        """Wait for queued calls to finish and stop the threads."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "threads": self.workers,
+            "pending": self._pending,
+            "completed": self._completed,
+            "queue_wait": self.queue_wait.snapshot(),
+        }
+
+
+def _register_sql_functions(dbapi_connection, connection_record):
+    """Register the SQL functions used by views and triggers (see fulltext.py)."""
+    fulltext.register_functions(dbapi_connection)
+
+
+def insert_chunked(conn, table, rows: List[Dict[str, Any]], chunk_size: int = BULK_INSERT_CHUNK) -> int:
+    """
+    Insert rows with Core ``executemany`` in chunks on an open connection.
+    
+    The caller owns the transaction, so all chunks commit (or roll back)
+    together. Chunking only bounds the size of each parameter list.
+    
+    Returns:
+        Number of rows inserted
+    """
+    for start in range(0, len(rows), chunk_size):
+        conn.execute(table.insert(), rows[start:start + chunk_size])
+    return len(rows)
+
+
 def get_db_session() -> Generator[Session, None, None]:
     """
     Dependency function to get database session.
@@ -0,0 +1,330 @@
+"""
+Shared store of text embeddings, computed once per text and model.
+
+The vectors of one embedding model are kept in an append-only matrix file of
+float16 rows, ``<db root>-embeddings/<model>.f16`` next to the database (or
+in ``ASTRA_EMBEDDINGS_DIR``): a 16-byte header (magic, format version,
+dimension) followed by one ``dim * 2``-byte row per distinct text. The
+``embeddings`` table maps (model, content hash) to the row number and to the
+first content event with that text, so vectors are found by text or by event
+id without scanning the matrix. At 384 dimensions a vector takes 768 bytes.
+
+Appends run in a database write transaction: the next row number comes from
+the table, the vectors are written and fsynced, then the index rows commit.
+SQLite's write lock thereby serializes appenders across processes, and rows
+of a transaction that never committed are simply overwritten by the next
+append. Readers only see rows whose index entry committed.
+
+`EmbeddingStore.embed` is the entry point for consumers: it returns the
+stored vectors of texts seen before and encodes only the others (once per
+distinct text), appending them for everyone else. Vectors are never expired;
+they are addressed by content, not by event.
+
+Configuration (environment):
+    ASTRA_EMBEDDINGS_DIR   directory of the matrix files (default: <db root>-embeddings)
+"""
+import asyncio
+import os
+import re
+import struct
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from sqlalchemy import func, select, text, update
+
+from database import DatabaseManager, EmbeddingDB, compute_content_hash, insert_chunked
+
+MAGIC = b"ASTRAEMB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, format version, dimension
+EMBEDDINGS_DIR = os.getenv("ASTRA_EMBEDDINGS_DIR")
+
+# Keep IN (...) lookups well below SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+# Encodes a list of texts into a (len(texts), dim) array
+Encoder = Callable[[List[str]], Any]
+
+
+def default_directory(db_path: str) -> str:
+    """Matrix directory of a database file: ``<root>-embeddings`` next to it."""
+    return os.path.splitext(db_path)[0] + "-embeddings"
+
+
+def model_filename(model: str) -> str:
+    """Matrix file name of a model id (e.g. ``sentence-transformers_all-MiniLM-L6-v2.f16``)."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model) + ".f16"
+
+
+class EmbeddingStore:
+    """Append-only float16 embedding matrix of one model, indexed by content hash and event id."""
+
+    def __init__(self, model: str, db_manager: Optional[DatabaseManager] = None, directory: Optional[str] = None):
+        """
+        Args:
+            model: Embedding model id; vectors of different models never mix
+            db_manager: Database holding the ``embeddings`` index (default: process default)
+            directory: Directory of the matrix file (default: ``ASTRA_EMBEDDINGS_DIR`` or next to the database)
+        """
+        if np is None:
+            raise RuntimeError("numpy not installed. Run: pip install numpy")
+        self.model = model
+        self.db_manager = db_manager or DatabaseManager()
+        self.directory = directory or EMBEDDINGS_DIR or default_directory(self.db_manager.db_path)
+        self.path = os.path.join(self.directory, model_filename(model))
+        self._dim = self._read_header()
+        self._handle = None
+        self._handle_lock = threading.Lock()
+        self._lookups = 0
+        self._hits = 0
+        self._encoded = 0
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Vector dimension (None until the first vector is stored)."""
+        if self._dim is None:
+            self._dim = self._read_header()
+        return self._dim
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * 2
+
+    def _read_header(self) -> Optional[int]:
+        try:
+            with open(self.path, "rb") as handle:
+                header = handle.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(header) < HEADER.size:
+            return None
+        magic, version, dim = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not an embedding matrix file (format {FORMAT_VERSION}): {self.path}")
+        return dim
+
+    def _read_rows(self, rows: Sequence[int]):
+        """Vectors at the given matrix rows, as a (len(rows), dim) float16 array."""
+        matrix = np.empty((len(rows), self.dim or 0), dtype=np.float16)
+        if not rows:
+            return matrix
+        with self._handle_lock:
+            if self._handle is None:
+                self._handle = open(self.path, "rb")
+            for index, row in enumerate(rows):
+                self._handle.seek(HEADER.size + row * self.row_bytes)
+                matrix[index] = np.frombuffer(self._handle.read(self.row_bytes), dtype="<f2")
+        return matrix
+
+    def _index_rows(self, conn, column, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            rows = conn.execute(
+                select(EmbeddingDB.__table__).where(EmbeddingDB.model == self.model,
+                                                    column.in_(keys[start:start + LOOKUP_CHUNK]))
+            ).all()
+            for row in rows:
+                found[getattr(row, column.key)] = row
+        return found
+
+    def _lookup(self, column, keys: List[str]) -> Dict[str, tuple]:
+        """key -> (event id, vector) of the stored keys."""
+        with self.db_manager.reader.connect() as conn:
+            found = self._index_rows(conn, column, keys)
+        vectors = self._read_rows([row.matrix_row for row in found.values()])
+        return {key: (row.event_id, vector) for (key, row), vector in zip(found.items(), vectors)}
+
+    async def _find(self, column, keys: List[str]) -> Dict[str, tuple]:
+        keys = list(dict.fromkeys(keys))
+        return await self.db_manager.run_read(self._lookup, column, keys) if keys else {}
+
+    async def lookup(self, content_hashes: List[str]) -> Dict[str, Any]:
+        """
+        Stored vectors of texts.
+
+        Args:
+            content_hashes: ``compute_content_hash`` of each text
+
+        Returns:
+            content hash -> float16 vector, for the hashes that have one
+        """
+        found = await self._find(EmbeddingDB.content_hash, content_hashes)
+        return {key: vector for key, (_, vector) in found.items()}
+
+    async def lookup_events(self, event_ids: List[str]) -> Dict[str, Any]:
+        """
+        Stored vectors of content events.
+
+        Returns:
+            event id -> float16 vector, for the events whose text was embedded
+        """
+        found = await self._find(EmbeddingDB.event_id, event_ids)
+        return {key: vector for key, (_, vector) in found.items()}
+
+    def _linked_after(self, after: int, limit: int) -> Tuple[Dict[str, Any], int]:
+        with self.db_manager.reader.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT rowid, event_id, matrix_row FROM embeddings
+                    WHERE model = :model AND rowid > :after ORDER BY rowid LIMIT :limit
+                """),
+                {"model": self.model, "after": after, "limit": limit},
+            ).all()
+        linked = [row for row in rows if row.event_id is not None]
+        vectors = self._read_rows([row.matrix_row for row in linked])
+        return {row.event_id: vector for row, vector in zip(linked, vectors)}, rows[-1].rowid if rows else after
+
+    async def events_after(self, after: int, limit: int = 1000) -> Tuple[Dict[str, Any], int]:
+        """
+        Vectors appended after index rowid ``after``, for tailing the store.
+
+        Rowids grow with every commit to the index, so passing back the
+        returned rowid yields each new vector once. Vectors linked to an
+        event later (see ``embed``) keep their rowid and are not returned.
+
+        Returns:
+            (event id -> vector for new vectors linked to an event, last rowid read)
+        """
+        return await self.db_manager.run_read(self._linked_after, after, limit)
+
+    def last_rowid(self) -> int:
+        """Rowid to start ``events_after`` from to see only vectors appended from now on."""
+        with self.db_manager.reader.connect() as conn:
+            return conn.execute(text("SELECT COALESCE(MAX(rowid), 0) FROM embeddings")).scalar()
+
+    def _append(self, entries: List[tuple]) -> int:
+        """Append (content hash, event id, vector) entries whose text has no row yet."""
+        with self.db_manager.engine.begin() as conn:
+            existing = self._index_rows(conn, EmbeddingDB.content_hash, [entry[0] for entry in entries])
+            # Texts embedded before without an event (e.g. by detection) adopt the event
+            for content_hash, event_id, _ in entries:
+                row = existing.get(content_hash)
+                if event_id and row is not None and row.event_id is None:
+                    conn.execute(
+                        update(EmbeddingDB.__table__)
+                        .where(EmbeddingDB.model == self.model, EmbeddingDB.content_hash == content_hash)
+                        .values(event_id=event_id)
+                    )
+            new = {}
+            for content_hash, event_id, vector in entries:
+                if vector is not None and content_hash not in existing and content_hash not in new:
+                    new[content_hash] = (event_id, vector)
+            if not new:
+                return 0
+
+            matrix = np.asarray([vector for _, vector in new.values()], dtype="<f2")
+            if self.dim is not None and matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match "
+                                 f"{self.dim} of {self.path}")
+            first = conn.execute(
+                select(func.coalesce(func.max(EmbeddingDB.matrix_row) + 1, 0)).where(EmbeddingDB.model == self.model)
+            ).scalar()
+            self._write_rows(first, matrix)
+            now = datetime.utcnow()
+            insert_chunked(conn, EmbeddingDB.__table__, [
+                {"model": self.model, "content_hash": content_hash, "matrix_row": first + offset,
+                 "event_id": event_id, "created_at": now}
+                for offset, (content_hash, (event_id, _)) in enumerate(new.items())
+            ])
+            return len(new)
+
+    def _write_rows(self, first: int, matrix):
+        """Write rows starting at ``first`` and fsync them before their index rows commit."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as handle:
+            if self._read_header() is None:
+                handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, matrix.shape[1]))
+                self._dim = matrix.shape[1]
+            handle.seek(HEADER.size + first * self.row_bytes)
+            handle.write(matrix.tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    async def save(self, entries: List[tuple]) -> int:
+        """
+        Append vectors of texts that have none yet, in one transaction.
+
+        Args:
+            entries: (content hash, event id or None, vector) per text; a
+                None vector only links an already stored text to the event
+
+        Returns:
+            Vectors appended
+        """
+        return await self.db_manager.run_write(self._append, entries) if entries else 0
+
+    async def embed(self, texts: List[str], encode: Encoder,
+                    event_ids: Optional[List[Optional[str]]] = None):
+        """
+        Vectors of texts, encoding only the ones not stored yet.
+
+        Distinct new texts are encoded in one ``encode`` call (off the event
+        loop) and appended, so no text is encoded twice for this model.
+
+        Args:
+            texts: Texts to embed
+            encode: Model call turning a list of texts into a (n, dim) array
+            event_ids: Content event of each text, recorded for new vectors
+
+        Returns:
+            (len(texts), dim) float16 array in input order
+        """
+        hashes = [compute_content_hash(text or "") for text in texts]
+        ids = event_ids or [None] * len(texts)
+        stored = await self._find(EmbeddingDB.content_hash, hashes)
+        self._lookups += len(hashes)
+        self._hits += sum(1 for content_hash in hashes if content_hash in stored)
+        found = {content_hash: vector for content_hash, (_, vector) in stored.items()}
+
+        pending: Dict[str, int] = {}
+        entries = []
+        for index, content_hash in enumerate(hashes):
+            if content_hash in stored:
+                if ids[index] and stored[content_hash][0] is None:
+                    entries.append((content_hash, ids[index], None))
+            elif content_hash not in pending:
+                pending[content_hash] = index
+        if pending:
+            vectors = np.asarray(await asyncio.to_thread(encode, [texts[index] for index in pending.values()]),
+                                 dtype=np.float16)
+            self._encoded += len(pending)
+            entries += [
+                (content_hash, ids[index], vector) for (content_hash, index), vector in zip(pending.items(), vectors)
+            ]
+            found.update(zip(pending, vectors))
+        await self.save(entries)
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float16)
+        return np.stack([found[content_hash] for content_hash in hashes])
+
+    def count(self) -> int:
+        """Vectors stored for this model."""
+        with self.db_manager.reader.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(EmbeddingDB.__table__).where(EmbeddingDB.model == self.model)
+            ).scalar()
+
+    def close(self):
+        with self._handle_lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Model, file and reuse counters since start-up."""
+        return {
+            "model": self.model,
+            "path": self.path,
+            "dim": self.dim,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "hit_ratio": self._hits / self._lookups if self._lookups else 0.0,
+            "encoded": self._encoded,
+        }
@@ -0,0 +1,260 @@
+"""
+Streaming bulk export of analytics records and content events.
+
+Rows are read through a server-side cursor in batches of ``batch_size`` and
+encoded batch by batch, so memory use stays constant no matter how many rows
+are exported. Supported formats:
+
+    csv       header row + one line per row
+    ndjson    one JSON object per line
+    parquet   one row group per batch (requires pyarrow)
+    arrow     Arrow IPC stream, one record batch per batch (requires pyarrow)
+
+Any format can additionally be gzip-compressed on the fly. Used by the
+``/export`` endpoints of the ingestion and risk-analytics services and by
+``tools/scripts/export_data.py``.
+"""
+import csv
+import heapq
+import io
+import itertools
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import exists, select
+
+from database import AnalyticsRecordDB, ContentEventDB
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for parquet / arrow exports
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet", "arrow")
+EXPORT_DATASETS = ("analytics", "content")
+EXPORT_BATCH_SIZE = 10000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "parquet": "parquet", "arrow": "arrows"}
+
+# Exported columns and their Arrow types per dataset
+COLUMNS = {
+    "analytics": [
+        ("id", "int64"),
+        ("event_id", "string"),
+        ("source", "string"),
+        ("text_preview", "string"),
+        ("detection_label", "string"),
+        ("confidence", "float64"),
+        ("timestamp", "timestamp"),
+    ],
+    "content": [
+        ("id", "string"),
+        ("source", "string"),
+        ("text", "string"),
+        ("metadata_json", "string"),
+        ("content_hash", "string"),
+        ("timestamp", "timestamp"),
+    ],
+}
+
+
+def export_query(dataset: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 label: Optional[str] = None, source: Optional[str] = None):
+    """
+    Build the filtered select for a dataset, in timestamp order.
+
+    Args:
+        dataset: ``analytics`` (analytics_records) or ``content`` (content_events)
+        since: Only rows with timestamp >= since
+        until: Only rows with timestamp < until
+        label: Only rows with this detection label (content: events that have
+            an analytics record with this label)
+        source: Only rows from this source
+    """
+    if dataset == "analytics":
+        model = AnalyticsRecordDB
+        query = select(*[model.__table__.c[name] for name, _ in COLUMNS[dataset]])
+        if label:
+            query = query.where(model.detection_label == label)
+    elif dataset == "content":
+        model = ContentEventDB
+        query = select(*[model.__table__.c[name] for name, _ in COLUMNS[dataset]])
+        if label:
+            query = query.where(exists().where(
+                AnalyticsRecordDB.event_id == ContentEventDB.id,
+                AnalyticsRecordDB.detection_label == label,
+            ))
+    else:
+        raise ValueError(f"Unknown dataset: {dataset} (expected one of {', '.join(EXPORT_DATASETS)})")
+
+    if source:
+        query = query.where(model.source == source)
+    if since:
+        query = query.where(model.timestamp >= since)
+    if until:
+        query = query.where(model.timestamp < until)
+    return query.order_by(model.timestamp, model.id)
+
+
+def iter_batches(engine, query, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Yield row dicts in batches through a server-side cursor."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+def iter_merged_batches(engines: List[Any], query, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield row dicts in batches from several databases (shards), merged in (timestamp, id) order.
+
+    Each database is streamed through its own server-side cursor.
+    """
+    streams = [
+        (row for batch in iter_batches(engine, query, batch_size) for row in batch) for engine in engines
+    ]
+    merged = heapq.merge(*streams, key=lambda row: (row["timestamp"], row["id"]))
+    while True:
+        batch = list(itertools.islice(merged, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_csv(batches: Iterable[List[Dict[str, Any]]], columns: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        for row in batch:
+            writer.writerow([_plain(row[name]) for name in columns])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(batches: Iterable[List[Dict[str, Any]]], columns: List[str]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps({name: _plain(row[name]) for name in columns}) + "\n" for row in batch
+        ).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back as chunks."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(dataset: str):
+    types = {"int64": pa.int64(), "string": pa.string(), "float64": pa.float64(),
+             "timestamp": pa.timestamp("us")}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS[dataset]])
+
+
+def _encode_arrow(batches: Iterable[List[Dict[str, Any]]], dataset: str, fmt: str) -> Iterator[bytes]:
+    if pa is None:
+        raise ValueError(f"{fmt} export requires pyarrow (pip install pyarrow)")
+    schema = _arrow_schema(dataset)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for batch in batches:
+        table = pa.Table.from_pylist(batch, schema=schema)
+        writer.write_table(table)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip-compress a byte stream incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def check_format(fmt: str):
+    """Raise ValueError for unknown formats or columnar formats without pyarrow."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {', '.join(EXPORT_FORMATS)})")
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise ValueError(f"{fmt} export requires pyarrow (pip install pyarrow)")
+
+
+def export_stream(engine, dataset: str, fmt: str = "ndjson", compress: bool = False,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  label: Optional[str] = None, source: Optional[str] = None,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Encoded export of a dataset as a stream of byte chunks.
+
+    Validation happens before the first chunk, so callers can turn a
+    ValueError into a 400 before starting a streaming response.
+
+    ``engine`` may also be a list of engines (the shards of a sharded
+    database, see ``sharding.py``); their rows are merged in timestamp order.
+
+    Raises:
+        ValueError: Unknown dataset or format, or pyarrow missing for parquet/arrow
+    """
+    check_format(fmt)
+    query = export_query(dataset, since, until, label, source)
+    columns = [name for name, _ in COLUMNS[dataset]]
+    engines = engine if isinstance(engine, (list, tuple)) else [engine]
+    if len(engines) == 1:
+        batches = iter_batches(engines[0], query, batch_size)
+    else:
+        batches = iter_merged_batches(engines, query, batch_size)
+    if fmt == "csv":
+        chunks = _encode_csv(batches, columns)
+    elif fmt == "ndjson":
+        chunks = _encode_ndjson(batches, columns)
+    else:
+        chunks = _encode_arrow(batches, dataset, fmt)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(dataset: str, fmt: str, compress: bool = False) -> str:
+    """Suggested file name for an export."""
+    name = f"astra-{dataset}-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{EXTENSIONS[fmt]}"
+    return name + ".gz" if compress else name
@@ -0,0 +1,178 @@
+"""
+Full-text search over `content_events` with SQLite FTS5.
+
+`content_fts` is an external-content FTS5 table: it stores only the inverted
+index and reads document text back from `content_events` (through the
+`content_fts_source` view) when building snippets, so the text is not stored
+twice. Triggers on `content_events` keep the index in sync on insert, update
+and delete.
+
+Stored text may be compressed (see ``text_codec``), so the view and the
+triggers decode it with the ``astra_text()`` SQL function, which
+``DatabaseManager`` registers on every connection. Writes to `content_events`
+from tools that do not register it (e.g. the sqlite3 shell) fail with
+"no such function: astra_text".
+
+The index is keyed by the implicit rowid of `content_events`. A full
+``VACUUM`` may renumber those rowids; run ``rebuild(conn)`` (or
+``tools/scripts/rebuild_fulltext.py``) afterwards.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.exc import OperationalError
+
+import text_codec
+
+FTS_TABLE = "content_fts"
+FTS_SOURCE_VIEW = "content_fts_source"
+# Diacritics are folded so "cafe" matches "café"
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+MAX_SEARCH_LIMIT = 100
+SNIPPET_TOKENS = 16
+# SQLite error messages caused by a malformed MATCH expression
+QUERY_ERRORS = ("fts5:", "syntax error", "unterminated string", "no such column", "unknown special query")
+
+_DDL = [
+    f"""CREATE VIEW IF NOT EXISTS {FTS_SOURCE_VIEW} AS
+        SELECT rowid AS event_rowid, astra_text(text) AS text FROM content_events""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='{FTS_SOURCE_VIEW}', content_rowid='event_rowid', tokenize='{FTS_TOKENIZER}')""",
+    f"""CREATE TRIGGER IF NOT EXISTS content_events_fts_insert AFTER INSERT ON content_events BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.rowid, astra_text(new.text));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS content_events_fts_delete AFTER DELETE ON content_events BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.rowid, astra_text(old.text));
+    END""",
+    # Re-encoding (compress_text.py) rewrites the stored bytes but not the text: skip those
+    f"""CREATE TRIGGER IF NOT EXISTS content_events_fts_update AFTER UPDATE OF text ON content_events
+        WHEN astra_text(old.text) IS NOT astra_text(new.text) BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.rowid, astra_text(old.text));
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.rowid, astra_text(new.text));
+    END""",
+]
+
+
+def register_functions(dbapi_connection):
+    """Register ``astra_text()`` (decode a stored text value) on a DBAPI connection."""
+    dbapi_connection.create_function("astra_text", 1, text_codec.decompress_text, deterministic=True)
+
+
+def install(conn) -> bool:
+    """
+    Create the FTS index, source view and sync triggers if missing.
+
+    A newly created index is filled from the existing rows.
+
+    Returns:
+        True if the index was created (and backfilled) by this call
+    """
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    for statement in _DDL:
+        conn.execute(text(statement))
+    if exists:
+        return False
+    rebuild(conn)
+    return True
+
+
+def rebuild(conn):
+    """Rebuild the whole index from `content_events`."""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def optimize(conn):
+    """Merge the index b-trees into one (faster queries after large ingests)."""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def search(conn, query: str, limit: int = 20, offset: int = 0, label: Optional[str] = None,
+           source: Optional[str] = None, since: Optional[datetime] = None,
+           until: Optional[datetime] = None, max_limit: int = MAX_SEARCH_LIMIT) -> Dict[str, Any]:
+    """
+    BM25-ranked search with highlighted snippets.
+
+    Args:
+        query: FTS5 query: keywords (implicit AND), "exact phrases", OR, NOT,
+            prefix* and NEAR(a b, 5)
+        limit: Maximum hits (capped at ``max_limit``)
+        offset: Hits to skip, for paging through the ranking
+        label: Only events with an analytics record carrying this detection label
+        source: Only events from this source
+        since: Only events with timestamp >= since
+        until: Only events with timestamp < until
+        max_limit: Cap on ``limit`` (raised by sharded searches, which rank
+            ``offset + limit`` hits per shard before merging)
+
+    Returns:
+        ``{"query", "hits": [{id, source, timestamp, score, snippet,
+        detection_label, confidence}]}``; lower scores rank higher (BM25)
+
+    Raises:
+        ValueError: Empty or malformed query
+    """
+    if not query or not query.strip():
+        raise ValueError("Search query must not be empty")
+    limit = max(1, min(limit, max_limit))
+
+    filters = []
+    params: Dict[str, Any] = {"query": query, "limit": limit, "offset": max(0, offset),
+                              "tokens": SNIPPET_TOKENS}
+    if source:
+        filters.append("e.source = :source")
+        params["source"] = source
+    if since:
+        filters.append("e.timestamp >= :since")
+        params["since"] = since
+    if until:
+        filters.append("e.timestamp < :until")
+        params["until"] = until
+    if label:
+        filters.append("EXISTS (SELECT 1 FROM analytics_records a "
+                       "WHERE a.event_id = e.id AND a.detection_label = :label)")
+        params["label"] = label
+    where = "".join(f" AND {condition}" for condition in filters)
+    # Only look up the event row per match when a filter needs it
+    join = f" JOIN content_events e ON e.rowid = {FTS_TABLE}.rowid" if filters else ""
+
+    # Rank and page first; snippets (which decode the text) are built for the page only
+    statement = text(f"""
+        SELECT e.id, e.source, e.timestamp, hits.score,
+               snippet({FTS_TABLE}, 0, '<mark>', '</mark>', '…', :tokens) AS snippet,
+               a.detection_label, a.confidence
+        FROM (
+            SELECT {FTS_TABLE}.rowid AS event_rowid, bm25({FTS_TABLE}) AS score
+            FROM {FTS_TABLE}{join}
+            WHERE {FTS_TABLE} MATCH :query{where}
+            ORDER BY score LIMIT :limit OFFSET :offset
+        ) AS hits
+        JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = hits.event_rowid AND {FTS_TABLE} MATCH :query
+        JOIN content_events e ON e.rowid = hits.event_rowid
+        LEFT JOIN analytics_records a ON a.id = (
+            SELECT MAX(id) FROM analytics_records WHERE event_id = e.id
+        )
+        ORDER BY hits.score
+    """).columns(timestamp=DateTime)
+    try:
+        rows = conn.execute(statement, params).mappings().all()
+    except OperationalError as exc:
+        if any(marker in str(exc.orig) for marker in QUERY_ERRORS):
+            raise ValueError(f"Invalid search query: {query}") from exc
+        raise
+
+    hits: List[Dict[str, Any]] = []
+    for row in rows:
+        hits.append({
+            "id": row["id"],
+            "source": row["source"],
+            "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None,
+            "score": row["score"],
+            "snippet": row["snippet"],
+            "detection_label": row["detection_label"],
+            "confidence": row["confidence"],
+        })
+    return {"query": query, "hits": hits}
@@ -0,0 +1,410 @@
+"""
+SQLite-backed background job queue and worker pool for ASTRA services.
+
+Long-running operations (bulk ingestion, sync from ingestion) are submitted as
+jobs and return an id immediately. Workers claim jobs from the shared `jobs`
+table with a lease (visibility timeout) that they keep renewing while the job
+runs. If a worker process dies, its lease expires and another worker claims
+the job again, resuming from the last checkpoint the handler saved.
+
+Failed jobs are retried with exponential backoff up to ``max_attempts``.
+Cancellation is cooperative: queued jobs are cancelled immediately, running
+jobs see the request the next time they report progress.
+
+Handlers are registered per job kind, mirroring the connector and detector
+registries:
+
+    async def ingest_handler(ctx: JobContext) -> dict:
+        ...
+        await ctx.report(progress=0.5, message="halfway", checkpoint={"done": n})
+        return {"events": n}
+
+    JobRegistry.register("ingest", ingest_handler)
+"""
+import asyncio
+import json
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from database import DatabaseManager, JobDB
+from models import JobInfo
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+DEFAULT_WORKERS = int(os.getenv("ASTRA_JOB_WORKERS", "2"))
+DEFAULT_VISIBILITY_TIMEOUT = float(os.getenv("ASTRA_JOB_VISIBILITY_TIMEOUT", "60"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("ASTRA_JOB_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_BASE = float(os.getenv("ASTRA_JOB_BACKOFF_SECONDS", "2"))
+RETRY_BACKOFF_MAX = 300.0
+POLL_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled."""
+
+
+class JobLeaseLost(Exception):
+    """Raised inside a handler when another worker took over its job."""
+
+
+JobHandler = Callable[["JobContext"], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobRegistry:
+    """Registry of job handlers by kind."""
+
+    _handlers: Dict[str, JobHandler] = {}
+
+    @classmethod
+    def register(cls, kind: str, handler: JobHandler):
+        """Register the coroutine function that runs jobs of ``kind``."""
+        cls._handlers[kind] = handler
+
+    @classmethod
+    def get_handler(cls, kind: str) -> JobHandler:
+        if kind not in cls._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        return cls._handlers[kind]
+
+    @classmethod
+    def list_kinds(cls) -> list:
+        return list(cls._handlers.keys())
+
+
+def _to_info(row) -> JobInfo:
+    return JobInfo(
+        id=row.id,
+        kind=row.kind,
+        status=row.status,
+        progress=row.progress,
+        progress_message=row.progress_message,
+        attempts=row.attempts,
+        max_attempts=row.max_attempts,
+        payload=json.loads(row.payload_json) if row.payload_json else {},
+        result=json.loads(row.result_json) if row.result_json else None,
+        checkpoint=json.loads(row.checkpoint_json) if row.checkpoint_json else None,
+        error=row.error,
+        cancel_requested=bool(row.cancel_requested),
+        run_after=row.run_after,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+        finished_at=row.finished_at,
+    )
+
+
+class JobQueue:
+    """Blocking operations on the `jobs` table. Safe to use from several processes."""
+
+    def __init__(self, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT):
+        self.db_manager = DatabaseManager()
+        self.visibility_timeout = visibility_timeout
+
+    def submit(self, kind: str, payload: Optional[Dict[str, Any]] = None,
+               max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        """Queue a job and return its id."""
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(JobDB.__table__.insert().values(
+                id=job_id,
+                kind=kind,
+                status=STATUS_QUEUED,
+                payload_json=json.dumps(payload or {}),
+                attempts=0,
+                max_attempts=max_attempts,
+                cancel_requested=0,
+                run_after=now,
+                created_at=now,
+                updated_at=now,
+            ))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self.db_manager.reader.connect() as conn:
+            row = conn.execute(select(JobDB.__table__).where(JobDB.id == job_id)).first()
+        return _to_info(row) if row else None
+
+    def list(self, kinds: Optional[List[str]] = None, status: Optional[str] = None,
+             limit: int = 50) -> List[JobInfo]:
+        query = select(JobDB.__table__).order_by(JobDB.created_at.desc()).limit(limit)
+        if kinds:
+            query = query.where(JobDB.kind.in_(kinds))
+        if status:
+            query = query.where(JobDB.status == status)
+        with self.db_manager.reader.connect() as conn:
+            return [_to_info(row) for row in conn.execute(query)]
+
+    def claim(self, worker_id: str, kinds: List[str]) -> Optional[JobInfo]:
+        """
+        Atomically claim the next runnable job of one of ``kinds``.
+
+        Runnable means queued and past its backoff delay, or running with an
+        expired lease (its worker died). Each claim counts as an attempt.
+        """
+        now = datetime.utcnow()
+        runnable = or_(
+            and_(JobDB.status == STATUS_QUEUED, JobDB.run_after <= now),
+            and_(JobDB.status == STATUS_RUNNING, JobDB.lease_expires_at < now),
+        )
+        next_job = (select(JobDB.id)
+                    .where(JobDB.kind.in_(kinds), runnable)
+                    .order_by(JobDB.run_after)
+                    .limit(1)
+                    .scalar_subquery())
+        stmt = (update(JobDB.__table__)
+                .where(JobDB.id == next_job, runnable)
+                .values(status=STATUS_RUNNING,
+                        worker_id=worker_id,
+                        attempts=JobDB.attempts + 1,
+                        lease_expires_at=now + timedelta(seconds=self.visibility_timeout),
+                        updated_at=now)
+                .returning(*JobDB.__table__.columns))
+        with self.db_manager.engine.begin() as conn:
+            row = conn.execute(stmt).first()
+        if row is None:
+            return None
+
+        job = _to_info(row)
+        if job.attempts > job.max_attempts:
+            # Lease expired on its final attempt (e.g. the worker kept crashing)
+            self._finish(job.id, worker_id, STATUS_FAILED, error=job.error or "Visibility timeout exceeded")
+            return None
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: Optional[float] = None,
+                  message: Optional[str] = None, checkpoint: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Extend the lease and record progress.
+
+        Returns:
+            True if cancellation was requested
+
+        Raises:
+            JobLeaseLost: if the job is no longer held by this worker
+        """
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {
+            "lease_expires_at": now + timedelta(seconds=self.visibility_timeout),
+            "updated_at": now,
+        }
+        if progress is not None:
+            values["progress"] = max(0.0, min(1.0, progress))
+        if message is not None:
+            values["progress_message"] = message[:500]
+        if checkpoint is not None:
+            values["checkpoint_json"] = json.dumps(checkpoint)
+        with self.db_manager.engine.begin() as conn:
+            row = conn.execute(
+                update(JobDB.__table__)
+                .where(JobDB.id == job_id, JobDB.worker_id == worker_id, JobDB.status == STATUS_RUNNING)
+                .values(**values)
+                .returning(JobDB.cancel_requested)
+            ).first()
+        if row is None:
+            raise JobLeaseLost(job_id)
+        return bool(row.cancel_requested)
+
+    def complete(self, job_id: str, worker_id: str, result: Optional[Dict[str, Any]] = None):
+        self._finish(job_id, worker_id, STATUS_SUCCEEDED, result=result, progress=1.0)
+
+    def mark_cancelled(self, job_id: str, worker_id: str):
+        self._finish(job_id, worker_id, STATUS_CANCELLED)
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        """Record a failed attempt; requeue with exponential backoff if attempts remain."""
+        job = self.get(job_id)
+        if job is None:
+            return
+        if job.attempts >= job.max_attempts:
+            self._finish(job_id, worker_id, STATUS_FAILED, error=error)
+            return
+        delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (job.attempts - 1)))
+        delay *= random.uniform(0.8, 1.2)  # jitter so retries do not stampede
+        now = datetime.utcnow()
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(
+                update(JobDB.__table__)
+                .where(JobDB.id == job_id, JobDB.worker_id == worker_id)
+                .values(status=STATUS_QUEUED, error=error, worker_id=None, lease_expires_at=None,
+                        run_after=now + timedelta(seconds=delay), updated_at=now)
+            )
+
+    def release(self, job_id: str, worker_id: str):
+        """Hand a running job back to the queue without counting the attempt (shutdown)."""
+        now = datetime.utcnow()
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(
+                update(JobDB.__table__)
+                .where(JobDB.id == job_id, JobDB.worker_id == worker_id, JobDB.status == STATUS_RUNNING)
+                .values(status=STATUS_QUEUED, worker_id=None, lease_expires_at=None,
+                        attempts=JobDB.attempts - 1, run_after=now, updated_at=now)
+            )
+
+    def cancel(self, job_id: str) -> Optional[JobInfo]:
+        """Cancel a queued job now, or ask a running job to stop."""
+        now = datetime.utcnow()
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(
+                update(JobDB.__table__)
+                .where(JobDB.id == job_id, JobDB.status == STATUS_QUEUED)
+                .values(status=STATUS_CANCELLED, cancel_requested=1, finished_at=now, updated_at=now)
+            )
+            conn.execute(
+                update(JobDB.__table__)
+                .where(JobDB.id == job_id, JobDB.status == STATUS_RUNNING)
+                .values(cancel_requested=1, updated_at=now)
+            )
+        return self.get(job_id)
+
+    def _finish(self, job_id: str, worker_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, progress: Optional[float] = None):
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {
+            "status": status,
+            "lease_expires_at": None,
+            "finished_at": now,
+            "updated_at": now,
+        }
+        if result is not None:
+            values["result_json"] = json.dumps(result, default=str)
+        if error is not None:
+            values["error"] = error
+        if progress is not None:
+            values["progress"] = progress
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(
+                update(JobDB.__table__)
+                .where(JobDB.id == job_id, JobDB.worker_id == worker_id)
+                .values(**values)
+            )
+
+
+class JobContext:
+    """Handle passed to job handlers for payload, checkpoint and progress reporting."""
+
+    def __init__(self, queue: JobQueue, job: JobInfo, worker_id: str):
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.payload: Dict[str, Any] = job.payload
+        # State saved by a previous attempt; handlers resume from here
+        self.checkpoint: Dict[str, Any] = dict(job.checkpoint or {})
+
+    @property
+    def job_id(self) -> str:
+        return self.job.id
+
+    async def report(self, progress: Optional[float] = None, message: Optional[str] = None,
+                     checkpoint: Optional[Dict[str, Any]] = None):
+        """
+        Persist progress and (optionally) a checkpoint, and renew the lease.
+
+        Raises:
+            JobCancelled: if cancellation was requested
+            JobLeaseLost: if another worker has taken over the job
+        """
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        cancelled = await self.queue.db_manager.run_write(
+            self.queue.heartbeat, self.job.id, self.worker_id, progress, message, checkpoint
+        )
+        if cancelled:
+            raise JobCancelled(self.job.id)
+
+
+class JobWorkerPool:
+    """Pool of asyncio workers that claim and run jobs for the registered kinds."""
+
+    def __init__(self, kinds: Optional[List[str]] = None, workers: int = DEFAULT_WORKERS,
+                 visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT):
+        self.queue = JobQueue(visibility_timeout=visibility_timeout)
+        self.kinds = kinds
+        self.workers = workers
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, str] = {}  # job id -> worker id
+        self._stopping = False
+
+    def start(self):
+        """Start worker tasks on the running event loop."""
+        if self._tasks:
+            return
+        self._stopping = False
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker(f"{self.worker_prefix}:{i}")) for i in range(self.workers)]
+
+    async def stop(self):
+        """Stop workers; running jobs are released back to the queue to resume later."""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "kinds": self.kinds or JobRegistry.list_kinds(),
+            "running_jobs": list(self._running.keys()),
+            "visibility_timeout_seconds": self.queue.visibility_timeout,
+        }
+
+    async def _worker(self, worker_id: str):
+        while not self._stopping:
+            kinds = self.kinds or JobRegistry.list_kinds()
+            try:
+                job = await self.queue.db_manager.run_write(self.queue.claim, worker_id, kinds)
+            except Exception as exc:  # noqa: BLE001
+                print(f"[JobWorkerPool] {worker_id} failed to claim a job: {exc}")
+                job = None
+            if job is None:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            await self._run(job, worker_id)
+
+    async def _run(self, job: JobInfo, worker_id: str):
+        ctx = JobContext(self.queue, job, worker_id)
+        self._running[job.id] = worker_id
+        lease_keeper = asyncio.get_running_loop().create_task(self._keep_lease(ctx))
+        try:
+            handler = JobRegistry.get_handler(job.kind)
+            result = await handler(ctx)
+            await self.queue.db_manager.run_write(self.queue.complete, job.id, worker_id, result)
+        except JobCancelled:
+            await self.queue.db_manager.run_write(self.queue.mark_cancelled, job.id, worker_id)
+        except JobLeaseLost:
+            print(f"[JobWorkerPool] {worker_id} lost the lease on job {job.id}")
+        except asyncio.CancelledError:
+            # Service shutdown: hand the job back so it resumes from its checkpoint
+            await self.queue.db_manager.run_write(self.queue.release, job.id, worker_id)
+            raise
+        except Exception as exc:  # noqa: BLE001
+            await self.queue.db_manager.run_write(
+                self.queue.fail, job.id, worker_id, f"{type(exc).__name__}: {exc}"
+            )
+        finally:
+            lease_keeper.cancel()
+            self._running.pop(job.id, None)
+
+    async def _keep_lease(self, ctx: JobContext):
+        """Renew the lease between handler reports so slow steps do not lose the job."""
+        interval = max(1.0, self.queue.visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.queue.db_manager.run_write(self.queue.heartbeat, ctx.job_id, ctx.worker_id)
+            except JobLeaseLost:
+                return
+            except Exception as exc:  # noqa: BLE001
+                print(f"[JobWorkerPool] Lease renewal for job {ctx.job_id} failed: {exc}")
@@ -0,0 +1,254 @@
+"""
+MinHash signatures and a banded LSH index for near-duplicate text lookup.
+
+    MinHasher   fixed-size signature of a text's character (or, batched, byte) shingles
+    LSHIndex    in-memory index returning the most similar stored signature
+
+The fraction of equal positions in two signatures estimates the Jaccard
+similarity of the texts' shingle sets, so lightly edited copies of a text
+(a changed word, added hashtags, different whitespace or case) score close
+to 1 while unrelated texts score close to 0.
+
+The index splits signatures into ``bands`` of ``rows`` positions and only
+compares signatures that agree on a whole band. With the band layout chosen
+by `band_rows`, a pair at the similarity threshold shares a band with at
+least 95% probability; candidates are then checked against the threshold
+on their full signature.
+
+Error bounds with the defaults:
+    MinHasher(num_perm=64)   similarity estimate has a standard error of
+                             sqrt(s(1-s)/64), i.e. ±0.04 at s=0.9
+    Memory                   256 bytes per signature plus one bucket entry per band
+"""
+import operator
+import random
+import re
+import zlib
+from array import array
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SHINGLE_SIZE = 5
+DEFAULT_NUM_PERM = 64
+# Probability that a pair exactly at the threshold becomes a candidate
+MIN_CANDIDATE_RECALL = 0.95
+# Shingles per vectorized step of MinHasher.byte_signatures
+BYTE_CHUNK = 16384
+
+_MASK64 = (1 << 64) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lower-case and collapse whitespace, so formatting changes do not count as edits."""
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Character ``size``-grams of the normalized text (the whole text when shorter)."""
+    value = normalize(text)
+    if len(value) <= size:
+        return {value}
+    return {value[index:index + size] for index in range(len(value) - size + 1)}
+
+
+def band_rows(num_perm: int, threshold: float) -> int:
+    """
+    Rows per band for an index over ``num_perm``-position signatures.
+
+    Picks the most selective layout (most rows per band, fewest candidates)
+    under which a pair with similarity ``threshold`` still shares at least
+    one band with probability ``MIN_CANDIDATE_RECALL``.
+    """
+    best = 1
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= MIN_CANDIDATE_RECALL:
+            best = rows
+    return best
+
+
+def similarity(first: array, second: array) -> float:
+    """Estimated Jaccard similarity of two signatures of equal length."""
+    return sum(map(operator.eq, first, second)) / len(first)
+
+
+class MinHasher:
+    """
+    MinHash over character shingles with ``num_perm`` multiply-shift hash functions.
+
+    Signatures are ``array('I')`` of ``num_perm`` 32-bit values and depend
+    only on ``num_perm`` and ``seed``, so they can be stored and compared
+    across processes. numpy is used when installed (same values, ~20x faster).
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # h(x) = ((a * x + b) mod 2^64) >> 32 with odd a
+        self._a = [rng.getrandbits(64) | 1 for _ in range(num_perm)]
+        self._b = [rng.getrandbits(64) for _ in range(num_perm)]
+        if np is not None:
+            self._np_a = np.array(self._a, dtype=np.uint64)[:, None]
+            self._np_b = np.array(self._b, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> array:
+        return self.signature_of(shingles(text, self.shingle_size))
+
+    def byte_signatures(self, texts: Sequence[str], min_shingles: int = 1) -> List[Optional[array]]:
+        """
+        Signatures of a batch of texts over UTF-8 byte shingles, in one vectorized pass.
+
+        About 5x faster than ``signature`` per text (no Python-level
+        shingle set or CRC per shingle) and an equally good similarity
+        estimate, but the values differ from ``signature``'s: only compare
+        them with each other. Requires numpy.
+
+        Args:
+            texts: Texts to sign
+            min_shingles: Texts with fewer shingle positions get None
+
+        Returns:
+            One signature (or None) per text
+        """
+        if np is None:
+            raise RuntimeError("numpy not installed. Run: pip install numpy")
+        size = self.shingle_size
+        encoded = [normalize(text).encode("utf-8") for text in texts]
+        counts = np.array([max(0, len(data) - size + 1) for data in encoded], dtype=np.int64)
+        signed = np.flatnonzero(counts >= max(1, min_shingles))
+        signatures: List[Optional[array]] = [None] * len(texts)
+        # Sign in chunks of about BYTE_CHUNK shingles to bound the (num_perm, shingles) matrix
+        start = 0
+        while start < len(signed):
+            end = start + 1
+            total = counts[signed[start]]
+            while end < len(signed) and total + counts[signed[end]] <= BYTE_CHUNK:
+                total += counts[signed[end]]
+                end += 1
+            chunk = signed[start:end]
+            buffer = np.frombuffer(b"".join(encoded[index] for index in chunk), dtype=np.uint8).astype(np.uint64)
+            lengths = np.array([len(encoded[index]) for index in chunk], dtype=np.int64)
+            chunk_counts = counts[chunk]
+            # Shingle start positions in the joined buffer, skipping the ones that cross into the next text
+            firsts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            bounds = np.concatenate(([0], np.cumsum(chunk_counts)[:-1]))
+            starts = np.arange(chunk_counts.sum()) + np.repeat(firsts - bounds, chunk_counts)
+            grams = np.zeros(len(starts), dtype=np.uint64)
+            for offset in range(size):
+                grams = (grams << np.uint64(8)) | buffer[starts + offset]
+            hashed = self._np_a * grams
+            hashed += self._np_b
+            hashed >>= np.uint64(32)
+            minima = np.minimum.reduceat(hashed, bounds, axis=1).astype(np.uint32)
+            for column, index in enumerate(chunk):
+                signatures[index] = array("I", minima[:, column].tobytes())
+            start = end
+        return signatures
+
+    def signature_of(self, grams: Iterable[str]) -> array:
+        """Signature of an already shingled text."""
+        values = [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+        if np is not None:
+            hashed = (self._np_a * np.array(values, dtype=np.uint64) + self._np_b) >> np.uint64(32)
+            return array("I", hashed.min(axis=1).astype(np.uint32).tobytes())
+        return array("I", (
+            min(((a * value + b) & _MASK64) >> 32 for value in values) for a, b in zip(self._a, self._b)
+        ))
+
+    @staticmethod
+    def to_bytes(signature: array) -> bytes:
+        return signature.tobytes()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> array:
+        signature = array("I")
+        signature.frombytes(data)
+        return signature
+
+
+class LSHIndex:
+    """Banded LSH index over MinHash signatures, keyed by caller-chosen keys."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, threshold: float = 0.9):
+        """
+        Args:
+            num_perm: Signature length
+            threshold: Minimum estimated similarity of a match
+        """
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.rows = band_rows(num_perm, threshold)
+        self.bands = num_perm // self.rows
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[Hashable, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def _band_keys(self, signature: array) -> List[bytes]:
+        """The bucket key of every band, in band order."""
+        raw = signature.tobytes()
+        width = self.rows * signature.itemsize
+        return [raw[start:start + width] for start in range(0, len(raw), width)]
+
+    def add(self, key: Hashable, signature: array):
+        """Index ``signature`` under ``key`` (a key already present is left unchanged)."""
+        if len(signature) != self.num_perm:
+            raise ValueError(f"Signature has {len(signature)} positions, index expects {self.num_perm}")
+        if key in self._signatures:
+            return
+        self._signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket is None:
+                buckets[band_key] = [key]
+            else:
+                bucket.append(key)
+
+    def remove(self, key: Hashable):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del buckets[band_key]
+
+    def candidates(self, signature: array) -> Set[Hashable]:
+        """Keys sharing at least one band with ``signature``."""
+        found: Set[Hashable] = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def query(self, signature: array) -> Optional[Tuple[Hashable, float]]:
+        """
+        The most similar indexed key at or above the threshold.
+
+        Returns:
+            (key, estimated similarity), or None when no candidate qualifies
+        """
+        best = None
+        for key in self.candidates(signature):
+            score = similarity(signature, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def signature(self, key: Hashable) -> Optional[array]:
+        return self._signatures.get(key)
@@ -2,7 +2,7 @@
 Shared data models for ASTRA services.
 """
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 
 
@@ -16,6 +16,41 @@ class ContentEvent(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
+class EventLogEntry(BaseModel):
+    """A content event at its position in the ingestion event log."""
+    seq: int = Field(..., description="Monotonically increasing log sequence number")
+    event: ContentEvent
+
+
+class EventLogBatch(BaseModel):
+    """A batch of event-log entries read after an offset."""
+    consumer_group: Optional[str] = Field(default=None, description="Consumer group the batch was polled for")
+    offset: int = Field(..., description="Sequence number the batch was read after")
+    next_offset: int = Field(..., description="Offset to commit once the batch is processed")
+    head: int = Field(..., description="Latest sequence number in the log")
+    entries: List[EventLogEntry] = Field(default_factory=list)
+
+
+class JobInfo(BaseModel):
+    """Status of a background job."""
+    id: str
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    progress: Optional[float] = Field(default=None, description="0.0-1.0 when the total is known")
+    progress_message: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    checkpoint: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    run_after: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class DetectionRequest(BaseModel):
     """Request payload for detection service."""
     text: str = Field(..., description="Text content to analyze")
@@ -52,3 +87,28 @@ class AnalyticsRecord(BaseModel):
     confidence: float
     timestamp: datetime
     model_config = {"protected_namespaces": ()}
+
+
+class ClusterMember(BaseModel):
+    """A post in a coordination cluster."""
+    event_id: str = Field(..., description="Content event; exact repeats share their canonical event")
+    source: str
+    timestamp: datetime
+    sighting: bool = Field(default=False, description="Exact repeat recorded in content_sightings")
+    detection_label: Optional[str] = Field(default=None, description="From analytics_records, once scored")
+    text_preview: Optional[str] = None
+
+
+class CoordinationCluster(BaseModel):
+    """Near-identical or semantically similar posts from the graph-intelligence sliding window."""
+    id: str
+    score: float = Field(..., ge=0.0, le=1.0, description="Weighted sum of the components")
+    components: Dict[str, float] = Field(default_factory=dict, description="size, source_diversity, time_compression, ai_ratio")
+    size: int
+    sources: Dict[str, int] = Field(default_factory=dict, description="Posts per source")
+    first_seen: datetime
+    last_seen: datetime
+    span_seconds: float
+    labeled: int = Field(..., description="Posts with a detection label")
+    ai_ratio: float
+    members: List[ClusterMember] = Field(default_factory=list)
@@ -0,0 +1,236 @@
+"""
+Change-data-capture outbox over `content_events`.
+
+An ``AFTER INSERT`` trigger on `content_events` appends every new row's id to
+`content_outbox` in the inserting transaction. Outbox sequence numbers come
+from ``AUTOINCREMENT``, so they are never reused and, unlike the implicit
+rowids of `content_events`, survive a full ``VACUUM``. The trigger fires for
+every writer of the table (services, tools, other processes sharing the
+file), so consumers do not depend on the writer's cooperation.
+
+`OutboxConsumer` tails the outbox in the background: it reads the entries
+after its durable offset (the ``sync_state`` row ``outbox:<name>``) in
+batches, passes the events to an async handler and commits the new offset
+once the handler returns. Delivery is at-least-once; handlers should be
+idempotent (e.g. skip event ids they already processed).
+
+Committing does not delete entries: a consumer that registers later starts
+at offset 0 and must still find everything. Old entries are removed by the
+``content_outbox`` retention policy (``ASTRA_RETENTION_CONTENT_OUTBOX_DAYS``,
+see ``retention.py``), which keeps anything a registered consumer has not
+committed past.
+
+Configuration (environment):
+    ASTRA_OUTBOX_POLL_INTERVAL    seconds between polls while caught up (default 0.5)
+    ASTRA_OUTBOX_BATCH            entries per handler call (default 256)
+    ASTRA_OUTBOX_RETRY_INTERVAL   seconds before retrying a failed batch (default 5)
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, text
+
+from models import ContentEvent
+
+OUTBOX_TABLE = "content_outbox"
+OFFSET_PREFIX = "outbox:"
+DEFAULT_POLL_INTERVAL = float(os.getenv("ASTRA_OUTBOX_POLL_INTERVAL", "0.5"))
+DEFAULT_BATCH = int(os.getenv("ASTRA_OUTBOX_BATCH", "256"))
+DEFAULT_RETRY_INTERVAL = float(os.getenv("ASTRA_OUTBOX_RETRY_INTERVAL", "5"))
+
+_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS content_events_outbox_insert AFTER INSERT ON content_events BEGIN
+        INSERT INTO {OUTBOX_TABLE}(event_id, created_at)
+        VALUES (new.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END""",
+]
+
+# Called with the events of one batch, oldest first
+OutboxHandler = Callable[[List[ContentEvent]], Awaitable[Any]]
+
+
+def install(conn):
+    """Create the outbox trigger if missing (the table itself is ``ContentOutboxDB``)."""
+    for statement in _DDL:
+        conn.execute(text(statement))
+
+
+def head(conn) -> int:
+    """Latest outbox sequence number (0 when nothing was ever inserted)."""
+    # The AUTOINCREMENT counter, which stays put when retention deletes entries
+    return conn.execute(
+        text("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = :table"), {"table": OUTBOX_TABLE}
+    ).scalar()
+
+
+def read(conn, after: int, limit: int) -> Tuple[List[Tuple[int, ContentEvent]], int, int]:
+    """
+    Up to ``limit`` entries after ``after`` with their content events.
+
+    Entries whose event no longer exists (e.g. expired) are skipped.
+
+    Returns:
+        (entries as (seq, ContentEvent), next offset, head)
+    """
+    # Bound the read by the head observed first so entries committed
+    # meanwhile are never skipped over by the next offset
+    latest = head(conn)
+    rows = conn.execute(
+        text(f"""
+            SELECT o.seq, e.id, e.source, astra_text(e.text) AS text, e.metadata_json, e.timestamp
+            FROM {OUTBOX_TABLE} o JOIN content_events e ON e.id = o.event_id
+            WHERE o.seq > :after AND o.seq <= :head
+            ORDER BY o.seq LIMIT :limit
+        """).columns(timestamp=DateTime),
+        {"after": after, "head": latest, "limit": limit},
+    ).all()
+    entries = [
+        (row.seq, ContentEvent(
+            id=row.id,
+            source=row.source,
+            text=row.text,
+            metadata=json.loads(row.metadata_json) if row.metadata_json else {},
+            timestamp=row.timestamp,
+        ))
+        for row in rows
+    ]
+    next_offset = max(after, latest) if len(rows) < limit else entries[-1][0]
+    return entries, next_offset, latest
+
+
+def get_offset(conn, name: str) -> int:
+    """Committed offset of a consumer (0 for a new one)."""
+    value = conn.execute(
+        text("SELECT value FROM sync_state WHERE name = :name"), {"name": OFFSET_PREFIX + name}
+    ).scalar()
+    return int(value) if value else 0
+
+
+def commit(conn, name: str, offset: int):
+    """Commit a consumer's offset (entries are kept, see the module docstring)."""
+    conn.execute(
+        text("""
+            INSERT INTO sync_state(name, value, updated_at) VALUES (:name, :value, :now)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        """),
+        {"name": OFFSET_PREFIX + name, "value": str(offset), "now": datetime.utcnow()},
+    )
+
+
+class OutboxConsumer:
+    """Continuously hands new content events to an async handler, with a durable offset."""
+
+    def __init__(self, db_manager, name: str, handler: OutboxHandler, batch_size: int = DEFAULT_BATCH,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, retry_interval: float = DEFAULT_RETRY_INTERVAL,
+                 lock: Optional[asyncio.Lock] = None):
+        """
+        Args:
+            db_manager: DatabaseManager of the database holding content_events
+            name: Consumer name; its offset is stored as ``sync_state`` row ``outbox:<name>``
+            handler: Async callable receiving each batch of ContentEvents
+            batch_size: Entries per handler call
+            poll_interval: Seconds between polls while caught up
+            retry_interval: Seconds before a failed batch is retried
+            lock: Held by the background task around each batch (read, handler
+                and commit). Code holding the same lock can call ``poll_once``
+                itself without racing the task for the same entries.
+        """
+        self.db_manager = db_manager
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.lock = lock
+        self._task: Optional[asyncio.Task] = None
+        self._offset = 0
+        self._head = 0
+        self._batches = 0
+        self._events = 0
+        self._failures = 0
+        self._last_error: Optional[str] = None
+        self._last_batch_ms = 0.0
+
+    def start(self):
+        """Start tailing the outbox on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _read(self, limit: int):
+        with self.db_manager.reader.connect() as conn:
+            offset = get_offset(conn, self.name)
+            entries, next_offset, latest = read(conn, offset, limit)
+        return offset, entries, next_offset, latest
+
+    def _commit(self, offset: int):
+        with self.db_manager.engine.begin() as conn:
+            commit(conn, self.name, offset)
+
+    async def poll_once(self, handler: Optional[OutboxHandler] = None) -> int:
+        """
+        Process at most one batch.
+
+        Args:
+            handler: Handle this batch with ``handler`` instead of the consumer's own
+
+        Returns:
+            Entries consumed (0 when caught up)
+        """
+        offset, entries, next_offset, self._head = await self.db_manager.run_read(self._read, self.batch_size)
+        self._offset = offset
+        if next_offset == offset:
+            return 0
+        started = time.perf_counter()
+        if entries:
+            await (handler or self.handler)([event for _, event in entries])
+        await self.db_manager.run_write(self._commit, next_offset)
+        self._last_batch_ms = (time.perf_counter() - started) * 1000
+        self._offset = next_offset
+        self._batches += 1
+        self._events += len(entries)
+        return next_offset - offset
+
+    async def _run(self):
+        while True:
+            try:
+                if self.lock is None:
+                    consumed = await self.poll_once()
+                else:
+                    async with self.lock:
+                        consumed = await self.poll_once()
+                self._last_error = None
+            except Exception as exc:  # keep tailing; the batch is retried
+                self._failures += 1
+                self._last_error = f"{type(exc).__name__}: {exc}"
+                print(f"[OutboxConsumer:{self.name}] Batch failed, retrying in {self.retry_interval}s: {exc}")
+                await asyncio.sleep(self.retry_interval)
+                continue
+            if not consumed:
+                await asyncio.sleep(self.poll_interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "consumer": self.name,
+            "running": self._task is not None and not self._task.done(),
+            "offset": self._offset,
+            "head": self._head,
+            "lag": max(0, self._head - self._offset),
+            "batches": self._batches,
+            "events": self._events,
+            "failures": self._failures,
+            "last_error": self._last_error,
+            "last_batch_ms": round(self._last_batch_ms, 3),
+        }
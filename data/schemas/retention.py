@@ -0,0 +1,309 @@
+"""
+Per-table retention with batched expiry, optional archiving and incremental vacuum.
+
+Rows older than a table's retention period are deleted oldest first in
+batches of ``ASTRA_RETENTION_BATCH`` rows, each batch in its own short
+transaction with a pause in between, so concurrent writers only ever wait
+for one small delete. Freed pages are then returned to the filesystem with
+``PRAGMA incremental_vacuum`` in small steps, which keeps the database file
+at a steady size instead of growing forever.
+
+With ``ASTRA_RETENTION_ARCHIVE_DIR`` set, every expired row is first
+appended to a gzip-compressed NDJSON file under
+``<archive dir>/<table>/<table>-<run start>.ndjson.gz``; a batch is only
+deleted after it has been written and flushed.
+
+Configuration (environment):
+    ASTRA_RETENTION_<TABLE>_DAYS   retention for a table in RETENTION_POLICIES, e.g.
+                                   ASTRA_RETENTION_CONTENT_EVENTS_DAYS=90
+                                   (unset or 0 = keep forever, the default)
+    ASTRA_RETENTION_INTERVAL       seconds between background runs (default 3600)
+    ASTRA_RETENTION_BATCH          rows deleted per transaction (default 500)
+    ASTRA_RETENTION_ARCHIVE_DIR    archive expired rows here (default: no archive)
+
+With several database files (the shards of ``sharding.py``) every policy is
+applied to each file in turn.
+
+Incremental vacuum needs ``auto_vacuum=INCREMENTAL``, which new databases
+get from ``DatabaseManager``. Databases created before that need one full
+``VACUUM`` to switch (``tools/scripts/apply_retention.py --enable-incremental-vacuum``).
+"""
+import asyncio
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import literal_column, select, text
+
+from database import Base, DatabaseManager
+import fulltext
+
+DEFAULT_INTERVAL = float(os.getenv("ASTRA_RETENTION_INTERVAL", "3600"))
+DEFAULT_BATCH = int(os.getenv("ASTRA_RETENTION_BATCH", "500"))
+DEFAULT_ARCHIVE_DIR = os.getenv("ASTRA_RETENTION_ARCHIVE_DIR") or None
+# Pause between delete batches so queued writers get the lock
+BATCH_PAUSE = 0.01
+# Pages released per incremental_vacuum step (4 MB at the default page size)
+VACUUM_STEP_PAGES = 1024
+
+# table -> (timestamp column, extra condition that must also hold to expire a row)
+RETENTION_POLICIES = {
+    "content_events": ("timestamp", None),
+    "content_sightings": ("timestamp", None),
+    # Never drop log entries a consumer group has not committed yet
+    "event_log": ("appended_at", "seq <= COALESCE((SELECT MIN(committed_seq) FROM consumer_offsets), seq)"),
+    # Entries no outbox consumer has committed past are kept
+    "content_outbox": ("created_at", "seq <= COALESCE((SELECT MIN(CAST(value AS INTEGER)) FROM sync_state "
+                                     "WHERE name LIKE 'outbox:%'), seq)"),
+    "analytics_records": ("timestamp", None),
+    "detection_results": ("timestamp", None),
+    "detection_signatures": ("created_at", None),
+    # Only finished jobs; queued and running ones are never expired
+    "jobs": ("finished_at", "status IN ('succeeded', 'failed', 'cancelled')"),
+}
+
+# Called with (connection, expired rows) inside each delete transaction
+ExpireHook = Callable[[Any, List[Dict[str, Any]]], None]
+
+
+def retention_days(table: str) -> Optional[float]:
+    """Configured retention for a table in days, or None to keep rows forever."""
+    value = float(os.getenv(f"ASTRA_RETENTION_{table.upper()}_DAYS", "0") or 0)
+    return value if value > 0 else None
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return value
+
+
+class RetentionManager:
+    """Expires old rows from a set of tables and reclaims the freed space."""
+
+    def __init__(self, tables: List[str], retention: Optional[Dict[str, Optional[float]]] = None,
+                 hooks: Optional[Dict[str, ExpireHook]] = None, batch_size: int = DEFAULT_BATCH,
+                 archive_dir: Optional[str] = DEFAULT_ARCHIVE_DIR, interval: float = DEFAULT_INTERVAL,
+                 db_managers: Optional[List[DatabaseManager]] = None):
+        """
+        Args:
+            tables: Tables this process is responsible for (keys of RETENTION_POLICIES)
+            retention: Retention in days per table; defaults to the environment
+            hooks: Per-table callbacks run in each delete transaction, e.g. to
+                keep maintained aggregates in step with the deleted rows
+            batch_size: Rows deleted per transaction
+            archive_dir: Write expired rows to gzip NDJSON files here before deleting
+            interval: Seconds between runs of the background loop
+            db_managers: Databases to apply the policies to (default: the
+                process default database)
+        """
+        unknown = [table for table in tables if table not in RETENTION_POLICIES]
+        if unknown:
+            raise ValueError(f"No retention policy for: {', '.join(unknown)}")
+        self.db_managers = db_managers or [DatabaseManager()]
+        self.db_manager = self.db_managers[0]
+        self.tables = tables
+        self.retention = {table: (retention or {}).get(table, retention_days(table)) for table in tables}
+        self.hooks = hooks or {}
+        self.batch_size = batch_size
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Dict[str, Any] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return any(days is not None for days in self.retention.values())
+
+    def expire(self, table: str, cutoff: datetime, db_manager: Optional[DatabaseManager] = None) -> Dict[str, Any]:
+        """
+        Delete (and optionally archive) rows of ``table`` older than ``cutoff``.
+
+        Args:
+            db_manager: Database to expire rows from (default: the first one)
+
+        Returns:
+            Rows deleted, archive file (if any) and elapsed seconds
+        """
+        db_manager = db_manager or self.db_manager
+        table_obj = Base.metadata.tables[table]
+        column, condition = RETENTION_POLICIES[table]
+        hook = self.hooks.get(table)
+        rowid = literal_column(f"{table}.rowid")
+        # Full rows are only read when something needs them (text may have to be decompressed)
+        needs_rows = hook is not None or self.archive_dir is not None
+        query = select(rowid.label("_rowid"), *(table_obj.columns if needs_rows else []))
+        query = query.where(table_obj.c[column] < cutoff)
+        if condition:
+            query = query.where(text(condition))
+        query = query.order_by(table_obj.c[column]).limit(self.batch_size)
+
+        archive_path = None
+        archive = None
+        if self.archive_dir:
+            os.makedirs(os.path.join(self.archive_dir, table), exist_ok=True)
+            archive_path = os.path.join(
+                self.archive_dir, table, f"{table}-{datetime.utcnow():%Y%m%dT%H%M%SZ}.ndjson.gz"
+            )
+
+        started = time.perf_counter()
+        deleted = 0
+        try:
+            while True:
+                with db_manager.engine.begin() as conn:
+                    batch = conn.execute(query).all()
+                    if not batch:
+                        break
+                    rows = [dict(row._mapping) for row in batch] if needs_rows else []
+                    for row in rows:
+                        del row["_rowid"]
+                    if archive_path:
+                        if archive is None:
+                            archive = gzip.open(archive_path, "at", encoding="utf-8")
+                        archive.writelines(
+                            json.dumps({key: _json_value(value) for key, value in row.items()}) + "\n"
+                            for row in rows
+                        )
+                        archive.flush()
+                    if hook is not None:
+                        hook(conn, rows)
+                    conn.execute(
+                        table_obj.delete().where(rowid.in_([row[0] for row in batch]))
+                    )
+                deleted += len(batch)
+                if len(batch) < self.batch_size:
+                    break
+                time.sleep(BATCH_PAUSE)
+        finally:
+            if archive is not None:
+                archive.close()
+        return {
+            "deleted": deleted,
+            "archive": archive_path if deleted else None,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def reclaim_space(self, max_pages: Optional[int] = None, db_manager: Optional[DatabaseManager] = None) -> int:
+        """
+        Return free pages to the filesystem with incremental vacuum, in small steps.
+
+        Returns:
+            Pages released (0 when the database is not in incremental auto-vacuum mode)
+        """
+        db_manager = db_manager or self.db_manager
+        released = 0
+        with db_manager.reader.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:  # 2 = INCREMENTAL
+                return 0
+        while max_pages is None or released < max_pages:
+            with db_manager.reader.connect() as conn:
+                free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if not free:
+                break
+            step = min(free, VACUUM_STEP_PAGES)
+            with db_manager.engine.connect() as conn:
+                # pysqlite steps a statement only once (one page); executescript runs it to completion
+                conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({step})")
+            released += step
+            time.sleep(BATCH_PAUSE)
+        return released
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Apply every configured policy once, then reclaim the freed space."""
+        now = now or datetime.utcnow()
+        results = {}
+        released = 0
+        for db_manager in self.db_managers:
+            outcomes = {}
+            for table in self.tables:
+                days = self.retention[table]
+                if days is None:
+                    continue
+                outcomes[table] = self.expire(table, now - timedelta(days=days), db_manager)
+            if any(outcome["deleted"] for outcome in outcomes.values()):
+                released += self.reclaim_space(db_manager=db_manager)
+            for table, outcome in outcomes.items():
+                total = results.setdefault(table, {"deleted": 0, "archive": None, "seconds": 0.0})
+                total["deleted"] += outcome["deleted"]
+                total["archive"] = total["archive"] or outcome["archive"]
+                total["seconds"] = round(total["seconds"] + outcome["seconds"], 3)
+        self._last_run = {
+            "at": now.isoformat(),
+            "tables": results,
+            "vacuumed_pages": released,
+        }
+        return self._last_run
+
+    def start(self):
+        """Run the policies periodically on the running event loop (no-op when none are set)."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self.run_once)
+                deleted = sum(r["deleted"] for r in result["tables"].values())
+                if deleted:
+                    print(f"[RetentionManager] Expired {deleted} rows, released {result['vacuumed_pages']} pages")
+            except Exception as exc:  # keep running; the next interval retries
+                print(f"[RetentionManager] Retention run failed: {exc}")
+            await asyncio.sleep(self.interval)
+
+    def database_size(self) -> Dict[str, int]:
+        """Current file size and free pages of the database (summed over all files)."""
+        size = {"bytes": 0, "free_bytes": 0}
+        for db_manager in self.db_managers:
+            with db_manager.reader.connect() as conn:
+                page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+                page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+                free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            size["bytes"] += page_size * page_count
+            size["free_bytes"] += page_size * free
+        return size
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "retention_days": self.retention,
+            "interval_seconds": self.interval,
+            "batch_size": self.batch_size,
+            "archive_dir": self.archive_dir,
+            "running": self._task is not None and not self._task.done(),
+            "last_run": self._last_run or None,
+            "database": self.database_size(),
+        }
+
+
+def enable_incremental_vacuum(db_manager: DatabaseManager) -> bool:
+    """
+    Switch an existing database to ``auto_vacuum=INCREMENTAL`` (one full VACUUM).
+
+    The full VACUUM rewrites the file and may renumber implicit rowids, so the
+    full-text index is rebuilt afterwards. Needs exclusive access for its duration.
+
+    Returns:
+        True if the mode was changed
+    """
+    with db_manager.reader.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return False
+    with db_manager.engine.connect() as conn:
+        # Outside any transaction, which VACUUM requires
+        conn.connection.driver_connection.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+    with db_manager.engine.begin() as conn:
+        fulltext.rebuild(conn)
+    return True
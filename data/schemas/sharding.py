@@ -0,0 +1,198 @@
+"""
+Horizontal sharding of `content_events` and `analytics_records` over several SQLite files.
+
+SQLite admits one writer per database file, so a single file caps write
+throughput at one transaction at a time. With ``ASTRA_DB_SHARDS=N`` the
+content and analytics tables are spread over N files: shard 0 is the regular
+database (e.g. ``data/astra.db``) and shard i is ``data/astra-shard<i>.db``
+next to it. Every file has its own ``DatabaseManager`` (writer, reader pool
+and DB threads), so writes to different shards commit in parallel.
+
+Rows are routed by a stable hash (CRC32) of the event id. A content event,
+its sightings and its analytics records therefore always share a shard, and
+per-event joins (search result labels, label filters) stay inside one file.
+Everything else (jobs, the event log, sync state, detection results) stays
+in shard 0. Each shard carries its own full-text index and outbox.
+
+Reads fan out to all shards in parallel on their reader threads; the
+callers merge the per-shard results (``merge_sorted`` for ordered results,
+sums for counts). After changing the shard count, move rows to their new
+shard with ``tools/scripts/rebalance_shards.py``.
+
+Configuration (environment):
+    ASTRA_DB_SHARDS   number of shard files (default 1 = unsharded)
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import zlib
+from concurrent.futures import wait
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, TypeVar
+
+from database import DatabaseManager
+
+T = TypeVar("T")
+
+SHARD_COUNT = max(1, int(os.getenv("ASTRA_DB_SHARDS", "1")))
+
+
+def shard_paths(base_path: str, count: int) -> List[str]:
+    """File of every shard: ``base_path`` itself, then ``<root>-shard<i><ext>``."""
+    root, ext = os.path.splitext(base_path)
+    return [base_path] + [f"{root}-shard{index}{ext}" for index in range(1, count)]
+
+
+def shard_index(key: str, count: int) -> int:
+    """Shard of a routing key (stable across processes, unlike ``hash()``)."""
+    if count <= 1:
+        return 0
+    return zlib.crc32(key.encode("utf-8")) % count
+
+
+def merge_sorted(results: Iterable[Iterable[T]], key: Callable[[T], Any], reverse: bool = False,
+                 limit: Optional[int] = None) -> List[T]:
+    """
+    Merge per-shard results that are each sorted by ``key``.
+
+    Args:
+        results: One sorted iterable per shard
+        key: Sort key of an item
+        reverse: The inputs are sorted in descending order
+        limit: Keep only the first ``limit`` items of the merged order
+    """
+    return list(itertools.islice(heapq.merge(*results, key=key, reverse=reverse), limit))
+
+
+class ShardSet:
+    """
+    The shard files of one database, with routing and parallel fan-out.
+
+    With one shard every helper degenerates to a plain call on the single
+    ``DatabaseManager``, so unsharded deployments run the same code paths.
+    """
+
+    def __init__(self, base_path: Optional[str] = None, count: int = SHARD_COUNT):
+        """
+        Args:
+            base_path: Shard 0 (default: the process default database)
+            count: Number of shards
+        """
+        primary = DatabaseManager(base_path)
+        self.managers: List[DatabaseManager] = [primary] + [
+            DatabaseManager(path) for path in shard_paths(primary.db_path, max(1, count))[1:]
+        ]
+
+    @property
+    def count(self) -> int:
+        return len(self.managers)
+
+    @property
+    def sharded(self) -> bool:
+        return self.count > 1
+
+    @property
+    def primary(self) -> DatabaseManager:
+        """Shard 0, which also holds all unsharded tables."""
+        return self.managers[0]
+
+    def index_for(self, key: str) -> int:
+        return shard_index(key, self.count)
+
+    def for_key(self, key: str) -> DatabaseManager:
+        return self.managers[self.index_for(key)]
+
+    def partition(self, items: Iterable[T], key: Callable[[T], str]) -> Dict[int, List[T]]:
+        """Group items by shard of ``key(item)``, keeping their relative order."""
+        parts: Dict[int, List[T]] = {}
+        for item in items:
+            parts.setdefault(self.index_for(key(item)), []).append(item)
+        return parts
+
+    @staticmethod
+    def _on_reader(db_manager: DatabaseManager, fn: Callable, *args):
+        with db_manager.reader.connect() as conn:
+            return fn(conn, *args)
+
+    @staticmethod
+    def _on_writer(db_manager: DatabaseManager, fn: Callable, *args):
+        with db_manager.engine.begin() as conn:
+            return fn(conn, *args)
+
+    async def read_all(self, fn: Callable, *args) -> List[Any]:
+        """
+        Call ``fn(conn, *args)`` on a reader connection of every shard, in parallel.
+
+        Returns:
+            The results in shard order
+        """
+        return list(await asyncio.gather(*(
+            manager.run_read(self._on_reader, manager, fn, *args) for manager in self.managers
+        )))
+
+    def read_all_sync(self, fn: Callable, *args) -> List[Any]:
+        """Blocking ``read_all``, for code already running off the event loop."""
+        futures = [
+            manager.read_executor.submit(self._on_reader, manager, fn, *args) for manager in self.managers
+        ]
+        wait(futures)
+        return [future.result() for future in futures]
+
+    async def read_key(self, key: str, fn: Callable, *args) -> Any:
+        """Call ``fn(conn, *args)`` on a reader connection of the shard that owns ``key``."""
+        manager = self.for_key(key)
+        return await manager.run_read(self._on_reader, manager, fn, *args)
+
+    async def read_keys(self, keys: Iterable[str], fn: Callable) -> Dict[int, Any]:
+        """
+        Call ``fn(conn, shard_keys)`` on only the shards that own some of ``keys``.
+
+        Returns:
+            shard index -> result
+        """
+        parts = self.partition(keys, lambda key: key)
+        results = await asyncio.gather(*(
+            self.managers[index].run_read(self._on_reader, self.managers[index], fn, part)
+            for index, part in parts.items()
+        ))
+        return dict(zip(parts, results))
+
+    async def write_parts(self, parts: Dict[int, Any], fn: Callable) -> Dict[int, Any]:
+        """
+        Call ``fn(conn, part)`` in a write transaction on each shard in ``parts``, in parallel.
+
+        Every shard commits on its own; there is no cross-shard atomicity.
+
+        Returns:
+            shard index -> result
+        """
+        results = await asyncio.gather(*(
+            self.managers[index].run_write(self._on_writer, self.managers[index], fn, part)
+            for index, part in parts.items()
+        ))
+        return dict(zip(parts, results))
+
+    def write_parts_sync(self, parts: Dict[Hashable, Any], fn: Callable) -> Dict[int, Any]:
+        """
+        Blocking ``write_parts``.
+
+        Must not be called on a DB writer thread: it waits for the writer
+        threads of the shards, which would deadlock on its own.
+        """
+        futures = {
+            index: self.managers[index].write_executor.submit(self._on_writer, self.managers[index], fn, part)
+            for index, part in parts.items()
+        }
+        wait(futures.values())
+        return {index: future.result() for index, future in futures.items()}
+
+    def dispose(self):
+        for manager in self.managers:
+            manager.dispose()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Shard count and the database metrics of every shard."""
+        return {
+            "shards": self.count,
+            "databases": [manager.metrics() for manager in self.managers],
+        }
@@ -0,0 +1,195 @@
+"""
+Mergeable streaming sketches with constant memory per group.
+
+    HyperLogLog   distinct counts (e.g. distinct sources or event ids)
+    KLLSketch     quantiles of a numeric stream (e.g. detection confidence)
+
+Both merge losslessly with sketches of the same parameters, so per-bucket
+sketches can be combined into any time range. Both serialize to compact
+bytes for storage in a BLOB column.
+
+Error bounds with the defaults:
+    HyperLogLog(p=11)   2048 registers, relative standard error 1.04/sqrt(2048) ≈ 2.3%
+                        (≈ 4.6% at two standard errors); small sets use linear
+                        counting and are usually exact or within one or two
+    KLLSketch(k=200)    normalized rank error ≈ 1.65% with 99% confidence, i.e. the value
+                        returned for p95 has a true rank between ~p93.4 and ~p96.6
+"""
+import math
+import random
+import struct
+import zlib
+from array import array
+from hashlib import blake2b
+from typing import Iterable, List, Optional
+
+
+def hash64(value: str) -> int:
+    """64-bit hash used by HyperLogLog (compute once to add a value to several sketches)."""
+    return int.from_bytes(blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch with 2**p one-byte registers."""
+
+    def __init__(self, p: int = 11, registers: Optional[bytearray] = None):
+        if not 4 <= p <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    @property
+    def std_error(self) -> float:
+        """Relative standard error of ``estimate()``."""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, hashed: int):
+        """Add a value by its ``hash64``."""
+        index = hashed >> (64 - self.p)
+        remainder = hashed & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Fold ``other`` into this sketch (register-wise max) and return self."""
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * self.m and zeros:
+            return self.m * math.log(self.m / zeros)  # linear counting for small cardinalities
+        return raw
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.p]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(data[0], bytearray(zlib.decompress(data[1:])))
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items live in a hierarchy of compactors; a full compactor sorts its items
+    and promotes every other one (random offset) to the next level, where each
+    item stands for twice as many inputs. Capacities shrink geometrically
+    towards the lower levels, so memory stays O(k) regardless of stream length.
+    """
+
+    C = 2.0 / 3.0
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.n = 0
+        self.size = 0
+        self.compactors: List[List[float]] = []
+        self._grow()
+
+    @property
+    def rank_error(self) -> float:
+        """Approximate normalized rank error (99% confidence); scales as 1/k from 1.65% at k=200."""
+        return 0.0165 * 200 / self.k
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.C ** depth * self.k)) + 1
+
+    def update(self, value: float):
+        self.compactors[0].append(value)
+        self.n += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            compactor = self.compactors[level]
+            if len(compactor) >= self._capacity(level):
+                if level + 1 >= len(self.compactors):
+                    self._grow()
+                compactor.sort()
+                kept = [compactor.pop()] if len(compactor) % 2 else []
+                promoted = compactor[random.randint(0, 1)::2]
+                self.compactors[level + 1].extend(promoted)
+                self.size -= len(compactor) - len(promoted)
+                self.compactors[level] = kept
+                return
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold ``other`` into this sketch and return self."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self.size += other.size
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """Approximate values at the given quantiles (0..1); None when empty."""
+        weighted = sorted(
+            (value, 1 << level) for level, items in enumerate(self.compactors) for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for q in qs:
+            if not weighted:
+                results.append(None)
+                continue
+            target = q * total
+            cumulative = 0
+            answer = weighted[-1][0]
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    answer = value
+                    break
+            results.append(answer)
+        return results
+
+    def to_bytes(self) -> bytes:
+        header = struct.pack(">HQH", self.k, self.n, len(self.compactors))
+        body = b"".join(
+            struct.pack(">I", len(items)) + array("f", items).tobytes() for items in self.compactors
+        )
+        return header + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KLLSketch":
+        k, n, levels = struct.unpack_from(">HQH", data)
+        sketch = cls(k)
+        sketch.n = n
+        sketch.compactors = []
+        offset = struct.calcsize(">HQH")
+        for _ in range(levels):
+            (count,) = struct.unpack_from(">I", data, offset)
+            offset += 4
+            items = array("f")
+            items.frombytes(data[offset:offset + 4 * count])
+            offset += 4 * count
+            sketch.compactors.append(list(items))
+        sketch.size = sum(len(items) for items in sketch.compactors)
+        sketch.max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        return sketch
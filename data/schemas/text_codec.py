@@ -0,0 +1,185 @@
+"""
+Transparent compression for large text columns.
+
+Compressed values are stored as BLOBs with a short header so compressed and
+plain rows can live side by side in the same column:
+
+    b"AZz" + zlib stream                          plain zlib
+    b"AZd" + 4-byte dictionary id + zlib stream   zlib with a shared preset dictionary
+
+Plain ``str`` values are returned unchanged, so rows written before
+compression was enabled keep working. Shared dictionaries help short messages,
+where plain zlib has too little context to find repeats; they are stored in
+the ``compression_dictionaries`` table and resolved through a loader that
+``DatabaseManager`` installs.
+
+Configuration (environment):
+    ASTRA_TEXT_COMPRESSION            off (default) | zlib | dict
+    ASTRA_TEXT_COMPRESSION_MIN_BYTES  values shorter than this stay plain (default 64)
+    ASTRA_TEXT_COMPRESSION_DICT_ID    dictionary used in ``dict`` mode (default: newest)
+"""
+import os
+import re
+import struct
+import zlib
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from sqlalchemy.types import Text, TypeDecorator
+
+MAGIC = b"AZ"
+CODEC_ZLIB = b"z"
+CODEC_DICT = b"d"
+COMPRESSION_LEVEL = 6
+MAX_DICTIONARY_SIZE = 32768  # zlib only uses the last 32 KB of a preset dictionary
+
+MODE_OFF = "off"
+MODE_ZLIB = "zlib"
+MODE_DICT = "dict"
+
+_settings = {
+    "mode": os.getenv("ASTRA_TEXT_COMPRESSION", MODE_OFF).lower(),
+    "min_bytes": int(os.getenv("ASTRA_TEXT_COMPRESSION_MIN_BYTES", "64")),
+    "dictionary_id": int(os.getenv("ASTRA_TEXT_COMPRESSION_DICT_ID", "0")) or None,
+}
+_dictionaries: Dict[int, bytes] = {}
+_dictionary_loader: Optional[Callable[[int], Optional[bytes]]] = None
+
+
+def configure(mode: Optional[str] = None, min_bytes: Optional[int] = None,
+              dictionary_id: Optional[int] = None):
+    """Override the compression settings read from the environment."""
+    if mode is not None:
+        if mode not in (MODE_OFF, MODE_ZLIB, MODE_DICT):
+            raise ValueError(f"Unknown text compression mode: {mode}")
+        _settings["mode"] = mode
+    if min_bytes is not None:
+        _settings["min_bytes"] = min_bytes
+    if dictionary_id is not None:
+        _settings["dictionary_id"] = dictionary_id
+
+
+def settings() -> Dict[str, Union[str, int, None]]:
+    """Current compression settings."""
+    return dict(_settings)
+
+
+def register_dictionary(dictionary_id: int, dictionary: bytes):
+    """Make a preset dictionary available for compression and decompression."""
+    _dictionaries[dictionary_id] = dictionary
+
+
+def set_dictionary_loader(loader: Callable[[int], Optional[bytes]]):
+    """Install a callback that fetches dictionaries not registered in this process."""
+    global _dictionary_loader
+    _dictionary_loader = loader
+
+
+def get_dictionary(dictionary_id: int) -> bytes:
+    """Return a registered dictionary, loading it on first use."""
+    if dictionary_id not in _dictionaries and _dictionary_loader is not None:
+        loaded = _dictionary_loader(dictionary_id)
+        if loaded is not None:
+            _dictionaries[dictionary_id] = loaded
+    if dictionary_id not in _dictionaries:
+        raise LookupError(f"Compression dictionary {dictionary_id} is not available")
+    return _dictionaries[dictionary_id]
+
+
+def is_compressed(value) -> bool:
+    """True if a stored value carries the compression header."""
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def compress_text(value: str, mode: Optional[str] = None,
+                  dictionary_id: Optional[int] = None) -> Union[str, bytes]:
+    """
+    Encode text for storage according to the configured mode.
+
+    Returns the original string when compression is off, the text is below
+    the size threshold, or compression would not make it smaller.
+    """
+    mode = mode or _settings["mode"]
+    raw = value.encode("utf-8")
+    if mode == MODE_OFF or len(raw) < _settings["min_bytes"]:
+        return value
+
+    if mode == MODE_DICT:
+        dictionary_id = dictionary_id or _settings["dictionary_id"]
+        if dictionary_id is None:
+            mode = MODE_ZLIB  # no dictionary trained yet
+        else:
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=get_dictionary(dictionary_id))
+            encoded = (MAGIC + CODEC_DICT + struct.pack(">I", dictionary_id)
+                       + compressor.compress(raw) + compressor.flush())
+    if mode == MODE_ZLIB:
+        encoded = MAGIC + CODEC_ZLIB + zlib.compress(raw, COMPRESSION_LEVEL)
+    elif mode != MODE_DICT:
+        raise ValueError(f"Unknown text compression mode: {mode}")
+
+    return encoded if len(encoded) < len(raw) else value
+
+
+def decompress_text(value) -> Optional[str]:
+    """Decode a stored value (compressed BLOB, plain BLOB or str) back to text."""
+    if value is None or isinstance(value, str):
+        return value
+    data = bytes(value)
+    if data[:2] != MAGIC:
+        return data.decode("utf-8")
+
+    codec = data[2:3]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data[3:]).decode("utf-8")
+    if codec == CODEC_DICT:
+        (dictionary_id,) = struct.unpack(">I", data[3:7])
+        decompressor = zlib.decompressobj(zdict=get_dictionary(dictionary_id))
+        return (decompressor.decompress(data[7:]) + decompressor.flush()).decode("utf-8")
+    raise ValueError(f"Unknown text codec: {codec!r}")
+
+
+def train_dictionary(samples: Iterable[str], size: int = MAX_DICTIONARY_SIZE) -> bytes:
+    """
+    Build a zlib preset dictionary from sample texts.
+
+    Picks the word n-grams that would save the most bytes (frequency x length)
+    and lays them out with the most valuable ones last, since zlib favours
+    matches near the end of the dictionary (shortest back-references).
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        words = re.findall(r"\S+\s*", sample)
+        for n in (1, 2, 3, 4):
+            for start in range(0, len(words) - n + 1):
+                counts["".join(words[start:start + n])] += 1
+
+    scored = sorted(
+        ((count * len(gram), gram) for gram, count in counts.items() if count > 1 and len(gram) > 3),
+        reverse=True,
+    )
+    chosen = []
+    used = 0
+    for _, gram in scored:
+        encoded = gram.encode("utf-8")
+        if used + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        used += len(encoded)
+        if used >= size:
+            break
+    return b"".join(reversed(chosen))
+
+
+class CompressedText(TypeDecorator):
+    """Text column that is transparently compressed on write and decompressed on read."""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
@@ -0,0 +1,236 @@
+"""
+Write-behind buffering for ASTRA persistence.
+
+`WriteBehindBuffer` decouples API latency from SQLite commit latency: callers
+submit rows onto a bounded in-memory queue and a background task flushes them
+in batches, either when enough rows are pending or when the flush interval
+elapses. The flush function runs in a worker thread so the event loop is never
+blocked on disk I/O.
+
+Two durability modes are supported:
+    - ``commit``: ``submit`` returns only after the rows' batch has committed,
+      so a write is never acknowledged before it is durable. Concurrent callers
+      still share one transaction per flush.
+    - ``enqueue``: ``submit`` returns as soon as the rows are queued. Rows still
+      in memory are lost if the process dies before the next flush.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+DURABILITY_COMMIT = "commit"
+DURABILITY_ENQUEUE = "enqueue"
+
+
+class WriteBehindBuffer:
+    """Bounded queue of pending writes flushed in batches by a background task."""
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], Optional[List[Any]]],
+        name: str = "writes",
+        max_queue: int = 50000,
+        flush_size: int = 1000,
+        flush_interval: float = 0.2,
+        durability: str = DURABILITY_COMMIT,
+        max_retries: int = 3,
+        runner: Optional[Callable[..., Awaitable[Any]]] = None,
+    ):
+        """
+        Args:
+            flush_fn: Blocking function that persists a list of rows in one
+                transaction and returns one result per row (or None)
+            name: Label used in logs and metrics
+            max_queue: Maximum number of rows held in memory; ``submit`` waits
+                while the queue is full (backpressure)
+            flush_size: Pending row count that triggers an immediate flush
+            flush_interval: Maximum seconds a row waits before being flushed
+            durability: ``commit`` or ``enqueue`` (see module docstring)
+            max_retries: Flush attempts for ``enqueue`` rows before they are dropped
+            runner: Coroutine function that runs ``flush_fn`` off the event loop,
+                e.g. ``DatabaseManager.run_write`` (default: ``asyncio.to_thread``)
+        """
+        if durability not in (DURABILITY_COMMIT, DURABILITY_ENQUEUE):
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_queue = max_queue
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.max_retries = max_retries
+        self.runner = runner or asyncio.to_thread
+
+        # Entries are (rows, future or None, attempts)
+        self._entries: Deque[Tuple[List[Any], Optional[asyncio.Future], int]] = deque()
+        self._pending_rows = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._stopping = False
+
+        self._enqueued_rows = 0
+        self._flushed_rows = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._dropped_rows = 0
+        self._last_flush_ms = 0.0
+        self._last_flush_rows = 0
+
+    def start(self):
+        """Start the background flush task on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting writes and drain everything still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, rows: List[Any]) -> Optional[List[Any]]:
+        """
+        Queue rows for writing.
+
+        Returns:
+            In ``commit`` mode, the flush function's per-row results once the
+            rows are committed. In ``enqueue`` mode, None once they are queued.
+        """
+        if self._stopping:
+            raise RuntimeError(f"Write buffer '{self.name}' is shutting down")
+        if not rows:
+            return [] if self.durability == DURABILITY_COMMIT else None
+        self.start()
+
+        async with self._space:
+            # A single oversized submission is admitted once the queue is empty
+            await self._space.wait_for(
+                lambda: self._pending_rows == 0 or self._pending_rows + len(rows) <= self.max_queue
+            )
+            future = None
+            if self.durability == DURABILITY_COMMIT:
+                future = asyncio.get_running_loop().create_future()
+            self._entries.append((list(rows), future, 0))
+            self._pending_rows += len(rows)
+            self._enqueued_rows += len(rows)
+
+        if self._pending_rows >= self.flush_size:
+            self._wakeup.set()
+        if future is not None:
+            return await future
+        return None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and flush counters for monitoring endpoints."""
+        return {
+            "name": self.name,
+            "durability": self.durability,
+            "queue_depth": self._pending_rows,
+            "pending_batches": len(self._entries),
+            "max_queue": self.max_queue,
+            "flush_size": self.flush_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued_rows": self._enqueued_rows,
+            "flushed_rows": self._flushed_rows,
+            "flushes": self._flushes,
+            "failed_flushes": self._failed_flushes,
+            "dropped_rows": self._dropped_rows,
+            "last_flush_rows": self._last_flush_rows,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+        }
+
+    async def _run(self):
+        """Flush loop: wake on size threshold or interval, exit once drained."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._entries:
+                flushed = await self._flush_once()
+                if not flushed and not self._stopping:
+                    break  # back off until the next interval after a failure
+                if self._pending_rows < self.flush_size and not self._stopping:
+                    break
+
+            if self._stopping and not self._entries:
+                return
+
+    async def _flush_once(self) -> bool:
+        """Write up to ``flush_size`` rows (whole entries) in one call."""
+        batch = []
+        batch_rows = 0
+        while self._entries and (not batch or batch_rows + len(self._entries[0][0]) <= self.flush_size):
+            entry = self._entries.popleft()
+            batch.append(entry)
+            batch_rows += len(entry[0])
+        all_rows = [row for rows, _, _ in batch for row in rows]
+
+        started = time.perf_counter()
+        try:
+            results = await self.runner(self.flush_fn, all_rows)
+        except Exception as exc:  # noqa: BLE001
+            self._failed_flushes += 1
+            print(f"[WriteBehindBuffer:{self.name}] Flush of {len(all_rows)} rows failed: {exc}")
+            retry = []
+            for rows, future, attempts in batch:
+                if future is not None:
+                    # The caller may have been cancelled or timed out meanwhile
+                    if not future.done():
+                        future.set_exception(exc)
+                    self._pending_rows -= len(rows)
+                elif attempts + 1 < self.max_retries and not self._stopping:
+                    retry.append((rows, future, attempts + 1))
+                else:
+                    self._pending_rows -= len(rows)
+                    self._dropped_rows += len(rows)
+            self._entries.extendleft(reversed(retry))
+            await self._notify_space()
+            return False
+
+        self._flushes += 1
+        self._flushed_rows += len(all_rows)
+        self._last_flush_rows = len(all_rows)
+        self._last_flush_ms = (time.perf_counter() - started) * 1000
+
+        offset = 0
+        for rows, future, _ in batch:
+            if future is not None and not future.done():
+                future.set_result(results[offset:offset + len(rows)] if results is not None else None)
+            offset += len(rows)
+            self._pending_rows -= len(rows)
+        await self._notify_space()
+        return True
+
+    async def _notify_space(self):
+        async with self._space:
+            self._space.notify_all()
+
+
+def write_behind_from_env() -> Optional[Dict[str, Any]]:
+    """
+    Read write-behind settings from the environment.
+
+    Returns:
+        Keyword arguments for ``WriteBehindBuffer``, or None when
+        ``ASTRA_WRITE_BEHIND`` is not enabled
+    """
+    if os.getenv("ASTRA_WRITE_BEHIND", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return {
+        "durability": os.getenv("ASTRA_WRITE_DURABILITY", DURABILITY_COMMIT),
+        "max_queue": int(os.getenv("ASTRA_WRITE_QUEUE_MAX", "50000")),
+        "flush_size": int(os.getenv("ASTRA_WRITE_FLUSH_SIZE", "1000")),
+        "flush_interval": int(os.getenv("ASTRA_WRITE_FLUSH_INTERVAL_MS", "200")) / 1000.0,
+    }
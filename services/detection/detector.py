@@ -2,7 +2,9 @@
 Abstract detector interface and detector registry.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Type
+from typing import Dict, List, Type
+import hashlib
+import json
 import sys
 import os
 
@@ -13,6 +15,9 @@ from models import DetectionRequest, DetectionResult
 class Detector(ABC):
     """Base class for all detection models."""
     
+    # Bump when a detector's logic changes so stored results are not reused
+    VERSION = "1"
+    
     def __init__(self, config: dict):
         self.config = config
     
@@ -29,11 +34,33 @@ class Detector(ABC):
         """
         pass
     
+    async def detect_batch(self, requests: List[DetectionRequest]) -> List[DetectionResult]:
+        """
+        Analyze several texts; results are returned in request order.
+        
+        The default runs ``detect`` per request. Detectors whose models batch
+        efficiently (e.g. embedding models) can override this.
+        """
+        return [await self.detect(request) for request in requests]
+    
     @property
     @abstractmethod
     def model_name(self) -> str:
         """Unique identifier for this detector."""
         pass
+    
+    @property
+    def version(self) -> str:
+        """
+        Identifies the detector's behaviour: model name, ``VERSION`` and a config digest.
+        
+        Persisted results are only reused for the same version, so changing
+        the detector code (bump ``VERSION``), its model or its config never
+        serves results computed by a different setup.
+        """
+        config = json.dumps(self.config, sort_keys=True, default=str)
+        digest = hashlib.sha256(config.encode("utf-8")).hexdigest()[:12]
+        return f"{self.model_name}:{self.VERSION}:{digest}"
 
 
 class DetectorRegistry:
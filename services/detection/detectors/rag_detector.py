@@ -2,9 +2,11 @@
 RAG-based detector using local embeddings (Sentence Transformers).
 Retrieves similar examples from a knowledge base to classify content.
 """
+import asyncio
 import sys
 import os
 from typing import List, Dict, Any
+import numpy as np
 import torch
 
 try:
@@ -22,7 +24,15 @@ class RagDetector(Detector):
     """
     RAG detector that uses semantic embeddings to retrieve similar labeled examples.
     Uses sentence-transformers/all-MiniLM-L6-v2 by default.
+    
+    Query texts are embedded as float16, the format of the shared embedding
+    store. With ``embeddings`` set to an `EmbeddingStore` of the same model,
+    texts already embedded (e.g. by the ingestion embedding stage) are not
+    encoded again, and new ones are added to the store.
     """
+    
+    # 2: query embeddings rounded to float16
+    VERSION = "2"
 
     def __init__(self, config: dict):
         super().__init__(config)
@@ -32,6 +42,8 @@ class RagDetector(Detector):
         # Load model
         model_path = config.get("model_path") or os.getenv("RAG_MODEL_PATH")
         model_id = config.get("model_id", "sentence-transformers/all-MiniLM-L6-v2")
+        self.model_id = model_id
+        self.embeddings = None  # EmbeddingStore of model_id, attached by the service
         
         # If model_path is set, use it; otherwise download/cache model_id
         load_path = model_path if model_path else model_id
@@ -59,17 +71,36 @@ class RagDetector(Detector):
     def model_name(self) -> str:
         return "rag-embedding-knn"
 
+    def _encode(self, texts: List[str]):
+        return self.model.encode(texts, convert_to_numpy=True).astype(np.float16)
+
+    async def _embed(self, requests: List[DetectionRequest]) -> torch.Tensor:
+        """Float16-rounded query embeddings, from the embedding store when attached."""
+        texts = [request.text for request in requests]
+        if self.embeddings is not None:
+            event_ids = [(request.metadata or {}).get("event_id") for request in requests]
+            vectors = await self.embeddings.embed(texts, self._encode, event_ids)
+        else:
+            vectors = await asyncio.to_thread(self._encode, texts)
+        return torch.from_numpy(vectors.astype(np.float32))
+
     async def detect(self, request: DetectionRequest) -> DetectionResult:
         """
         Detect by finding the most semantically similar example in the knowledge base.
         """
-        # Embed the input text
-        query_embedding = self.model.encode(request.text, convert_to_tensor=True)
+        return (await self.detect_batch([request]))[0]
+
+    async def detect_batch(self, requests: List[DetectionRequest]) -> List[DetectionResult]:
+        """Embed all texts in one model call, then classify each by its nearest examples."""
+        if not requests:
+            return []
+        query_embeddings = await self._embed(requests)
 
-        # Compute cosine similarity with all KB entries
-        # cos_sim returns a tensor of shape (1, len(kb))
-        cos_scores = util.cos_sim(query_embedding, self.kb_embeddings)[0]
+        # Cosine similarity with all KB entries, shape (len(requests), len(kb))
+        all_scores = util.cos_sim(query_embeddings.to(self.kb_embeddings.device), self.kb_embeddings)
+        return [self._classify(cos_scores) for cos_scores in all_scores]
 
+    def _classify(self, cos_scores: torch.Tensor) -> DetectionResult:
         # Find top k matches
         # top_results is a named tuple (values, indices)
         top_k = min(self.k, len(self.knowledge_base))
@@ -1,6 +1,7 @@
 """Detection service main application."""
 from fastapi import FastAPI, HTTPException
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 import sys
 import os
 
@@ -8,7 +9,10 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
 
 from models import DetectionRequest, DetectionResult
-from detector import DetectorRegistry
+from database import DatabaseManager, compute_content_hash
+from detector import Detector, DetectorRegistry
+from result_store import SQLiteDetectionStore
+from near_duplicates import NearDuplicateIndex
 
 # Import detectors to register them
 from detectors import simple_detector      # registers lightweight simple detector
@@ -21,11 +25,57 @@ except Exception:  # noqa: BLE001
 
 app = FastAPI(title="ASTRA Detection Service", version="0.1.0")
 
+# Optional per-service database file (default: ASTRA_DB_PATH or data/astra.db)
+if os.getenv("DETECTION_DB_PATH"):
+    DatabaseManager.set_default(os.getenv("DETECTION_DB_PATH"))
+
+# Every computed result is persisted; with reuse on, text already scored by
+# the same detector version is answered from the stored result
+result_store = SQLiteDetectionStore()
+REUSE_RESULTS = os.getenv("DETECTION_REUSE_RESULTS", "1").lower() not in ("0", "false", "no")
+
+# Lightly edited copies of a detected text inherit its result (MinHash LSH)
+NEAR_DUP_ENABLED = os.getenv("DETECTION_NEAR_DUP", "1").lower() not in ("0", "false", "no")
+near_duplicates = NearDuplicateIndex(result_store.db_manager)
+
+# Embedding detectors read and extend the shared embedding store (filled by
+# the ingestion embedding stage when both use the same database file)
+REUSE_EMBEDDINGS = os.getenv("DETECTION_REUSE_EMBEDDINGS", "1").lower() not in ("0", "false", "no")
+embedding_stores = {}
+
+
+def attach_embedding_store(detector: Detector):
+    """Give an embedding detector the store of its model, if reuse is on and numpy is available."""
+    model_id = getattr(detector, "model_id", None)
+    if not REUSE_EMBEDDINGS or not hasattr(detector, "embeddings") or model_id is None:
+        return
+    if model_id not in embedding_stores:
+        try:
+            from embeddings import EmbeddingStore
+            embedding_stores[model_id] = EmbeddingStore(model_id, result_store.db_manager)
+        except RuntimeError as exc:
+            print(f"[Detection] Embedding reuse disabled: {exc}")
+            return
+    detector.embeddings = embedding_stores[model_id]
+
 # Initialize default detector (lazy loading for production)
 default_detector = None
 DETECTOR_NAME = os.getenv("DETECTOR_NAME", "simple")
 
 
+@app.on_event("startup")
+async def start_near_duplicates():
+    """Start persisting near-duplicate signatures in the background."""
+    if NEAR_DUP_ENABLED:
+        near_duplicates.start()
+
+
+@app.on_event("shutdown")
+async def persist_near_duplicates():
+    """Write signatures not persisted yet before the process exits."""
+    await near_duplicates.stop()
+
+
 def get_detector():
     """Lazy initialization of detector."""
     global default_detector
@@ -47,6 +97,7 @@ def get_detector():
             if model_path:
                 config["model_path"] = model_path
             default_detector = DetectorRegistry.get_detector("rag", config)
+            attach_embedding_store(default_detector)
         else:
             default_detector = DetectorRegistry.get_detector("simple", {
                 "threshold_len": 600
@@ -54,6 +105,91 @@ def get_detector():
     return default_detector
 
 
+async def detect_with_reuse(detector: Detector, requests: List[DetectionRequest],
+                            refresh: bool = False) -> List[DetectionResult]:
+    """
+    Detect a batch, reusing stored results and persisting new ones.
+    
+    Texts with a stored result for ``detector.version`` are not run through
+    the detector; repeated texts within the batch are detected once. With
+    near-duplicate reuse on, a text whose MinHash similarity to an already
+    detected text (or an earlier text of the batch) reaches the threshold
+    inherits that representative's result; the inherited result is stored
+    for the copy too. An ``event_id`` in a request's metadata is set on its
+    result.
+    
+    Args:
+        detector: Active detector
+        requests: DetectionRequests to analyze
+        refresh: Ignore stored results and detect everything again
+    
+    Returns:
+        DetectionResults in request order; reused ones carry
+        ``metadata.reused = {result_id, detected_at}``, inherited ones
+        ``metadata.near_duplicate = {representative_hash, result_id, similarity, detected_at}``
+        (``result_id`` is None when the representative was detected in the same batch)
+    """
+    version = detector.version
+    hashes = [compute_content_hash(request.text or "") for request in requests]
+    stored = {} if refresh or not REUSE_RESULTS else await result_store.lookup(hashes, version)
+    
+    # One detector call per distinct text that has no stored result
+    pending = {}
+    for request, content_hash in zip(requests, hashes):
+        if content_hash not in stored and content_hash not in pending:
+            pending[content_hash] = request
+    
+    # Near-duplicates of detected texts inherit the representative's result
+    signatures, matches, representatives = {}, {}, {}
+    if pending and NEAR_DUP_ENABLED and REUSE_RESULTS and not refresh:
+        signatures, matches = await near_duplicates.match(
+            version, {content_hash: request.text or "" for content_hash, request in pending.items()}
+        )
+        indexed = [representative for representative, _ in matches.values() if representative not in pending]
+        representatives = await result_store.lookup(indexed, version, record_metrics=False) if indexed else {}
+        # Representatives whose stored result has expired no longer count
+        matches = {
+            content_hash: match for content_hash, match in matches.items()
+            if match[0] in pending or match[0] in representatives
+        }
+        pending = {content_hash: request for content_hash, request in pending.items() if content_hash not in matches}
+    
+    fresh = dict(zip(pending, await detector.detect_batch(list(pending.values())))) if pending else {}
+    near_duplicates.add(version, {content_hash: signatures[content_hash] for content_hash in fresh
+                                  if content_hash in signatures})
+    
+    results = []
+    to_save = {}
+    for request, content_hash in zip(requests, hashes):
+        event_id = (request.metadata or {}).get("event_id")
+        if content_hash in fresh:
+            result = fresh[content_hash].model_copy(update={"event_id": event_id})
+            to_save.setdefault((content_hash, event_id), (content_hash, version, result))
+        elif content_hash in matches:
+            representative, similarity = matches[content_hash]
+            result_id, base = representatives.get(representative) or (None, fresh[representative])
+            result = base.model_copy(update={
+                "event_id": event_id,
+                "timestamp": datetime.utcnow(),
+                "metadata": {**base.metadata,
+                             "near_duplicate": {"representative_hash": representative, "result_id": result_id,
+                                                "similarity": round(similarity, 4),
+                                                "detected_at": base.timestamp.isoformat()}}
+            })
+            to_save.setdefault((content_hash, event_id), (content_hash, version, result))
+        else:
+            result_id, previous = stored[content_hash]
+            result = previous.model_copy(update={
+                "event_id": event_id,
+                "timestamp": datetime.utcnow(),
+                "metadata": {**previous.metadata,
+                             "reused": {"result_id": result_id, "detected_at": previous.timestamp.isoformat()}}
+            })
+        results.append(result)
+    await result_store.save(list(to_save.values()))
+    return results
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -68,24 +204,85 @@ async def root():
 
 
 @app.post("/detect", response_model=DetectionResult)
-async def detect_content(request: DetectionRequest):
+async def detect_content(request: DetectionRequest, refresh: bool = False):
     """
     Analyze text content for AI-generated signals.
     
     Args:
-        request: DetectionRequest with text to analyze
+        request: DetectionRequest with text to analyze (``metadata.event_id``
+            links the stored result to an event)
+        refresh: Detect again even if a stored result exists
     
     Returns:
         DetectionResult with classification and confidence
     """
     try:
         detector = get_detector()
-        result = await detector.detect(request)
-        return result
+        results = await detect_with_reuse(detector, [request], refresh)
+        return results[0]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+
+
+@app.post("/detect/batch", response_model=List[DetectionResult])
+async def detect_content_batch(requests: List[DetectionRequest], refresh: bool = False):
+    """
+    Analyze several texts in one call.
+    
+    Args:
+        requests: DetectionRequests to analyze
+        refresh: Detect again even if stored results exist
+    
+    Returns:
+        DetectionResults in the same order as the requests
+    """
+    try:
+        detector = get_detector()
+        return await detect_with_reuse(detector, requests, refresh)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
 
+@app.get("/results")
+async def list_results(event_id: Optional[str] = None, text: Optional[str] = None,
+                       content_hash: Optional[str] = None, detector_version: Optional[str] = None,
+                       limit: int = 100):
+    """
+    Stored detection results, newest first.
+    
+    Args:
+        event_id: Only results for this event
+        text: Only results for this exact text (matched by content hash)
+        content_hash: Only results for this content hash (e.g. a
+            ``metadata.near_duplicate.representative_hash``)
+        detector_version: Only results of this detector version
+            (``GET /detector`` shows the active one)
+        limit: Maximum results (capped at 1000)
+    """
+    if text:
+        content_hash = compute_content_hash(text)
+    return await result_store.get_results(event_id, content_hash, detector_version, limit)
+
+
+@app.get("/metrics/results")
+async def result_metrics():
+    """Reuse hit ratio, stored-result counters and near-duplicate matches."""
+    return {"reuse_enabled": REUSE_RESULTS, **result_store.metrics(),
+            "near_duplicates": {"enabled": NEAR_DUP_ENABLED, **near_duplicates.metrics()}}
+
+
+@app.get("/metrics/embeddings")
+async def embedding_metrics():
+    """Size and reuse counters of the embedding stores used by embedding detectors."""
+    return {"reuse_enabled": REUSE_EMBEDDINGS, "stores": [store.metrics() for store in embedding_stores.values()]}
+
+
+@app.get("/metrics/database")
+async def database_metrics():
+    """Connection-pool and lock-wait metrics of the detection database."""
+    return result_store.db_manager.metrics()
+
+
 @app.get("/models")
 async def list_models():
     """List available detector models."""
@@ -103,6 +300,8 @@ async def get_active_detector():
     available = DetectorRegistry.list_detectors()
     return {
         "active_detector": DETECTOR_NAME,
+        # Known once the detector is loaded (first request or switch)
+        "detector_version": default_detector.version if default_detector is not None else None,
         "available_detectors": available,
     }
 
@@ -0,0 +1,218 @@
+"""
+Near-duplicate index of detected texts, for reusing results across edited copies.
+
+Coordinated campaigns post many lightly edited copies of one text. Exact
+result reuse (by content hash) misses them, so every copy would run through
+the detector. `NearDuplicateIndex` keeps a MinHash signature of every text
+the detector actually scored, per detector version, in an in-memory LSH
+index (see minhash.py). A new text whose estimated similarity to an indexed
+text reaches the threshold inherits that representative's stored result
+instead of being detected; copies are not indexed themselves, so a cluster
+keeps a single representative.
+
+New signatures are written to ``detection_signatures`` in the background
+every ``persist_interval`` seconds (and on shutdown); the index of a
+detector version is loaded from there on first use. Signatures lost in a
+crash only cost a detector call for the next copy.
+
+Configuration (environment):
+    DETECTION_NEAR_DUP                   enable near-duplicate reuse (default 1)
+    DETECTION_NEAR_DUP_THRESHOLD         minimum estimated Jaccard similarity (default 0.9)
+    DETECTION_NEAR_DUP_PERMUTATIONS      MinHash signature length (default 64)
+    DETECTION_NEAR_DUP_PERSIST_INTERVAL  seconds between signature flushes (default 30)
+"""
+import asyncio
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+import os
+
+from sqlalchemy import select
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from database import DatabaseManager, DetectionSignatureDB
+from minhash import LSHIndex, MinHasher, shingles
+
+DEFAULT_THRESHOLD = float(os.getenv("DETECTION_NEAR_DUP_THRESHOLD", "0.9"))
+DEFAULT_NUM_PERM = int(os.getenv("DETECTION_NEAR_DUP_PERMUTATIONS", "64"))
+DEFAULT_PERSIST_INTERVAL = float(os.getenv("DETECTION_NEAR_DUP_PERSIST_INTERVAL", "30"))
+# Texts with fewer shingles are too short for a meaningful similarity
+MIN_SHINGLES = 8
+
+# content hash -> (representative content hash, estimated similarity)
+Matches = Dict[str, Tuple[str, float]]
+
+
+class NearDuplicateIndex:
+    """Per-detector-version LSH index of representative texts, persisted periodically."""
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, threshold: float = DEFAULT_THRESHOLD,
+                 num_perm: int = DEFAULT_NUM_PERM, persist_interval: float = DEFAULT_PERSIST_INTERVAL):
+        """
+        Args:
+            db_manager: Database holding ``detection_signatures`` (default: process default)
+            threshold: Minimum estimated similarity for a text to inherit a result
+            num_perm: MinHash signature length
+            persist_interval: Seconds between background writes of new signatures
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Near-duplicate threshold must be in (0, 1], got {threshold}")
+        self.db_manager = db_manager or DatabaseManager()
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.persist_interval = persist_interval
+        self._indexes: Dict[str, LSHIndex] = {}
+        self._load_lock = asyncio.Lock()
+        self._unsaved: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._queries = 0
+        self._matches = 0
+        self._query_seconds = 0.0
+        self._persisted = 0
+
+    def start(self):
+        """Start persisting new signatures on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and persist the signatures not written yet."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.persist()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                await self.persist()
+            except Exception as exc:  # keep the rows for the next attempt
+                print(f"[NearDuplicateIndex] Persisting signatures failed: {exc}")
+
+    async def _index(self, detector_version: str) -> LSHIndex:
+        """The index of a detector version, loaded from the database on first use."""
+        index = self._indexes.get(detector_version)
+        if index is not None:
+            return index
+        async with self._load_lock:
+            if detector_version not in self._indexes:
+                index = LSHIndex(self.hasher.num_perm, self.threshold)
+                for content_hash, signature in await self.db_manager.run_read(self._load, detector_version):
+                    if len(signature) == self.hasher.num_perm:
+                        index.add(content_hash, signature)
+                self._indexes[detector_version] = index
+            return self._indexes[detector_version]
+
+    def loaded_index(self, detector_version: str) -> Optional[LSHIndex]:
+        """The in-memory index of a detector version, if it was used since start-up."""
+        return self._indexes.get(detector_version)
+
+    def _load(self, detector_version: str) -> List[Tuple[str, array]]:
+        with self.db_manager.reader.connect() as conn:
+            rows = conn.execute(
+                select(DetectionSignatureDB.content_hash, DetectionSignatureDB.signature)
+                .where(DetectionSignatureDB.detector_version == detector_version)
+            ).all()
+        return [(row.content_hash, MinHasher.from_bytes(row.signature)) for row in rows]
+
+    def _signatures(self, texts: Dict[str, str]) -> Dict[str, array]:
+        signatures = {}
+        for content_hash, text in texts.items():
+            grams = shingles(text, self.hasher.shingle_size)
+            if len(grams) >= MIN_SHINGLES:
+                signatures[content_hash] = self.hasher.signature_of(grams)
+        return signatures
+
+    async def match(self, detector_version: str, texts: Dict[str, str]) -> Tuple[Dict[str, array], Matches]:
+        """
+        Find representatives for texts without a stored result.
+
+        Texts are matched in order against the index and against the texts
+        before them in the batch, so copies within one batch share a
+        representative too (one that is itself in ``texts`` and still has
+        to be detected).
+
+        Args:
+            detector_version: ``Detector.version`` of the active detector
+            texts: content hash -> text
+
+        Returns:
+            (content hash -> signature for texts long enough to sign,
+            content hash -> (representative hash, similarity) for matched texts)
+        """
+        index = await self._index(detector_version)
+        started = time.perf_counter()
+        signatures = await asyncio.to_thread(self._signatures, texts)
+        batch = LSHIndex(self.hasher.num_perm, self.threshold)
+        matches: Matches = {}
+        for content_hash, signature in signatures.items():
+            found = index.query(signature) or batch.query(signature)
+            if found is None:
+                batch.add(content_hash, signature)
+            else:
+                matches[content_hash] = found
+        self._queries += len(texts)
+        self._matches += len(matches)
+        self._query_seconds += time.perf_counter() - started
+        return signatures, matches
+
+    def add(self, detector_version: str, signatures: Dict[str, array]):
+        """Index detected texts as representatives; they are persisted by the background loop."""
+        index = self._indexes.get(detector_version)
+        if index is None:
+            return
+        now = datetime.utcnow()
+        for content_hash, signature in signatures.items():
+            if content_hash in index:
+                continue
+            index.add(content_hash, signature)
+            self._unsaved.append({
+                "detector_version": detector_version,
+                "content_hash": content_hash,
+                "signature": MinHasher.to_bytes(signature),
+                "created_at": now,
+            })
+
+    async def persist(self) -> int:
+        """
+        Write the signatures added since the last call.
+
+        Returns:
+            Signatures written
+        """
+        rows, self._unsaved = self._unsaved, []
+        if not rows:
+            return 0
+        try:
+            await self.db_manager.run_write(self._insert_rows, rows)
+        except Exception:
+            self._unsaved = rows + self._unsaved
+            raise
+        self._persisted += len(rows)
+        return len(rows)
+
+    def _insert_rows(self, rows: List[Dict[str, Any]]):
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(DetectionSignatureDB.__table__.insert().prefix_with("OR IGNORE"), rows)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Index sizes and match counters since start-up."""
+        return {
+            "threshold": self.threshold,
+            "permutations": self.hasher.num_perm,
+            "representatives": {version: len(index) for version, index in self._indexes.items()},
+            "queries": self._queries,
+            "matches": self._matches,
+            "match_ratio": self._matches / self._queries if self._queries else 0.0,
+            "avg_query_us": self._query_seconds / self._queries * 1e6 if self._queries else 0.0,
+            "unsaved": len(self._unsaved),
+            "persisted": self._persisted,
+        }
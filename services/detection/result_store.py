@@ -0,0 +1,161 @@
+"""
+SQLite-backed store of detection results.
+
+Every result the detection service computes is persisted to
+``detection_results`` with the detector type and version, the result
+metadata and the content hash of the analyzed text. Results are looked up by
+(content hash, detector version), so analyzing text that the same detector
+setup has already scored returns the stored result instead of running
+inference again.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import sys
+import os
+from sqlalchemy import select
+
+# Setup path for database models
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from models import DetectionResult
+from database import DatabaseManager, DetectionResultDB, insert_chunked
+
+# Keep IN (...) lookups well below SQLite's bound-parameter limit
+HASH_LOOKUP_CHUNK = 500
+MAX_HISTORY_LIMIT = 1000
+
+
+def _row_to_result(row) -> DetectionResult:
+    """Build a DetectionResult from a ``detection_results`` row."""
+    return DetectionResult(
+        event_id=row.event_id,
+        label=row.label,
+        confidence=row.confidence,
+        model_name=row.detector_type,
+        timestamp=row.timestamp,
+        metadata=json.loads(row.metadata_json) if row.metadata_json else {}
+    )
+
+
+class SQLiteDetectionStore:
+    """
+    Persists detection results and finds reusable ones.
+
+    Queries run through ``DatabaseManager.run_read`` / ``run_write`` so the
+    event loop keeps serving other detection requests meanwhile.
+    """
+
+    def __init__(self):
+        self.db_manager = DatabaseManager()
+        self._lookups = 0
+        self._hits = 0
+        self._saved = 0
+
+    async def lookup(self, content_hashes: List[str], detector_version: str,
+                     record_metrics: bool = True) -> Dict[str, Tuple[int, DetectionResult]]:
+        """
+        Find stored results for texts under one detector version.
+
+        Args:
+            content_hashes: ``compute_content_hash`` of each text
+            detector_version: ``Detector.version`` of the active detector
+            record_metrics: Count the lookup in the reuse hit ratio
+
+        Returns:
+            content hash -> (result id, DetectionResult) for the hashes that have
+            a stored result (the newest one when there are several)
+        """
+        found = await self.db_manager.run_read(self._lookup, list(dict.fromkeys(content_hashes)), detector_version)
+        if record_metrics:
+            self._lookups += len(content_hashes)
+            self._hits += sum(1 for content_hash in content_hashes if content_hash in found)
+        return found
+
+    def _lookup(self, content_hashes: List[str], detector_version: str) -> Dict[str, Tuple[int, DetectionResult]]:
+        found: Dict[str, Tuple[int, DetectionResult]] = {}
+        with self.db_manager.reader.connect() as conn:
+            for start in range(0, len(content_hashes), HASH_LOOKUP_CHUNK):
+                chunk = content_hashes[start:start + HASH_LOOKUP_CHUNK]
+                rows = conn.execute(
+                    select(DetectionResultDB.__table__)
+                    .where(DetectionResultDB.content_hash.in_(chunk),
+                           DetectionResultDB.detector_version == detector_version)
+                    .order_by(DetectionResultDB.id)
+                )
+                for row in rows:
+                    found[row.content_hash] = (row.id, _row_to_result(row))
+        return found
+
+    async def save(self, entries: List[Tuple[str, str, DetectionResult]]) -> int:
+        """
+        Persist freshly computed results in one transaction.
+
+        Args:
+            entries: (content hash, detector version, DetectionResult) per result
+
+        Returns:
+            Number of results stored
+        """
+        rows = [
+            {
+                "event_id": result.event_id,
+                "label": result.label,
+                "confidence": result.confidence,
+                "detector_type": result.detector_model,
+                "detector_version": detector_version,
+                "content_hash": content_hash,
+                "metadata_json": json.dumps(result.metadata, default=str),
+                "timestamp": result.timestamp
+            }
+            for content_hash, detector_version, result in entries
+        ]
+        if not rows:
+            return 0
+        await self.db_manager.run_write(self._insert_rows, rows)
+        self._saved += len(rows)
+        return len(rows)
+
+    def _insert_rows(self, rows: List[Dict[str, Any]]):
+        with self.db_manager.engine.begin() as conn:
+            insert_chunked(conn, DetectionResultDB.__table__, rows)
+
+    async def get_results(self, event_id: Optional[str] = None, content_hash: Optional[str] = None,
+                          detector_version: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Stored results, newest first, optionally for one event, text or detector version.
+
+        Returns:
+            Result dicts with ``id``, ``detector_version`` and ``content_hash``
+            in addition to the DetectionResult fields
+        """
+        query = select(DetectionResultDB.__table__).order_by(DetectionResultDB.id.desc())
+        if event_id:
+            query = query.where(DetectionResultDB.event_id == event_id)
+        if content_hash:
+            query = query.where(DetectionResultDB.content_hash == content_hash)
+        if detector_version:
+            query = query.where(DetectionResultDB.detector_version == detector_version)
+        query = query.limit(max(1, min(limit, MAX_HISTORY_LIMIT)))
+        rows = await self.db_manager.run_read(self._fetch_all, query)
+        return [
+            {
+                "id": row.id,
+                **_row_to_result(row).model_dump(by_alias=True),
+                "detector_version": row.detector_version,
+                "content_hash": row.content_hash,
+            }
+            for row in rows
+        ]
+
+    def _fetch_all(self, query) -> list:
+        with self.db_manager.reader.connect() as conn:
+            return conn.execute(query).all()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Reuse counters since start-up."""
+        return {
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "hit_ratio": self._hits / self._lookups if self._lookups else 0.0,
+            "saved": self._saved,
+        }
@@ -0,0 +1,571 @@
+"""
+Coordination cluster engine: groups copies and paraphrases of a text posted within a sliding time window.
+
+Coordinated campaigns post the same message, lightly edited or reworded,
+from many sources within a short time. `CoordinationEngine` assigns every
+post to a cluster as it arrives:
+
+- exact repeats (content_sightings of one content event) join the cluster
+  of their canonical event,
+- other texts are MinHash-signed (minhash.py; batched over byte shingles
+  when numpy is installed) and looked up in a banded LSH index at
+  ``text_threshold`` estimated Jaccard similarity,
+- once a text's embedding is available (embeddings.py), its random-
+  hyperplane signature is looked up in a second LSH index at
+  ``semantic_threshold`` estimated cosine similarity; a match merges the
+  two clusters.
+
+Lookups only compare a post with the few indexed posts sharing an LSH
+bucket, never with the whole window. Only exemplars are indexed: a post
+that matches an indexed one closely (halfway between the threshold and 1)
+is not indexed itself, so a campaign of thousands of copies keeps a handful
+of bucket entries and a lookup costs about the same as for a unique text.
+When a cluster's last exemplar leaves the window its newest member takes
+its place.
+
+The window follows the newest post timestamp seen (never ahead of the
+clock): posts more than ``window_seconds`` behind it leave their clusters
+and the indexes, and posts arriving that late are ignored. A cluster of one
+post is not a cluster; the post is kept without one until something joins it.
+
+Clusters are scored in [0, 1] as the ``SCORE_WEIGHTS`` weighted sum of
+    size              log(size) / log(SIZE_SATURATION), capped at 1
+    source_diversity  (distinct sources - 1) / (SOURCE_SATURATION - 1), capped at 1
+    time_compression  1 - (last post - first post) / window
+    ai_ratio          AI-labeled posts / posts with a detection label
+
+The engine holds no database state and is not thread-safe: call it from one
+thread (the service's event loop). `sign`, the expensive part, only reads
+the hasher and may run in a worker thread.
+
+Memory: about 0.7 KB per post in the window (signature, preview, index
+entries) plus 32 bytes per post with an embedding signature.
+"""
+import heapq
+import math
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import sys
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from models import ClusterMember, CoordinationCluster
+from minhash import LSHIndex, MinHasher, shingles
+
+DEFAULT_WINDOW_SECONDS = float(os.getenv("GRAPH_WINDOW_SECONDS", "3600"))
+DEFAULT_TEXT_THRESHOLD = float(os.getenv("GRAPH_TEXT_THRESHOLD", "0.8"))
+DEFAULT_SEMANTIC_THRESHOLD = float(os.getenv("GRAPH_SEMANTIC_THRESHOLD", "0.9"))
+DEFAULT_NUM_PERM = int(os.getenv("GRAPH_PERMUTATIONS", "64"))
+DEFAULT_AI_LABELS = tuple(
+    label.strip() for label in os.getenv("GRAPH_AI_LABELS", "AI-generated").split(",") if label.strip()
+)
+# Metadata key identifying the poster (e.g. "author"); default: the connector source only
+SOURCE_KEY = os.getenv("GRAPH_SOURCE_KEY") or None
+
+# Texts with fewer shingles are too short for a meaningful similarity
+MIN_SHINGLES = 8
+PREVIEW_CHARS = 120
+# Random hyperplanes per embedding signature, split into bands of SEMANTIC_ROWS bits
+SEMANTIC_BITS = 256
+SEMANTIC_ROWS = 16
+# Labels of events that have no post in the window are dropped beyond this many
+MAX_UNMATCHED_LABELS = 100_000
+
+SIZE_SATURATION = 50
+SOURCE_SATURATION = 5
+SCORE_WEIGHTS = {"size": 0.3, "source_diversity": 0.3, "time_compression": 0.2, "ai_ratio": 0.2}
+
+
+class Post(NamedTuple):
+    """One posting of a text: a content event or an exact repeat of one."""
+    key: str                 # unique per post: the event id, or "sighting:<shard>:<id>"
+    event_id: str            # canonical content event, shared by its repeats
+    source: str
+    timestamp: datetime
+    text: str
+    sighting: bool = False
+
+
+def poster_of(source: str, metadata: Optional[Dict[str, Any]], key: Optional[str] = SOURCE_KEY) -> str:
+    """Source identity of a post: the connector, qualified by ``metadata[key]`` when configured and present."""
+    value = (metadata or {}).get(key) if key else None
+    return f"{source}:{value}" if value else source
+
+
+class HyperplaneHasher:
+    """Random-hyperplane signatures of embedding vectors: bit i is set when the vector is above plane i."""
+
+    def __init__(self, dim: int, bits: int = SEMANTIC_BITS, seed: int = 1):
+        if np is None:
+            raise RuntimeError("numpy not installed. Run: pip install numpy")
+        self.dim = dim
+        self.bits = bits
+        self._planes = np.random.default_rng(seed).standard_normal((dim, bits)).astype(np.float32)
+
+    def signatures(self, vectors) -> List[int]:
+        """One ``bits``-bit integer per row of ``vectors``."""
+        above = np.asarray(vectors, dtype=np.float32) @ self._planes > 0
+        return [int.from_bytes(row.tobytes(), "big") for row in np.packbits(above, axis=1)]
+
+
+class CosineLSHIndex:
+    """
+    Banded LSH index over hyperplane signatures, scored by estimated cosine similarity.
+
+    Two vectors at angle theta disagree on each bit with probability
+    theta / pi, so the Hamming distance of their signatures estimates the
+    angle. With 16 bands of 16 bits a pair at cosine 0.9 shares a band with
+    ~75% probability (~96% at 0.95), while same-topic posts at cosine 0.5
+    collide with ~2% probability, which keeps candidate lists short.
+    """
+
+    def __init__(self, threshold: float, bits: int = SEMANTIC_BITS, rows: int = SEMANTIC_ROWS):
+        self.threshold = threshold
+        self.bits = bits
+        self.rows = rows
+        self.bands = bits // rows
+        self._mask = (1 << rows) - 1
+        self._buckets: List[Dict[int, List[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def _band_keys(self, signature: int) -> Iterable[Tuple[int, int]]:
+        return ((band, (signature >> (band * self.rows)) & self._mask) for band in range(self.bands))
+
+    def cosine(self, first: int, second: int) -> float:
+        return math.cos(math.pi * bin(first ^ second).count("1") / self.bits)
+
+    def add(self, key: str, signature: int):
+        if key in self._signatures:
+            return
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, signature: int) -> Optional[Tuple[str, float]]:
+        """(key, estimated cosine) of the most similar indexed signature at or above the threshold."""
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        best = None
+        for key in candidates:
+            score = self.cosine(signature, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+
+class _Member:
+    __slots__ = ("key", "event_id", "source", "timestamp", "sighting", "signature", "semantic", "preview", "cluster")
+
+    def __init__(self, post: Post, signature: Optional[array]):
+        self.key = post.key
+        self.event_id = post.event_id
+        self.source = post.source
+        self.timestamp = post.timestamp
+        self.sighting = post.sighting
+        self.signature = signature
+        self.semantic: Optional[int] = None
+        self.preview: Optional[str] = None
+        self.cluster: Optional[_Cluster] = None
+
+
+class _Cluster:
+    __slots__ = ("id", "members", "sources")
+
+    def __init__(self, cluster_id: str):
+        self.id = cluster_id
+        self.members: Dict[str, _Member] = {}
+        self.sources: Counter = Counter()
+
+
+class CoordinationEngine:
+    """Incremental clustering of posts in a sliding window, with LSH candidate lookup."""
+
+    def __init__(self, window_seconds: float = DEFAULT_WINDOW_SECONDS, text_threshold: float = DEFAULT_TEXT_THRESHOLD,
+                 semantic_threshold: float = DEFAULT_SEMANTIC_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 ai_labels: Sequence[str] = DEFAULT_AI_LABELS):
+        """
+        Args:
+            window_seconds: Width of the sliding window
+            text_threshold: Minimum estimated Jaccard similarity of character shingles
+            semantic_threshold: Minimum estimated cosine similarity of embeddings
+            num_perm: MinHash signature length
+            ai_labels: Detection labels counted as AI-generated
+
+        Raises:
+            ValueError: If the window or a threshold is out of range
+        """
+        if window_seconds <= 0:
+            raise ValueError(f"Window must be positive, got {window_seconds}")
+        for name, value in (("Text", text_threshold), ("Semantic", semantic_threshold)):
+            if not 0 < value <= 1:
+                raise ValueError(f"{name} threshold must be in (0, 1], got {value}")
+        self.window_seconds = window_seconds
+        self.window = timedelta(seconds=window_seconds)
+        self.ai_labels = frozenset(ai_labels)
+        self.hasher = MinHasher(num_perm)
+        self._text_index = LSHIndex(num_perm, text_threshold)
+        self._semantic_index = CosineLSHIndex(semantic_threshold)
+        # Posts closer than this to an exemplar are not indexed themselves
+        self._text_cutoff = (1 + text_threshold) / 2
+        self._semantic_cutoff = (1 + semantic_threshold) / 2
+        self._hyperplanes: Optional[HyperplaneHasher] = None
+        self._members: Dict[str, _Member] = {}
+        self._by_event: Dict[str, List[str]] = {}
+        self._expiry: List[Tuple[datetime, str]] = []
+        self._clusters: Dict[str, _Cluster] = {}
+        self._labels: Dict[str, str] = {}
+        self._next_cluster = 1
+        self.watermark: Optional[datetime] = None
+        self._posts = 0
+        self._late = 0
+        self._expired = 0
+        self._exact_matches = 0
+        self._text_matches = 0
+        self._semantic_matches = 0
+        self._merges = 0
+        self._seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._members
+
+    @property
+    def cutoff(self) -> Optional[datetime]:
+        """Oldest timestamp still in the window."""
+        return self.watermark - self.window if self.watermark is not None else None
+
+    def sign(self, texts: Sequence[str]) -> List[Optional[array]]:
+        """MinHash signatures of texts (None for texts too short to compare)."""
+        if np is not None:
+            return self.hasher.byte_signatures(texts, MIN_SHINGLES)
+        signatures = []
+        for text in texts:
+            grams = shingles(text or "", self.hasher.shingle_size)
+            signatures.append(self.hasher.signature_of(grams) if len(grams) >= MIN_SHINGLES else None)
+        return signatures
+
+    def add(self, posts: Sequence[Post], signatures: Optional[Sequence[Optional[array]]] = None) -> int:
+        """
+        Cluster new posts and slide the window.
+
+        Posts already in the window are skipped (sources deliver at least
+        once); posts older than the window are dropped.
+
+        Args:
+            posts: New posts, in any order
+            signatures: ``sign`` of the posts' texts (computed here when omitted)
+
+        Returns:
+            Posts added
+        """
+        if not posts:
+            return 0
+        if signatures is None:
+            signatures = self.sign([post.text for post in posts])
+        started = time.perf_counter()
+        self._advance(max(post.timestamp for post in posts))
+        cutoff = self.cutoff
+        added = 0
+        for post, signature in zip(posts, signatures):
+            if post.key in self._members:
+                continue
+            if post.timestamp < cutoff:
+                self._late += 1
+                continue
+            self._insert(post, signature)
+            added += 1
+        self._expire()
+        self._posts += added
+        self._seconds += time.perf_counter() - started
+        return added
+
+    def _advance(self, newest: datetime):
+        newest = min(newest, datetime.utcnow())
+        if self.watermark is None or newest > self.watermark:
+            self.watermark = newest
+
+    def _insert(self, post: Post, signature: Optional[array]):
+        member = _Member(post, signature)
+        self._members[post.key] = member
+        heapq.heappush(self._expiry, (post.timestamp, post.key))
+        siblings = self._by_event.setdefault(post.event_id, [])
+        if siblings:
+            first = self._members[siblings[0]]
+            member.signature, member.semantic, member.preview = first.signature, first.semantic, first.preview
+            siblings.append(post.key)
+            self._join(member, first)
+            self._exact_matches += 1
+            return
+        siblings.append(post.key)
+        member.preview = (post.text or "")[:PREVIEW_CHARS]
+        if signature is None:
+            return
+        found = self._text_index.query(signature)
+        if found is not None:
+            self._join(member, self._members[found[0]])
+            self._text_matches += 1
+        if found is None or found[1] < self._text_cutoff:
+            self._text_index.add(post.key, signature)
+
+    def add_vectors(self, vectors: Dict[str, Any]) -> int:
+        """
+        Match content events in the window by embedding; a match merges their clusters.
+
+        Args:
+            vectors: event id -> embedding vector (events not in the window are ignored)
+
+        Returns:
+            Events matched to a semantically similar post
+        """
+        if np is None:
+            return 0
+        event_ids = [
+            event_id for event_id in vectors
+            if event_id in self._by_event and self._members[self._by_event[event_id][0]].semantic is None
+        ]
+        if not event_ids:
+            return 0
+        started = time.perf_counter()
+        if self._hyperplanes is None:
+            self._hyperplanes = HyperplaneHasher(len(vectors[event_ids[0]]))
+        event_ids = [event_id for event_id in event_ids if len(vectors[event_id]) == self._hyperplanes.dim]
+        matched = 0
+        signatures = self._hyperplanes.signatures([vectors[event_id] for event_id in event_ids]) if event_ids else []
+        for event_id, signature in zip(event_ids, signatures):
+            keys = self._by_event[event_id]
+            for key in keys:
+                self._members[key].semantic = signature
+            first = self._members[keys[0]]
+            found = self._semantic_index.query(signature)
+            if found is not None:
+                other = self._members[found[0]]
+                if other.cluster is None or other.cluster is not first.cluster:
+                    self._join(first, other)
+                    matched += 1
+            if found is None or found[1] < self._semantic_cutoff:
+                self._semantic_index.add(first.key, signature)
+        self._semantic_matches += matched
+        self._seconds += time.perf_counter() - started
+        return matched
+
+    def set_labels(self, labels: Dict[str, str]):
+        """
+        Record detection labels of content events (from analytics_records).
+
+        Labels may arrive before their event; those of events that never
+        show up are dropped once more than ``MAX_UNMATCHED_LABELS`` pile up.
+        """
+        self._labels.update(labels)
+        if len(self._labels) > len(self._by_event) + MAX_UNMATCHED_LABELS:
+            self._labels = {event_id: label for event_id, label in self._labels.items() if event_id in self._by_event}
+
+    def has_event(self, event_id: str) -> bool:
+        return event_id in self._by_event
+
+    def event_ids(self) -> List[str]:
+        """Content events with a post in the window."""
+        return list(self._by_event)
+
+    # Cluster bookkeeping
+
+    def _new_cluster(self) -> _Cluster:
+        cluster = _Cluster(f"c{self._next_cluster}")
+        self._next_cluster += 1
+        self._clusters[cluster.id] = cluster
+        return cluster
+
+    @staticmethod
+    def _attach(cluster: _Cluster, member: _Member):
+        cluster.members[member.key] = member
+        cluster.sources[member.source] += 1
+        member.cluster = cluster
+
+    def _join(self, member: _Member, other: _Member):
+        """Put two posts in the same cluster."""
+        if member.cluster is None and other.cluster is None:
+            cluster = self._new_cluster()
+            self._attach(cluster, other)
+            self._attach(cluster, member)
+        elif other.cluster is None:
+            self._attach(member.cluster, other)
+        elif member.cluster is None:
+            self._attach(other.cluster, member)
+        elif member.cluster is not other.cluster:
+            small, large = sorted((member.cluster, other.cluster), key=lambda cluster: len(cluster.members))
+            for moved in small.members.values():
+                self._attach(large, moved)
+            del self._clusters[small.id]
+            self._merges += 1
+
+    def _expire(self):
+        cutoff = self.cutoff
+        while self._expiry and self._expiry[0][0] < cutoff:
+            _, key = heapq.heappop(self._expiry)
+            self._remove(key)
+
+    def _remove(self, key: str):
+        member = self._members.pop(key)
+        self._expired += 1
+        siblings = self._by_event[member.event_id]
+        siblings.remove(key)
+        if not siblings:
+            del self._by_event[member.event_id]
+            self._labels.pop(member.event_id, None)
+        text_exemplar = key in self._text_index
+        semantic_exemplar = key in self._semantic_index
+        self._text_index.remove(key)
+        self._semantic_index.remove(key)
+        cluster = member.cluster
+        if cluster is None:
+            return
+        del cluster.members[key]
+        cluster.sources[member.source] -= 1
+        if not cluster.sources[member.source]:
+            del cluster.sources[member.source]
+        if text_exemplar:
+            self._promote(cluster, self._text_index, "signature")
+        if semantic_exemplar:
+            self._promote(cluster, self._semantic_index, "semantic")
+        if len(cluster.members) == 1:
+            for remaining in cluster.members.values():
+                remaining.cluster = None
+            del self._clusters[cluster.id]
+
+    @staticmethod
+    def _promote(cluster: _Cluster, index, attribute: str):
+        """Index the newest member of a cluster that has no exemplar left in ``index``."""
+        if any(key in index for key in cluster.members):
+            return
+        for member in reversed(cluster.members.values()):
+            signature = getattr(member, attribute)
+            if signature is not None:
+                index.add(member.key, signature)
+                return
+
+    # Scoring
+
+    def _summary(self, cluster: _Cluster, member_limit: int) -> CoordinationCluster:
+        members = sorted(cluster.members.values(), key=lambda member: member.timestamp)
+        first_seen, last_seen = members[0].timestamp, members[-1].timestamp
+        span = (last_seen - first_seen).total_seconds()
+        labels = [self._labels.get(member.event_id) for member in members]
+        labeled = [label for label in labels if label is not None]
+        ai_ratio = sum(1 for label in labeled if label in self.ai_labels) / len(labeled) if labeled else 0.0
+        components = {
+            "size": min(1.0, math.log(len(members)) / math.log(SIZE_SATURATION)),
+            "source_diversity": min(1.0, (len(cluster.sources) - 1) / (SOURCE_SATURATION - 1)),
+            "time_compression": max(0.0, 1 - span / self.window_seconds),
+            "ai_ratio": ai_ratio,
+        }
+        return CoordinationCluster(
+            id=cluster.id,
+            score=round(min(1.0, sum(SCORE_WEIGHTS[name] * value for name, value in components.items())), 4),
+            components={name: round(value, 4) for name, value in components.items()},
+            size=len(members),
+            sources=dict(cluster.sources.most_common()),
+            first_seen=first_seen,
+            last_seen=last_seen,
+            span_seconds=span,
+            labeled=len(labeled),
+            ai_ratio=round(ai_ratio, 4),
+            members=[
+                ClusterMember(event_id=member.event_id, source=member.source, timestamp=member.timestamp,
+                              sighting=member.sighting, detection_label=label, text_preview=member.preview)
+                for member, label in zip(members[:member_limit], labels)
+            ],
+        )
+
+    def clusters(self, limit: int = 20, min_size: int = 3, min_sources: int = 2, min_score: float = 0.0,
+                 member_limit: int = 5) -> List[CoordinationCluster]:
+        """
+        Highest-scoring clusters in the window.
+
+        Args:
+            limit: Clusters to return
+            min_size: Minimum posts per cluster
+            min_sources: Minimum distinct sources per cluster
+            min_score: Minimum score
+            member_limit: Earliest members included per cluster
+        """
+        summaries = [
+            self._summary(cluster, member_limit) for cluster in self._clusters.values()
+            if len(cluster.members) >= min_size and len(cluster.sources) >= min_sources
+        ]
+        summaries = [summary for summary in summaries if summary.score >= min_score]
+        return heapq.nlargest(limit, summaries, key=lambda summary: (summary.score, summary.size))
+
+    def cluster(self, cluster_id: str, member_limit: int = 1000) -> Optional[CoordinationCluster]:
+        """A cluster by id (ids are not kept across restarts), or None once it has dissolved."""
+        cluster = self._clusters.get(cluster_id)
+        return self._summary(cluster, member_limit) if cluster is not None else None
+
+    def cluster_of(self, key: str) -> Optional[str]:
+        """Cluster id of a post in the window (None when it is in no cluster)."""
+        member = self._members.get(key)
+        return member.cluster.id if member is not None and member.cluster is not None else None
+
+    def cluster_of_event(self, event_id: str) -> Optional[str]:
+        """
+        Cluster id of a content event (None when none of its posts is in a cluster).
+
+        The event's own post may have left the window while sightings of it
+        are still in, so every post of the event is checked.
+        """
+        for key in self._by_event.get(event_id, ()):
+            cluster_id = self.cluster_of(key)
+            if cluster_id is not None:
+                return cluster_id
+        return None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Window size, index sizes and match counters since start-up."""
+        return {
+            "window_seconds": self.window_seconds,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "posts_in_window": len(self._members),
+            "events_in_window": len(self._by_event),
+            "clusters": len(self._clusters),
+            "clustered_posts": sum(len(cluster.members) for cluster in self._clusters.values()),
+            "text_exemplars": len(self._text_index),
+            "semantic_exemplars": len(self._semantic_index),
+            "text_threshold": self._text_index.threshold,
+            "semantic_threshold": self._semantic_index.threshold,
+            "labels": len(self._labels),
+            "posts": self._posts,
+            "late": self._late,
+            "expired": self._expired,
+            "exact_matches": self._exact_matches,
+            "text_matches": self._text_matches,
+            "semantic_matches": self._semantic_matches,
+            "merges": self._merges,
+            "avg_post_us": self._seconds / self._posts * 1e6 if self._posts else 0.0,
+        }
@@ -0,0 +1,107 @@
+"""Graph intelligence service main application."""
+from fastapi import FastAPI, HTTPException
+from typing import List
+import sys
+import os
+
+# Setup path for shared schemas
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from models import CoordinationCluster
+from database import DatabaseManager
+from coordination import CoordinationEngine
+from stream import CoordinationFeed
+
+app = FastAPI(title="ASTRA Graph Intelligence Service", version="0.1.0")
+
+# Optional per-service database file (default: ASTRA_DB_PATH or data/astra.db); must be the
+# file ingestion and risk analytics write to
+if os.getenv("GRAPH_DB_PATH"):
+    DatabaseManager.set_default(os.getenv("GRAPH_DB_PATH"))
+
+# Coordination cluster detection over the shared content and analytics tables
+engine = CoordinationEngine()
+feed = CoordinationFeed(engine)
+
+
+@app.on_event("startup")
+async def start_feed():
+    """Rebuild the sliding window and start tailing new content."""
+    feed.start()
+
+
+@app.on_event("shutdown")
+async def stop_feed():
+    await feed.stop()
+
+
+@app.get("/")
+async def root():
+    """Health check endpoint."""
+    return {
+        "service": "graph-intelligence",
+        "version": "0.1.0",
+        "status": "running" if feed.ready else "loading",
+        "window_seconds": engine.window_seconds,
+        "posts_in_window": len(engine),
+    }
+
+
+def _check_members(members: int):
+    if members < 0:
+        raise HTTPException(status_code=400, detail="members must be >= 0")
+
+
+@app.get("/clusters", response_model=List[CoordinationCluster])
+async def list_clusters(limit: int = 20, min_size: int = 3, min_sources: int = 2, min_score: float = 0.0,
+                        members: int = 5):
+    """
+    Coordination clusters in the current window, highest score first.
+
+    Args:
+        limit: Clusters to return
+        min_size: Minimum posts per cluster
+        min_sources: Minimum distinct sources per cluster
+        min_score: Minimum score (0-1)
+        members: Earliest posts included per cluster
+    """
+    if limit < 1 or min_size < 2 or min_sources < 1 or members < 0:
+        raise HTTPException(status_code=400, detail="limit and min_sources must be >= 1, min_size >= 2, members >= 0")
+    return engine.clusters(limit, min_size, min_sources, min_score, members)
+
+
+@app.get("/clusters/{cluster_id}", response_model=CoordinationCluster)
+async def get_cluster(cluster_id: str, members: int = 1000):
+    """A cluster with its posts (cluster ids are not kept across restarts)."""
+    _check_members(members)
+    cluster = engine.cluster(cluster_id, members)
+    if cluster is None:
+        raise HTTPException(status_code=404, detail=f"Cluster not found: {cluster_id}")
+    return cluster
+
+
+@app.get("/events/{event_id}/cluster", response_model=CoordinationCluster)
+async def get_event_cluster(event_id: str, members: int = 1000):
+    """The cluster a content event (or a repeat of it still in the window) is in."""
+    _check_members(members)
+    cluster_id = engine.cluster_of_event(event_id)
+    if cluster_id is None:
+        raise HTTPException(status_code=404, detail=f"Event is in no cluster of the current window: {event_id}")
+    return engine.cluster(cluster_id, members)
+
+
+@app.get("/metrics/engine")
+async def engine_metrics():
+    """Window size, index sizes, match counters and feed positions."""
+    return {**engine.metrics(), "feed": feed.metrics()}
+
+
+@app.get("/metrics/database")
+async def database_metrics():
+    """Connection-pool and lock-wait metrics of every shard."""
+    return feed.shards.metrics()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8004)
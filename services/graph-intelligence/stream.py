@@ -0,0 +1,298 @@
+"""
+Incremental feed of the coordination engine from the shared database.
+
+`CoordinationFeed` keeps a `CoordinationEngine` up to date without ever
+rescanning a table:
+
+- new content events: an `OutboxConsumer` per shard file tails the
+  content_events outbox (``sync_state`` row ``outbox:graph-intelligence``),
+- exact repeats: ``content_sightings`` rows after the last id read per shard
+  (joined with their canonical event's text),
+- detection labels: ``analytics_records`` rows after the last id read per
+  shard; while sharded, record ids are reserved before their rows commit, so
+  the last ``RECORD_OVERLAP`` ids are read again to catch late commits,
+- embeddings (optional): vectors of each new batch of events are looked up
+  once, and vectors appended later are tailed by rowid from the shared
+  `EmbeddingStore`.
+
+The engine is in memory only. On start-up the feed rebuilds the current
+window from the tables (events and sightings in the window, their labels
+and vectors) before it starts tailing; the outbox consumers may then
+redeliver some of those events, which the engine skips.
+
+Configuration (environment):
+    GRAPH_POLL_INTERVAL     seconds between polls of sightings, labels and vectors (default 2)
+    GRAPH_SEMANTIC          match paraphrases by embedding when vectors exist (default 1; needs numpy)
+    ASTRA_EMBEDDING_MODEL   model whose vectors are used (shared with ingestion)
+"""
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+import os
+
+from sqlalchemy import DateTime, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from models import ContentEvent
+from outbox import OutboxConsumer
+from sharding import ShardSet
+from embeddings import EmbeddingStore
+from coordination import CoordinationEngine, Post, np, poster_of
+
+DEFAULT_POLL_INTERVAL = float(os.getenv("GRAPH_POLL_INTERVAL", "2"))
+SEMANTIC_ENABLED = os.getenv("GRAPH_SEMANTIC", "1").lower() not in ("0", "false", "no")
+EMBEDDING_MODEL = os.getenv("ASTRA_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CONSUMER_NAME = "graph-intelligence"
+# Rows per incremental read
+PAGE_SIZE = 2000
+# Sharded analytics record ids re-read per poll (ids reserved but committed late)
+RECORD_OVERLAP = 1000
+
+_SIGHTINGS_AFTER = text("""
+    SELECT s.id, s.event_id, s.source, s.metadata_json, s.timestamp, astra_text(e.text) AS text
+    FROM content_sightings s JOIN content_events e ON e.id = s.event_id
+    WHERE s.id > :after ORDER BY s.id LIMIT :limit
+""").columns(timestamp=DateTime)
+
+_SIGHTINGS_SINCE = text("""
+    SELECT s.id, s.event_id, s.source, s.metadata_json, s.timestamp, astra_text(e.text) AS text
+    FROM content_sightings s JOIN content_events e ON e.id = s.event_id
+    WHERE s.timestamp >= :since
+""").columns(timestamp=DateTime)
+
+_EVENTS_SINCE = text("""
+    SELECT id, source, metadata_json, timestamp, astra_text(text) AS text
+    FROM content_events WHERE timestamp >= :since
+""").columns(timestamp=DateTime)
+
+_LABELS_SINCE = text("""
+    SELECT r.event_id, r.detection_label FROM analytics_records r
+    JOIN content_events e ON e.id = r.event_id
+    WHERE e.timestamp >= :since ORDER BY r.id
+""")
+
+
+def _sighting_post(shard: int, row) -> Post:
+    # Sighting ids are per shard file
+    metadata = json.loads(row.metadata_json) if row.metadata_json else {}
+    return Post(f"sighting:{shard}:{row.id}", row.event_id, poster_of(row.source, metadata), row.timestamp, row.text, True)
+
+
+class CoordinationFeed:
+    """Feeds new events, repeats, labels and vectors of every shard into a `CoordinationEngine`."""
+
+    def __init__(self, engine: CoordinationEngine, shards: Optional[ShardSet] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, semantic: bool = SEMANTIC_ENABLED,
+                 embedding_model: str = EMBEDDING_MODEL):
+        """
+        Args:
+            engine: Engine to feed
+            shards: Database shards holding the content and analytics tables (default: process default)
+            poll_interval: Seconds between polls of sightings, labels and vectors
+            semantic: Feed embedding vectors for paraphrase matching
+            embedding_model: Model id of the vectors in the shared embedding store
+        """
+        self.engine = engine
+        self.shards = shards or ShardSet()
+        self.poll_interval = poll_interval
+        self.embeddings = EmbeddingStore(embedding_model, self.shards.primary) if semantic and np is not None else None
+        self.consumers = [
+            OutboxConsumer(manager, CONSUMER_NAME, self.add_events, batch_size=PAGE_SIZE) for manager in self.shards.managers
+        ]
+        self._sighting_marks = [0] * self.shards.count
+        self._record_marks = [0] * self.shards.count
+        self._vector_mark = 0
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self._warm_up_seconds = 0.0
+        self._polls = 0
+        self._last_poll_ms = 0.0
+        self._last_error: Optional[str] = None
+
+    def start(self):
+        """Rebuild the window, then start tailing, on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for consumer in self.consumers:
+            await consumer.stop()
+        if self.embeddings is not None:
+            self.embeddings.close()
+
+    async def _run(self):
+        while not self.ready:
+            try:
+                await self.warm_up()
+            except Exception as exc:  # e.g. tables not created yet
+                self._last_error = f"{type(exc).__name__}: {exc}"
+                print(f"[CoordinationFeed] Warm-up failed, retrying in {self.poll_interval}s: {exc}")
+                await asyncio.sleep(self.poll_interval)
+        for consumer in self.consumers:
+            consumer.start()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll_once()
+                self._last_error = None
+            except Exception as exc:  # keep polling; marks only advance after a read is applied
+                self._last_error = f"{type(exc).__name__}: {exc}"
+                print(f"[CoordinationFeed] Poll failed: {exc}")
+
+    async def _add(self, posts: List[Post]) -> int:
+        # Repeats of an event in the window join it by id; only other texts need a signature
+        texts = ["" if self.engine.has_event(post.event_id) else post.text for post in posts]
+        signatures = await asyncio.to_thread(self.engine.sign, texts)
+        return self.engine.add(posts, signatures)
+
+    async def add_events(self, events: List[ContentEvent]):
+        """Outbox handler: cluster new content events, with their vectors when already embedded."""
+        posts = [
+            Post(event.id, event.id, poster_of(event.source, event.metadata), event.timestamp, event.text)
+            for event in events if event.id not in self.engine
+        ]
+        if not posts or not await self._add(posts):
+            return
+        if self.embeddings is not None and self.embeddings.dim is not None:
+            self.engine.add_vectors(await self.embeddings.lookup_events([post.key for post in posts]))
+
+    # Start-up
+
+    @staticmethod
+    def _read_window(conn, since: datetime) -> Tuple[list, list, Dict[str, str], int, int]:
+        # Marks first: rows committed between the reads are read again later, not skipped
+        sighting_mark = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM content_sightings")).scalar()
+        record_mark = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM analytics_records")).scalar()
+        events = conn.execute(_EVENTS_SINCE, {"since": since}).all()
+        sightings = conn.execute(_SIGHTINGS_SINCE, {"since": since}).all()
+        labels = {row.event_id: row.detection_label for row in conn.execute(_LABELS_SINCE, {"since": since})}
+        return events, sightings, labels, sighting_mark, record_mark
+
+    @staticmethod
+    def _newest(conn) -> Optional[datetime]:
+        return conn.execute(text("SELECT MAX(timestamp) AS timestamp FROM content_events").columns(timestamp=DateTime)).scalar()
+
+    async def warm_up(self):
+        """Load the posts, labels and vectors of the current window and set the read marks."""
+        started = time.perf_counter()
+        newest = [value for value in await self.shards.read_all(self._newest) if value is not None]
+        since = min(max(newest), datetime.utcnow()) - self.engine.window if newest else datetime.utcnow()
+        if self.embeddings is not None:
+            self._vector_mark = await self.shards.primary.run_read(self.embeddings.last_rowid)
+        parts = await self.shards.read_all(self._read_window, since)
+        posts = []
+        for index, (events, sightings, labels, sighting_mark, record_mark) in enumerate(parts):
+            posts += [
+                Post(row.id, row.id, poster_of(row.source, json.loads(row.metadata_json) if row.metadata_json else {}),
+                     row.timestamp, row.text)
+                for row in events
+            ]
+            posts += [_sighting_post(index, row) for row in sightings]
+            self.engine.set_labels(labels)
+            self._sighting_marks[index] = sighting_mark
+            self._record_marks[index] = record_mark
+        posts.sort(key=lambda post: post.timestamp)
+        for offset in range(0, len(posts), PAGE_SIZE):
+            await self._add(posts[offset:offset + PAGE_SIZE])
+        if self.embeddings is not None and self.embeddings.dim is not None:
+            self.engine.add_vectors(await self.embeddings.lookup_events(self.engine.event_ids()))
+        self.ready = True
+        self._warm_up_seconds = time.perf_counter() - started
+        print(f"[CoordinationFeed] Loaded {len(self.engine):,} posts of the last "
+              f"{self.engine.window_seconds:.0f}s in {self._warm_up_seconds:.1f}s")
+
+    # Incremental reads
+
+    @staticmethod
+    def _sightings_after(db_manager, after: int):
+        with db_manager.reader.connect() as conn:
+            return conn.execute(_SIGHTINGS_AFTER, {"after": after, "limit": PAGE_SIZE}).all()
+
+    @staticmethod
+    def _records_after(db_manager, after: int):
+        with db_manager.reader.connect() as conn:
+            return conn.execute(
+                text("""
+                    SELECT id, event_id, detection_label FROM analytics_records
+                    WHERE id > :after ORDER BY id LIMIT :limit
+                """),
+                {"after": after, "limit": PAGE_SIZE},
+            ).all()
+
+    async def _poll_sightings(self, index: int) -> int:
+        manager = self.shards.managers[index]
+        added = 0
+        while True:
+            rows = await manager.run_read(self._sightings_after, manager, self._sighting_marks[index])
+            if rows:
+                added += await self._add([_sighting_post(index, row) for row in rows])
+                self._sighting_marks[index] = rows[-1].id
+            if len(rows) < PAGE_SIZE:
+                return added
+
+    async def _poll_records(self, index: int) -> int:
+        manager = self.shards.managers[index]
+        mark = self._record_marks[index]
+        after = max(0, mark - RECORD_OVERLAP) if self.shards.sharded else mark
+        read = 0
+        while True:
+            rows = await manager.run_read(self._records_after, manager, after)
+            if rows:
+                self.engine.set_labels({row.event_id: row.detection_label for row in rows})
+                after = rows[-1].id
+                mark = max(mark, after)
+                read += len(rows)
+            if len(rows) < PAGE_SIZE:
+                self._record_marks[index] = mark
+                return read
+
+    async def _poll_vectors(self) -> int:
+        if self.embeddings is None or self.embeddings.dim is None:
+            return 0
+        matched = 0
+        while True:
+            vectors, last = await self.embeddings.events_after(self._vector_mark, PAGE_SIZE)
+            if last == self._vector_mark:
+                return matched
+            matched += self.engine.add_vectors(vectors)
+            self._vector_mark = last
+
+    async def poll_once(self) -> Dict[str, int]:
+        """
+        Read new sightings, labels and vectors of every shard.
+
+        Returns:
+            Counts of what was read
+        """
+        started = time.perf_counter()
+        sightings = await asyncio.gather(*(self._poll_sightings(index) for index in range(self.shards.count)))
+        records = await asyncio.gather(*(self._poll_records(index) for index in range(self.shards.count)))
+        vectors = await self._poll_vectors()
+        self._polls += 1
+        self._last_poll_ms = (time.perf_counter() - started) * 1000
+        return {"sightings": sum(sightings), "records": sum(records), "semantic_matches": vectors}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warm_up_seconds": round(self._warm_up_seconds, 3),
+            "semantic": self.embeddings is not None,
+            "polls": self._polls,
+            "last_poll_ms": round(self._last_poll_ms, 3),
+            "last_error": self._last_error,
+            "sighting_marks": self._sighting_marks,
+            "record_marks": self._record_marks,
+            "vector_mark": self._vector_mark,
+            "consumers": [consumer.metrics() for consumer in self.consumers],
+        }
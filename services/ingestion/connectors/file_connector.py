@@ -30,7 +30,8 @@ class FileConnector(Connector):
         directory = Path(self.config.get("path", "."))
         pattern = self.config.get("pattern", "*.txt")
         
-        for file_path in directory.glob(pattern):
+        # Sorted so repeated runs yield files in the same order (job checkpoints rely on it)
+        for file_path in sorted(directory.glob(pattern)):
             if file_path.is_file():
                 try:
                     text = file_path.read_text(encoding="utf-8")
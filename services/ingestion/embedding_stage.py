@@ -0,0 +1,88 @@
+"""
+Optional ingestion stage that embeds every new content event once.
+
+`EmbeddingStage` tails the content_events outbox (one consumer per shard
+file) and batch-encodes the text of newly stored events with the configured
+sentence-transformer into the shared `EmbeddingStore`. Detection (the RAG
+detector) and later consumers look the vectors up by text or event id
+instead of encoding the text again. Texts already in the store, e.g. because
+detection saw them first, are not encoded again; they are only linked to
+their event.
+
+The model is loaded on the first batch, off the event loop.
+
+Configuration (environment):
+    INGESTION_EMBEDDINGS          enable the stage (default 0)
+    ASTRA_EMBEDDING_MODEL         model id, also the store key (default sentence-transformers/all-MiniLM-L6-v2)
+    ASTRA_EMBEDDING_MODEL_PATH    local copy of the model (default: RAG_MODEL_PATH)
+    ASTRA_EMBEDDING_BATCH         texts per encoder forward pass (default 64)
+"""
+import threading
+from typing import Any, Dict, List
+import sys
+import os
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from models import ContentEvent
+from embeddings import EmbeddingStore
+from outbox import OutboxConsumer
+
+EMBEDDING_MODEL = os.getenv("ASTRA_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL_PATH = os.getenv("ASTRA_EMBEDDING_MODEL_PATH") or os.getenv("RAG_MODEL_PATH")
+EMBEDDING_BATCH = int(os.getenv("ASTRA_EMBEDDING_BATCH", "64"))
+CONSUMER_NAME = "embeddings"
+
+
+class EmbeddingStage:
+    """Embeds newly ingested events into the shared embedding store."""
+
+    def __init__(self, shards, model: str = EMBEDDING_MODEL, model_path: str = EMBEDDING_MODEL_PATH,
+                 batch_size: int = EMBEDDING_BATCH):
+        """
+        Args:
+            shards: ShardSet of the ingestion database; the store lives in shard 0
+            model: Model id the vectors are stored under
+            model_path: Local path to load the model from (default: download ``model``)
+            batch_size: Texts per encoder forward pass
+        """
+        if SentenceTransformer is None:
+            raise RuntimeError("sentence-transformers not installed. Run: pip install sentence-transformers")
+        self.model = model
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.store = EmbeddingStore(model, shards.primary)
+        self._encoder = None
+        self._load_lock = threading.Lock()
+        self.consumers = [OutboxConsumer(manager, CONSUMER_NAME, self.embed_events) for manager in shards.managers]
+
+    def _encode(self, texts: List[str]):
+        with self._load_lock:
+            if self._encoder is None:
+                print(f"[EmbeddingStage] Loading {self.model_path or self.model}")
+                self._encoder = SentenceTransformer(self.model_path or self.model)
+        return self._encoder.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+
+    async def embed_events(self, events: List[ContentEvent]):
+        """Outbox handler: embed the events' texts that are not in the store yet."""
+        await self.store.embed([event.text for event in events], self._encode, [event.id for event in events])
+
+    def start(self):
+        for consumer in self.consumers:
+            consumer.start()
+
+    async def stop(self):
+        for consumer in self.consumers:
+            await consumer.stop()
+        self.store.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.store.metrics(),
+            "consumers": [consumer.metrics() for consumer in self.consumers],
+        }
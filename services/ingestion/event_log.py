@@ -0,0 +1,167 @@
+"""
+Durable append-only event log with consumer-group offsets.
+
+`EventLogPublisher` stores events exactly like `SQLitePublisher` and, in the
+same transaction, appends every newly stored event to the `event_log` table.
+Each entry gets a monotonically increasing sequence number, so downstream
+consumers read only what is new since their committed offset instead of
+pulling the whole `content_events` table.
+
+Delivery is at-least-once: a consumer that crashes between processing a batch
+and committing its offset sees the batch again. Consumers that process
+idempotently (e.g. skip event ids they already scored) get exactly-once results.
+Everything lives in the local SQLite database; no broker is required.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import sys
+import os
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from models import ContentEvent, EventLogEntry, EventLogBatch
+from database import ContentEventDB, ConsumerOffsetDB, EventLogDB, insert_chunked
+from sqlite_publisher import SQLitePublisher, row_to_event
+
+# How often a long-poll re-checks the log head for new entries
+LONG_POLL_INTERVAL = 0.2
+MAX_READ_BATCH = 1000
+
+
+class EventLogPublisher(SQLitePublisher):
+    """SQLite publisher that also appends stored events to a durable, offset-addressable log."""
+
+    def _store_events(self, conn, events: List[ContentEvent]) -> List[Tuple[str, bool]]:
+        """Store events and append the newly stored ones to the log atomically."""
+        results = super()._store_events(conn, events)
+        appended_at = datetime.utcnow()
+        log_rows = [
+            {"event_id": event_id, "source": event.source, "appended_at": appended_at}
+            for event, (event_id, stored) in zip(events, results)
+            if stored
+        ]
+        insert_chunked(conn, EventLogDB.__table__, log_rows)
+        return results
+
+    def head(self) -> int:
+        """Latest sequence number in the log (0 when empty)."""
+        with self.db_manager.reader.connect() as conn:
+            return conn.execute(select(func.max(EventLogDB.seq))).scalar() or 0
+
+    def read(self, after: int = 0, limit: int = 100) -> EventLogBatch:
+        """
+        Read up to ``limit`` entries with a sequence number greater than ``after``.
+
+        Entries whose content row no longer exists (e.g. expired) are skipped,
+        so sequence numbers in a batch may have gaps.
+        """
+        limit = max(1, min(limit, MAX_READ_BATCH))
+        with self.db_manager.reader.connect() as conn:
+            # Bound the read by the head observed first, so entries appended
+            # while reading are never skipped over by next_offset
+            head = conn.execute(select(func.max(EventLogDB.seq))).scalar() or 0
+            rows = conn.execute(
+                select(
+                    EventLogDB.seq,
+                    ContentEventDB.id,
+                    ContentEventDB.source,
+                    ContentEventDB.text,
+                    ContentEventDB.metadata_json,
+                    ContentEventDB.timestamp
+                )
+                .join(ContentEventDB, ContentEventDB.id == EventLogDB.event_id)
+                .where(EventLogDB.seq > after, EventLogDB.seq <= head)
+                .order_by(EventLogDB.seq)
+                .limit(limit)
+            ).all()
+
+        entries = [EventLogEntry(seq=row.seq, event=row_to_event(row)) for row in rows]
+        if len(rows) < limit:
+            # Everything up to the head was returned or no longer exists
+            next_offset = max(after, head)
+        else:
+            next_offset = entries[-1].seq
+        return EventLogBatch(offset=after, next_offset=next_offset, head=head, entries=entries)
+
+    async def read_wait(self, after: int = 0, limit: int = 100, wait: float = 0.0) -> EventLogBatch:
+        """Like ``read`` but long-polls up to ``wait`` seconds for new entries."""
+        deadline = time.monotonic() + max(0.0, wait)
+        while True:
+            batch = await self.db_manager.run_read(self.read, after, limit)
+            if batch.entries or time.monotonic() >= deadline:
+                return batch
+            # Only re-read once the head moves past the requested offset
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LONG_POLL_INTERVAL)
+                if await self.db_manager.run_read(self.head) > batch.next_offset:
+                    break
+
+    def get_offset(self, group: str) -> int:
+        """Committed offset of a consumer group (0 for a new group)."""
+        with self.db_manager.reader.connect() as conn:
+            committed = conn.execute(
+                select(ConsumerOffsetDB.committed_seq).where(ConsumerOffsetDB.consumer_group == group)
+            ).scalar()
+        return committed or 0
+
+    def commit(self, group: str, offset: int) -> int:
+        """
+        Commit a consumer group's offset. Offsets only move forward.
+
+        Returns:
+            The committed offset after the update
+
+        Raises:
+            ValueError: If ``offset`` is negative or past the log head, which
+                would make the group skip every event appended later
+        """
+        if offset < 0:
+            raise ValueError(f"Offset must be >= 0, got {offset}")
+        stmt = sqlite_insert(ConsumerOffsetDB.__table__).values(
+            consumer_group=group, committed_seq=offset, updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ConsumerOffsetDB.consumer_group],
+            set_={
+                "committed_seq": func.max(ConsumerOffsetDB.committed_seq, stmt.excluded.committed_seq),
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        with self.db_manager.engine.begin() as conn:
+            head = conn.execute(select(func.max(EventLogDB.seq))).scalar() or 0
+            if offset > head:
+                raise ValueError(f"Offset {offset} is past the log head ({head})")
+            conn.execute(stmt)
+        return self.get_offset(group)
+
+    async def poll(self, group: str, limit: int = 100, wait: float = 0.0) -> EventLogBatch:
+        """
+        Read the next batch for a consumer group after its committed offset.
+
+        The offset is not advanced; call ``commit(group, batch.next_offset)``
+        once the batch has been processed.
+        """
+        offset = await self.db_manager.run_read(self.get_offset, group)
+        batch = await self.read_wait(offset, limit, wait)
+        batch.consumer_group = group
+        return batch
+
+    def list_consumers(self) -> List[Dict[str, Any]]:
+        """Committed offsets and lag of every consumer group."""
+        head = self.head()
+        with self.db_manager.reader.connect() as conn:
+            rows = conn.execute(select(ConsumerOffsetDB).order_by(ConsumerOffsetDB.consumer_group)).all()
+        return [
+            {
+                "consumer_group": row.consumer_group,
+                "committed_offset": row.committed_seq,
+                "lag": max(0, head - row.committed_seq),
+                "updated_at": row.updated_at,
+            }
+            for row in rows
+        ]
@@ -1,26 +1,84 @@
 """
 Ingestion service main application.
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import itertools
 import sys
 import os
 
 # Setup path for shared schemas
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
 
-from models import ContentEvent
+from models import ContentEvent, EventLogBatch, JobInfo
 from connector import ConnectorRegistry
-from sqlite_publisher import SQLitePublisher
+from sqlite_publisher import SQLitePublisher, encode_cursor
+from event_log import EventLogPublisher
+from database import DatabaseManager, TimeRange, time_range
+from write_buffer import write_behind_from_env
+from export import MEDIA_TYPES, export_filename
+from retention import RetentionManager
+from sharding import SHARD_COUNT
+from job_queue import JobContext, JobRegistry, JobWorkerPool
 
 # Import connectors to register them
 from connectors import file_connector, http_connector
 
 app = FastAPI(title="ASTRA Ingestion Service", version="0.1.0")
 
-# Global publisher instance (SQLite for persistent storage)
-publisher = SQLitePublisher()
+# Optional per-service database file (default: ASTRA_DB_PATH or data/astra.db)
+if os.getenv("INGESTION_DB_PATH"):
+    DatabaseManager.set_default(os.getenv("INGESTION_DB_PATH"))
+
+# Global publisher instance (SQLite for persistent storage; optional write-behind).
+# The event log is on by default so consumers can read incrementally by offset.
+EVENT_LOG_ENABLED = os.getenv("INGESTION_EVENT_LOG", "1").lower() not in ("0", "false", "no")
+if EVENT_LOG_ENABLED and SHARD_COUNT > 1:
+    # Log entries join content_events in one file; consume the per-shard outboxes instead
+    print(f"[Ingestion] Event log disabled: not supported with ASTRA_DB_SHARDS={SHARD_COUNT}")
+    EVENT_LOG_ENABLED = False
+publisher_class = EventLogPublisher if EVENT_LOG_ENABLED else SQLitePublisher
+publisher = publisher_class(write_behind=write_behind_from_env())
+
+
+# Optional stage embedding every new event once into the shared embedding store
+EMBEDDINGS_ENABLED = os.getenv("INGESTION_EMBEDDINGS", "0").lower() not in ("0", "false", "no")
+embedding_stage = None
+if EMBEDDINGS_ENABLED:
+    from embedding_stage import EmbeddingStage
+    embedding_stage = EmbeddingStage(publisher.shards)
+
+
+# Background workers for long-running ingestion jobs
+INGEST_JOB_KIND = "ingest"
+INGEST_JOB_CHUNK = 500
+job_pool = JobWorkerPool(kinds=[INGEST_JOB_KIND])
+
+# Expiry of old content, sightings, consumed log entries and finished jobs (ASTRA_RETENTION_*)
+retention = RetentionManager(["content_events", "content_sightings", "content_outbox", "event_log", "jobs"],
+                             db_managers=publisher.shards.managers)
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start background job workers, retention and the embedding stage."""
+    job_pool.start()
+    retention.start()
+    if embedding_stage is not None:
+        embedding_stage.start()
+
+
+@app.on_event("shutdown")
+async def drain_publisher():
+    """Release running jobs and flush buffered writes before the process exits."""
+    if embedding_stage is not None:
+        await embedding_stage.stop()
+    await retention.stop()
+    await job_pool.stop()
+    await publisher.close()
 
 
 class ConnectorConfig(BaseModel):
@@ -29,6 +87,18 @@ class ConnectorConfig(BaseModel):
     config: dict
 
 
+class OffsetCommit(BaseModel):
+    """Offset a consumer group has fully processed."""
+    offset: int
+
+
+def _require_event_log() -> EventLogPublisher:
+    """Return the event-log publisher or fail if the log is disabled."""
+    if not isinstance(publisher, EventLogPublisher):
+        raise HTTPException(status_code=404, detail="Event log is disabled (INGESTION_EVENT_LOG=0)")
+    return publisher
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -58,13 +128,16 @@ async def ingest_content(connector_config: ConnectorConfig):
         )
         
         events = list(connector.fetch())
-        await publisher.publish_batch(events)
+        summary = await publisher.publish_batch(events)
         
         return {
-            "status": "success",
+            "status": "queued" if summary.get("queued") else "success",
             "connector": connector_config.connector_type,
             "events_ingested": len(events),
-            "event_ids": [e.id for e in events]
+            "events_stored": summary["stored"],
+            "duplicates": summary["duplicates"],
+            "dedup_ratio": summary["dedup_ratio"],
+            "event_ids": summary["event_ids"]
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -72,16 +145,295 @@ async def ingest_content(connector_config: ConnectorConfig):
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
 
+async def run_ingest_job(ctx: JobContext) -> dict:
+    """
+    Job handler: run a connector and publish its events in chunks.
+    
+    The checkpoint records how many fetched events were already published, so
+    a retried or resumed job skips them instead of starting over.
+    """
+    connector_config = ConnectorConfig(**ctx.payload)
+    connector = ConnectorRegistry.get_connector(
+        connector_config.connector_type,
+        connector_config.config
+    )
+    consumed = ctx.checkpoint.get("consumed", 0)
+    stored = ctx.checkpoint.get("stored", 0)
+    duplicates = ctx.checkpoint.get("duplicates", 0)
+    
+    # Connectors are blocking iterators; advance them off the event loop
+    events_iter = connector.fetch()
+    await asyncio.to_thread(lambda: sum(1 for _ in itertools.islice(events_iter, consumed)))
+    
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(itertools.islice(events_iter, INGEST_JOB_CHUNK)))
+        if not chunk:
+            break
+        summary = await publisher.publish_batch(chunk)
+        consumed += len(chunk)
+        stored += summary["stored"] or 0
+        duplicates += summary["duplicates"] or 0
+        await ctx.report(
+            message=f"{consumed} events ingested",
+            checkpoint={"consumed": consumed, "stored": stored, "duplicates": duplicates}
+        )
+    
+    return {
+        "connector": connector_config.connector_type,
+        "events_ingested": consumed,
+        "events_stored": stored,
+        "duplicates": duplicates,
+        "dedup_ratio": duplicates / consumed if consumed else 0.0
+    }
+
+
+JobRegistry.register(INGEST_JOB_KIND, run_ingest_job)
+
+
+@app.post("/jobs/ingest", status_code=202)
+async def submit_ingest_job(connector_config: ConnectorConfig):
+    """
+    Queue a connector run as a background job.
+    
+    Returns immediately with the job id; poll ``GET /jobs/{job_id}`` for progress.
+    """
+    if connector_config.connector_type not in ConnectorRegistry.list_connectors():
+        raise HTTPException(status_code=400, detail=f"Unknown connector: {connector_config.connector_type}")
+    job_id = await job_pool.queue.db_manager.run_write(
+        job_pool.queue.submit, INGEST_JOB_KIND, connector_config.model_dump()
+    )
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@app.get("/jobs", response_model=List[JobInfo])
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent ingestion jobs, newest first."""
+    return await job_pool.queue.db_manager.run_read(job_pool.queue.list, [INGEST_JOB_KIND], status, limit)
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    """Status, progress and result of a job."""
+    job = await job_pool.queue.db_manager.run_read(job_pool.queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running job to stop at its next checkpoint."""
+    job = await job_pool.queue.db_manager.run_write(job_pool.queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
 @app.get("/events", response_model=List[ContentEvent])
-async def get_events(limit: Optional[int] = 100):
+async def get_events(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    source: Optional[str] = None,
+    window: TimeRange = Depends(time_range),
+    order: str = "desc",
+    format: str = "json"
+):
+    """
+    Retrieve ingested events, one keyset-paginated page at a time.
+    
+    The cursor for the next page is returned in the ``X-Next-Cursor`` header
+    (absent on the last page). ``X-Last-Cursor`` is the position of the last
+    event on any non-empty page, for consumers that resume later from a
+    stored high-water mark.
+    
+    Args:
+        limit: Page size (max 1000); with format=ndjson, 0 streams every match
+        cursor: Cursor from a previous page's ``X-Next-Cursor`` header
+        source: Only events from this source
+        since: Only events with timestamp >= since (naive values are UTC)
+        until: Only events with timestamp < until
+        order: "desc" (newest first, default) or "asc" (oldest first)
+        format: "json" for a page, "ndjson" to stream all matches line by line
+    """
+    since, until = window
+    try:
+        if format == "ndjson":
+            events = publisher.iter_events(cursor, source, since, until, order, limit or None)
+            return StreamingResponse(
+                (event.model_dump_json() + "\n" for event in events),
+                media_type="application/x-ndjson"
+            )
+        if format != "json":
+            raise ValueError(f"Unsupported format: {format}")
+        
+        events, next_cursor = await publisher.get_events_page(limit, cursor, source, since, until, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if events:
+        response.headers["X-Last-Cursor"] = encode_cursor(events[-1].timestamp, events[-1].id)
+    return events
+
+
+@app.get("/search")
+async def search_events(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    label: Optional[str] = None,
+    source: Optional[str] = None,
+    window: TimeRange = Depends(time_range)
+):
     """
-    Retrieve ingested events (for debugging/testing).
+    Full-text search over ingested content (SQLite FTS5, BM25 ranking).
     
     Args:
-        limit: Maximum number of events to return
+        q: Keywords (all must match), "exact phrase", OR, NOT, prefix* or NEAR(a b, 5)
+        limit: Maximum hits (max 100)
+        offset: Hits to skip, for the next page of results
+        label: Only events whose analytics record has this detection label
+        source: Only events from this source
+        since: Only events with timestamp >= since
+        until: Only events with timestamp < until
+    
+    Returns:
+        Hits in rank order with a highlighted snippet and the event's
+        latest detection label and confidence (if analysed)
+    """
+    try:
+        return await publisher.search(q, limit, offset, label, source, window.since, window.until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/export/events")
+async def export_events(
+    format: str = "ndjson",
+    gzip: bool = False,
+    window: TimeRange = Depends(time_range),
+    label: Optional[str] = None,
+    source: Optional[str] = None
+):
+    """
+    Stream content events (full text and metadata) for bulk export, oldest first.
+    
+    Args:
+        format: csv, ndjson, parquet or arrow (Arrow IPC stream); parquet
+            and arrow require pyarrow
+        gzip: Gzip-compress the stream
+        since: Only events with timestamp >= since
+        until: Only events with timestamp < until
+        label: Only events whose analytics record has this detection label
+        source: Only events from this source
+    """
+    try:
+        chunks = publisher.export_events(format, gzip, window.since, window.until, label, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("content", format, gzip)}"'}
+    )
+
+
+@app.get("/log", response_model=EventLogBatch)
+async def read_log(after: int = 0, limit: int = 100, wait: float = 0.0):
+    """
+    Read event-log entries with a sequence number greater than ``after``.
+    
+    Args:
+        after: Sequence number to read after (0 = from the beginning)
+        limit: Maximum number of entries (capped at 1000)
+        wait: Seconds to long-poll when no entries are available (max 30)
+    """
+    log = _require_event_log()
+    return await log.read_wait(after, limit, min(wait, 30.0))
+
+
+@app.get("/consumers")
+async def list_consumers():
+    """Committed offsets and lag for every consumer group."""
+    log = _require_event_log()
+    return {"head": await log.db_manager.run_read(log.head),
+            "consumers": await log.db_manager.run_read(log.list_consumers)}
+
+
+@app.get("/consumers/{group}/poll", response_model=EventLogBatch)
+async def poll_consumer(group: str, limit: int = 100, wait: float = 0.0):
     """
-    all_events = await publisher.get_all_events()
-    return all_events[-limit:] if limit else all_events
+    Read the next batch after the group's committed offset.
+    
+    Commit ``next_offset`` via ``POST /consumers/{group}/commit`` once the batch
+    is processed; until then the same entries are returned again.
+    """
+    log = _require_event_log()
+    return await log.poll(group, limit, min(wait, 30.0))
+
+
+@app.post("/consumers/{group}/commit")
+async def commit_consumer(group: str, commit: OffsetCommit):
+    """Commit a consumer group's offset (offsets never move backwards or past the head)."""
+    log = _require_event_log()
+    try:
+        committed = await log.db_manager.run_write(log.commit, group, commit.offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"consumer_group": group, "committed_offset": committed}
+
+
+@app.get("/embeddings")
+async def get_embeddings(event_id: List[str] = Query(...)):
+    """
+    Stored embeddings of content events (requires INGESTION_EMBEDDINGS=1).
+    
+    Args:
+        event_id: Event ids (repeat the parameter for several)
+    
+    Returns:
+        The model, vector dimension, event id -> vector for embedded events
+        and the ids without a vector yet
+    """
+    if embedding_stage is None:
+        raise HTTPException(status_code=404, detail="Embedding stage is disabled (INGESTION_EMBEDDINGS=0)")
+    found = await embedding_stage.store.lookup_events(event_id)
+    return {
+        "model": embedding_stage.model,
+        "dim": embedding_stage.store.dim,
+        "embeddings": {key: vector.tolist() for key, vector in found.items()},
+        "missing": [key for key in event_id if key not in found],
+    }
+
+
+@app.get("/metrics/embeddings")
+async def embedding_metrics():
+    """Embedding store size, reuse counters and outbox lag of the embedding stage."""
+    if embedding_stage is None:
+        return {"enabled": False}
+    return {"enabled": True, **embedding_stage.metrics()}
+
+
+@app.get("/metrics/write-buffer")
+async def write_buffer_metrics():
+    """Queue depth and flush statistics of the write-behind buffer."""
+    return publisher.buffer_metrics()
+
+
+@app.get("/metrics/database")
+async def database_metrics():
+    """Connection-pool and database-lock wait times (writer, reader pool, BEGIN IMMEDIATE)."""
+    if publisher.shards.sharded:
+        return publisher.shards.metrics()
+    return publisher.db_manager.metrics()
+
+
+@app.get("/metrics/retention")
+async def retention_metrics():
+    """Retention policies, the last expiry run and the database size."""
+    return await asyncio.to_thread(retention.metrics)
 
 
 if __name__ == "__main__":
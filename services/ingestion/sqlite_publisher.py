@@ -1,71 +1,356 @@
 """
 SQLite-based publisher for persistent content event storage.
 """
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import base64
+import heapq
+import itertools
 import sys
 import os
 import json
+import threading
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.exc import IntegrityError
 
 # Setup path for database models
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
 
 from models import ContentEvent
-from database import DatabaseManager, ContentEventDB
+from database import DatabaseManager, ContentEventDB, ContentSightingDB, compute_content_hash, insert_chunked
+from write_buffer import WriteBehindBuffer
+from export import export_stream
+from sharding import ShardSet, merge_sorted
+import fulltext
+
+# Keep IN (...) lookups well below SQLite's bound-parameter limit
+HASH_LOOKUP_CHUNK = 500
+
+
+# Largest page served by get_events_page
+MAX_PAGE_SIZE = 1000
+STREAM_YIELD_PER = 1000
+
+
+def encode_cursor(timestamp: datetime, event_id: str) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor."""
+    raw = json.dumps([timestamp.isoformat(), event_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        timestamp, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(timestamp), str(event_id)
+    except Exception as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
+
+
+def row_to_event(row) -> ContentEvent:
+    """Convert a content_events ORM object or Core row to a ContentEvent."""
+    return ContentEvent(
+        id=row.id,
+        source=row.source,
+        text=row.text,
+        metadata=json.loads(row.metadata_json) if row.metadata_json else {},
+        timestamp=row.timestamp
+    )
+
+
+def _lookup_hashes(conn, content_hashes: List[str]) -> Dict[str, str]:
+    """Map the content hashes that are already stored to their canonical event id."""
+    canonical: Dict[str, str] = {}
+    for start in range(0, len(content_hashes), HASH_LOOKUP_CHUNK):
+        chunk = content_hashes[start:start + HASH_LOOKUP_CHUNK]
+        rows = conn.execute(
+            select(ContentEventDB.content_hash, ContentEventDB.id)
+            .where(ContentEventDB.content_hash.in_(chunk))
+        )
+        canonical.update({content_hash: event_id for content_hash, event_id in rows})
+    return canonical
+
+
+def _plan_rows(events: List[ContentEvent], hashes: List[str],
+               canonical: Dict[str, str]) -> Tuple[List[Dict], List[Dict], List[Tuple[str, bool]]]:
+    """
+    Split events into new content rows and sightings of already-known content.
+    
+    ``canonical`` (hash -> stored event id) is extended with the new rows, so
+    repeats within the batch become sightings too.
+    
+    Returns:
+        (content_events rows, content_sightings rows, (canonical id, newly stored) per event)
+    """
+    new_rows = []
+    sighting_rows = []
+    results = []
+    for event, content_hash in zip(events, hashes):
+        metadata_json = json.dumps(event.metadata) if event.metadata else None
+        if content_hash in canonical:
+            sighting_rows.append({
+                "event_id": canonical[content_hash],
+                "content_hash": content_hash,
+                "source": event.source,
+                "metadata_json": metadata_json,
+                "timestamp": event.timestamp
+            })
+            results.append((canonical[content_hash], False))
+            continue
+        
+        canonical[content_hash] = event.id
+        new_rows.append({
+            "id": event.id,
+            "source": event.source,
+            "text": event.text,
+            "content_hash": content_hash,
+            "metadata_json": metadata_json,
+            "timestamp": event.timestamp
+        })
+        results.append((event.id, True))
+    return new_rows, sighting_rows, results
+
+
+def _store_shard_rows(conn, part: Tuple[List[Dict], List[Dict]]) -> Dict[str, str]:
+    """
+    Insert one shard's planned content and sighting rows.
+    
+    The new rows' hashes are checked again inside the write transaction, in
+    case another process stored the same content on this shard meanwhile;
+    such rows are recorded as sightings instead.
+    
+    Returns:
+        Planned event id -> id of the row stored first, for rows turned into sightings
+    """
+    new_rows, sighting_rows = part
+    stored = _lookup_hashes(conn, [row["content_hash"] for row in new_rows])
+    remapped: Dict[str, str] = {}
+    if stored:
+        kept = []
+        for row in new_rows:
+            if row["content_hash"] not in stored:
+                kept.append(row)
+                continue
+            remapped[row["id"]] = stored[row["content_hash"]]
+            sighting_rows.append({
+                "event_id": stored[row["content_hash"]],
+                "content_hash": row["content_hash"],
+                "source": row["source"],
+                "metadata_json": row["metadata_json"],
+                "timestamp": row["timestamp"]
+            })
+        new_rows = kept
+        sighting_rows = [
+            dict(row, event_id=remapped.get(row["event_id"], row["event_id"])) for row in sighting_rows
+        ]
+    insert_chunked(conn, ContentEventDB.__table__, new_rows)
+    insert_chunked(conn, ContentSightingDB.__table__, sighting_rows)
+    return remapped
+
+
+def _fetch_rows(conn, query) -> list:
+    return conn.execute(query).all()
+
+
+def _row_key(row) -> Tuple[datetime, str]:
+    """Keyset position of a content_events row, the order pages are merged in."""
+    return row.timestamp, row.id
+
+
+def _count_rows(conn) -> int:
+    return conn.execute(select(func.count()).select_from(ContentEventDB)).scalar()
 
 
 class SQLitePublisher:
     """
     SQLite-based publisher that persists content events to database.
+    
+    Events are content-addressed: text that is already stored is not written
+    again, the repeat is recorded as a sighting of the canonical event instead.
+    
+    With ``write_behind`` settings (see ``write_buffer.write_behind_from_env``)
+    writes go through a ``WriteBehindBuffer`` instead of committing inside the
+    caller's request.
+    
+    The async methods run their queries through ``DatabaseManager.run_read`` /
+    ``run_write``, so concurrent requests overlap their database I/O instead
+    of blocking the event loop one after another.
+    
+    With ``ASTRA_DB_SHARDS`` > 1 events are spread over the shard files by
+    event id (see ``sharding.py``) and reads merge the shards' results.
+    Deduplication stays global: a batch looks its hashes up on every shard
+    before writing. It first claims its content hashes
+    (``_claim_hashes``), so batches of this process that share a text run
+    one after another and the others in parallel. Writers in other
+    processes are not covered (see ``_write_sharded``).
     """
     
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    def __init__(self, write_behind: Optional[Dict[str, Any]] = None, shards: Optional[ShardSet] = None):
+        self.shards = shards or ShardSet()
+        self.db_manager = self.shards.primary
+        # Content hashes of sharded batches being written -> set when that batch is done
+        self._hashes_in_flight: Dict[str, threading.Event] = {}
+        self._dedup_lock = threading.Lock()  # guards _hashes_in_flight only
+        # Sharded writes fan out to every shard's writer thread from a worker thread
+        self._run_write = asyncio.to_thread if self.shards.sharded else self.db_manager.run_write
+        self.write_buffer: Optional[WriteBehindBuffer] = None
+        if write_behind:
+            self.write_buffer = WriteBehindBuffer(self._write_events, name="content_events",
+                                                  runner=self._run_write, **write_behind)
+    
+    async def close(self):
+        """Drain pending buffered writes (call on service shutdown)."""
+        if self.write_buffer is not None:
+            await self.write_buffer.stop()
     
-    async def publish(self, event: ContentEvent):
+    def buffer_metrics(self) -> Dict[str, Any]:
+        """Write-behind queue metrics, or ``enabled: False`` when writes are synchronous."""
+        if self.write_buffer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.write_buffer.metrics()}
+    
+    async def publish(self, event: ContentEvent) -> Dict[str, Any]:
         """
         Publish (store) a content event to SQLite database.
         
         Args:
             event: ContentEvent to store
-        """
-        session = self.db_manager.get_session()
-        try:
-            # Convert Pydantic model to SQLAlchemy model
-            db_event = ContentEventDB(
-                id=event.id,
-                source=event.source,
-                text=event.text,
-                metadata_json=json.dumps(event.metadata) if event.metadata else None,
-                timestamp=event.timestamp
-            )
             
-            session.add(db_event)
-            session.commit()
-        finally:
-            session.close()
+        Returns:
+            Deduplication summary (see ``publish_batch``)
+        """
+        return await self.publish_batch([event])
     
-    async def publish_batch(self, events: List[ContentEvent]):
+    async def publish_batch(self, events: List[ContentEvent]) -> Dict[str, Any]:
         """
         Publish multiple events in a batch.
         
+        The whole batch is written in a single transaction using Core-level
+        ``executemany`` inserts, chunked to bound memory.
+        
         Args:
             events: List of ContentEvent objects to store
+            
+        Returns:
+            Summary with counts of stored and duplicate events, the dedup ratio
+            and the canonical event id for every input event (in input order).
+            When writes are acknowledged on enqueue the counts are not known
+            yet: they are None and ``queued`` is True.
+        """
+        if self.write_buffer is None:
+            results = await self._run_write(self._write_events, events)
+        else:
+            results = await self.write_buffer.submit(events)
+            if results is None:
+                return {
+                    "received": len(events),
+                    "stored": None,
+                    "duplicates": None,
+                    "dedup_ratio": None,
+                    "event_ids": [event.id for event in events],
+                    "queued": True
+                }
+        
+        duplicates = sum(1 for _, stored in results if not stored)
+        return {
+            "received": len(events),
+            "stored": len(events) - duplicates,
+            "duplicates": duplicates,
+            "dedup_ratio": duplicates / len(events) if events else 0.0,
+            "event_ids": [event_id for event_id, _ in results]
+        }
+    
+    def _write_events(self, events: List[ContentEvent]) -> List[Tuple[str, bool]]:
+        """
+        Store events in one transaction (blocking).
+        
+        Returns:
+            (canonical event id, newly stored) for every input event
         """
-        session = self.db_manager.get_session()
+        if self.shards.sharded:
+            return self._write_sharded(events)
         try:
-            for event in events:
-                db_event = ContentEventDB(
-                    id=event.id,
-                    source=event.source,
-                    text=event.text,
-                    metadata_json=json.dumps(event.metadata) if event.metadata else None,
-                    timestamp=event.timestamp
-                )
-                session.add(db_event)
-            
-            session.commit()
+            with self.db_manager.engine.begin() as conn:
+                return self._store_events(conn, events)
+        except IntegrityError:
+            # A concurrent writer stored one of our hashes first; retry so
+            # those events are resolved as sightings of its row.
+            with self.db_manager.engine.begin() as conn:
+                return self._store_events(conn, events)
+    
+    def _store_events(self, conn, events: List[ContentEvent]) -> List[Tuple[str, bool]]:
+        """Insert new content and sightings for repeats on an open transaction."""
+        hashes = [compute_content_hash(event.text) for event in events]
+        canonical = _lookup_hashes(conn, list(dict.fromkeys(hashes)))
+        new_rows, sighting_rows, results = _plan_rows(events, hashes, canonical)
+        insert_chunked(conn, ContentEventDB.__table__, new_rows)
+        insert_chunked(conn, ContentSightingDB.__table__, sighting_rows)
+        return results
+    
+    def _write_sharded(self, events: List[ContentEvent]) -> List[Tuple[str, bool]]:
+        """
+        Store events across the shards (blocking; not on a DB thread).
+        
+        Hashes are looked up on every shard in parallel, then each shard
+        commits its new events and the sightings of its canonical events in
+        its own transaction, all shards at once.
+        
+        Within this process two batches never store the same text on two
+        shards: a batch first claims its hashes (see ``_claim_hashes``) and
+        waits for any batch still writing one of them, so batches with
+        different texts commit in parallel. Across processes only rows on the
+        same shard are re-checked (``_store_shard_rows``); two processes that
+        store the same text at the same moment under ids routed to different
+        shards keep both rows.
+        """
+        hashes = [compute_content_hash(event.text) for event in events]
+        unique_hashes = list(dict.fromkeys(hashes))
+        done = self._claim_hashes(unique_hashes)
+        try:
+            canonical: Dict[str, str] = {}
+            for found in self.shards.read_all_sync(_lookup_hashes, unique_hashes):
+                canonical.update(found)
+            new_rows, sighting_rows, results = _plan_rows(events, hashes, canonical)
+            parts: Dict[int, Tuple[List[Dict], List[Dict]]] = {}
+            for row in new_rows:
+                parts.setdefault(self.shards.index_for(row["id"]), ([], []))[0].append(row)
+            for row in sighting_rows:
+                parts.setdefault(self.shards.index_for(row["event_id"]), ([], []))[1].append(row)
+            remapped: Dict[str, str] = {}
+            for shard_remapped in self.shards.write_parts_sync(parts, _store_shard_rows).values():
+                remapped.update(shard_remapped)
         finally:
-            session.close()
+            with self._dedup_lock:
+                for content_hash in unique_hashes:
+                    del self._hashes_in_flight[content_hash]
+            done.set()
+        if remapped:
+            results = [
+                (remapped.get(event_id, event_id), stored and event_id not in remapped)
+                for event_id, stored in results
+            ]
+        return results
+    
+    def _claim_hashes(self, content_hashes: List[str]) -> threading.Event:
+        """
+        Mark hashes as being written by the calling batch, once no other batch is writing any of them.
+        
+        Claims are all-or-nothing and nothing is held while waiting, so
+        batches never wait on each other in a cycle.
+        
+        Returns:
+            Event to set once the batch has committed (or failed) and released its claims
+        """
+        while True:
+            with self._dedup_lock:
+                busy = next((self._hashes_in_flight[h] for h in content_hashes if h in self._hashes_in_flight), None)
+                if busy is None:
+                    done = threading.Event()
+                    for content_hash in content_hashes:
+                        self._hashes_in_flight[content_hash] = done
+                    return done
+            busy.wait()
     
     async def get_all_events(self) -> List[ContentEvent]:
         """
@@ -74,24 +359,140 @@ class SQLitePublisher:
         Returns:
             List of ContentEvent objects
         """
-        session = self.db_manager.get_session()
-        try:
-            db_events = session.query(ContentEventDB).order_by(ContentEventDB.timestamp.desc()).all()
-            
-            # Convert SQLAlchemy models to Pydantic models
-            events = []
-            for db_event in db_events:
-                events.append(ContentEvent(
-                    id=db_event.id,
-                    source=db_event.source,
-                    text=db_event.text,
-                    metadata=json.loads(db_event.metadata_json) if db_event.metadata_json else {},
-                    timestamp=db_event.timestamp
-                ))
+        parts = await self.shards.read_all(_fetch_rows, self._events_query())
+        return [row_to_event(row) for row in merge_sorted(parts, key=_row_key, reverse=True)]
+    
+    def _events_query(self, cursor: Optional[str] = None, source: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      order: str = "desc"):
+        """Build a keyset-ordered select over content_events with optional filters."""
+        if order not in ("asc", "desc"):
+            raise ValueError(f"order must be 'asc' or 'desc', got: {order}")
+        key = tuple_(ContentEventDB.timestamp, ContentEventDB.id)
+        query = select(
+            ContentEventDB.id,
+            ContentEventDB.source,
+            ContentEventDB.text,
+            ContentEventDB.metadata_json,
+            ContentEventDB.timestamp
+        )
+        if cursor:
+            position = decode_cursor(cursor)
+            query = query.where(key < position if order == "desc" else key > position)
+        if source:
+            query = query.where(ContentEventDB.source == source)
+        if since:
+            query = query.where(ContentEventDB.timestamp >= since)
+        if until:
+            query = query.where(ContentEventDB.timestamp < until)
+        if order == "desc":
+            return query.order_by(ContentEventDB.timestamp.desc(), ContentEventDB.id.desc())
+        return query.order_by(ContentEventDB.timestamp.asc(), ContentEventDB.id.asc())
+    
+    async def get_events_page(self, limit: int = 100, cursor: Optional[str] = None,
+                              source: Optional[str] = None, since: Optional[datetime] = None,
+                              until: Optional[datetime] = None,
+                              order: str = "desc") -> Tuple[List[ContentEvent], Optional[str]]:
+        """
+        Read one page of events using keyset pagination on (timestamp, id).
+        
+        The cost depends on the page size, not on the table size.
+        
+        Args:
+            limit: Page size (capped at MAX_PAGE_SIZE)
+            cursor: Opaque cursor from a previous page; the page starts after it
+            source: Only events from this source
+            since: Only events with timestamp >= since
+            until: Only events with timestamp < until
+            order: "desc" (newest first) or "asc" (oldest first)
             
-            return events
-        finally:
-            session.close()
+        Returns:
+            (events, next_cursor); next_cursor is None on the last page.
+            ``encode_cursor`` of the last event is the resume position.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = self._events_query(cursor, source, since, until, order).limit(limit + 1)
+        parts = await self.shards.read_all(_fetch_rows, query)
+        rows = merge_sorted(parts, key=_row_key, reverse=order == "desc", limit=limit + 1)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+        return [row_to_event(row) for row in rows], next_cursor
+    
+    def iter_events(self, cursor: Optional[str] = None, source: Optional[str] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    order: str = "desc", limit: Optional[int] = None) -> Iterator[ContentEvent]:
+        """
+        Stream events through a server-side cursor without materializing the result.
+        
+        Rows are fetched from SQLite in chunks of STREAM_YIELD_PER, so memory
+        use is constant regardless of how many events are streamed.
+        
+        The query is built (and the cursor decoded) when this is called, not
+        on first iteration, so callers can report bad arguments before they
+        start sending a response.
+        
+        Raises:
+            ValueError: Invalid cursor, order or a negative limit
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must be >= 0, got: {limit}")
+        query = self._events_query(cursor, source, since, until, order)
+        if limit:
+            query = query.limit(limit)
+        return self._iter_rows(query, order == "desc", limit)
+    
+    def _iter_rows(self, query, reverse: bool, limit: Optional[int]) -> Iterator[ContentEvent]:
+        streams = [self._stream_rows(manager, query) for manager in self.shards.managers]
+        rows = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=_row_key, reverse=reverse)
+        for row in itertools.islice(rows, limit):
+            yield row_to_event(row)
+    
+    @staticmethod
+    def _stream_rows(db_manager: DatabaseManager, query) -> Iterator:
+        with db_manager.streamer.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=STREAM_YIELD_PER).execute(query)
+            yield from result
+    
+    def export_events(self, fmt: str = "ndjson", compress: bool = False,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      label: Optional[str] = None, source: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Stream matching content events as encoded chunks (see ``export.py``).
+        
+        ``label`` keeps events that have an analytics record with that label.
+        
+        Raises:
+            ValueError: Unknown format, or pyarrow missing for parquet/arrow
+        """
+        return export_stream([manager.streamer for manager in self.shards.managers], "content", fmt, compress,
+                             since, until, label, source)
+    
+    async def search(self, query: str, limit: int = 20, offset: int = 0, label: Optional[str] = None,
+                     source: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Full-text search over event text, BM25-ranked, with snippets.
+        
+        See ``fulltext.search`` for the query syntax and result shape. With
+        several shards each ranks its top ``offset + limit`` hits and the pages
+        are merged by score; BM25 weights come from each shard's own index, so
+        the merged order is an approximation of a single-index ranking.
+        
+        Raises:
+            ValueError: Empty or malformed query
+        """
+        if not self.shards.sharded:
+            parts = await self.shards.read_all(fulltext.search, query, limit, offset, label, source, since, until)
+            return parts[0]
+        limit = max(1, min(limit, fulltext.MAX_SEARCH_LIMIT))
+        offset = max(0, offset)
+        parts = await self.shards.read_all(fulltext.search, query, offset + limit, 0, label, source, since, until,
+                                           offset + limit)
+        hits = merge_sorted([part["hits"] for part in parts], key=lambda hit: hit["score"], limit=offset + limit)
+        return {"query": query, "hits": hits[offset:]}
     
     async def get_event_by_id(self, event_id: str) -> ContentEvent:
         """
@@ -103,26 +504,10 @@ class SQLitePublisher:
         Returns:
             ContentEvent or None if not found
         """
-        session = self.db_manager.get_session()
-        try:
-            db_event = session.query(ContentEventDB).filter(ContentEventDB.id == event_id).first()
-            
-            if db_event:
-                return ContentEvent(
-                    id=db_event.id,
-                    source=db_event.source,
-                    text=db_event.text,
-                    metadata=json.loads(db_event.metadata_json) if db_event.metadata_json else {},
-                    timestamp=db_event.timestamp
-                )
-            return None
-        finally:
-            session.close()
+        query = self._events_query().where(ContentEventDB.id == event_id).limit(1)
+        rows = await self.shards.read_key(event_id, _fetch_rows, query)
+        return row_to_event(rows[0]) if rows else None
     
     async def count_events(self) -> int:
         """Get total count of stored events."""
-        session = self.db_manager.get_session()
-        try:
-            return session.query(ContentEventDB).count()
-        finally:
-            session.close()
+        return sum(await self.shards.read_all(_count_rows))
@@ -0,0 +1,570 @@
+"""
+Incrementally maintained aggregates over ``analytics_records``.
+
+Writers fold each batch of inserted rows into per-key deltas and upsert them
+inside the same transaction as the insert, so the aggregates always match the
+committed records:
+
+    analytics_aggregates   running totals per label and source (dashboard stats)
+    analytics_rollups      minute / hour / day buckets per label and source with
+                           counts, confidence sums and a 10-bin histogram
+    analytics_sketches     hour / day buckets per label with HyperLogLog sketches
+                           of distinct sources and event ids and a KLL sketch of
+                           confidences (distinct counts and quantiles)
+
+Reading stats or a trend then costs O(groups) or O(buckets) instead of a scan
+of the whole records table. Minute and hour rollups are pruned past their
+retention horizon; the coarser resolutions already hold the same data, so
+long ranges are answered from hour or day buckets. The ``rebuild_*``
+functions recompute everything from scratch (after manual edits, restores or
+upgrades from a version without the tables).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import sys
+import os
+
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
+
+from database import AnalyticsAggregateDB, AnalyticsRecordDB, AnalyticsRollupDB, AnalyticsSketchDB
+from sketches import HyperLogLog, KLLSketch, hash64
+
+TOTAL = "total"
+# Aggregate dimension -> analytics_records column
+DIMENSIONS = {"label": "detection_label", "source": "source"}
+
+Deltas = Dict[Tuple[str, str], List[float]]
+
+# Rollup resolutions, finest first, with the retention of each (None = forever)
+RESOLUTIONS = ("minute", "hour", "day")
+RESOLUTION_STEP = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+ROLLUP_RETENTION = {
+    "minute": timedelta(hours=float(os.getenv("ASTRA_ROLLUP_MINUTE_RETENTION_HOURS", "48"))),
+    "hour": timedelta(days=float(os.getenv("ASTRA_ROLLUP_HOUR_RETENTION_DAYS", "90"))),
+    "day": None,
+}
+HISTOGRAM_BINS = 10
+HISTOGRAM_COLUMNS = [f"hist_{i}" for i in range(HISTOGRAM_BINS)]
+# Upper bound on points returned when the resolution is chosen automatically
+MAX_AUTO_POINTS = 1000
+REBUILD_CHUNK = 10000
+
+# Sketch buckets; hour sketches are dropped past retention, day sketches are kept
+SKETCH_RESOLUTIONS = ("hour", "day")
+SKETCH_RETENTION = {
+    "hour": timedelta(days=float(os.getenv("ASTRA_SKETCH_HOUR_RETENTION_DAYS", "30"))),
+    "day": None,
+}
+SKETCH_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# Keep (resolution, bucket, label) IN lookups below SQLite's parameter limit
+SKETCH_LOOKUP_CHUNK = 200
+
+
+def stats_deltas(rows: Iterable[Dict[str, Any]], sign: int = 1) -> Deltas:
+    """
+    Fold analytics rows into ``{(dimension, key): [count, confidence_sum]}``.
+
+    Args:
+        rows: Row dicts with ``detection_label``, ``source`` and ``confidence``
+        sign: 1 for inserted rows, -1 for deleted rows
+    """
+    deltas: Deltas = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        confidence = row.get("confidence") or 0.0
+        for dimension, key in [(TOTAL, "")] + [(dim, row.get(col) or "") for dim, col in DIMENSIONS.items()]:
+            entry = deltas[(dimension, key)]
+            entry[0] += sign
+            entry[1] += sign * confidence
+    return deltas
+
+
+def apply_stats_deltas(conn, deltas: Deltas):
+    """Add deltas to the aggregate table on an open connection (caller owns the transaction)."""
+    if not deltas:
+        return
+    table = AnalyticsAggregateDB.__table__
+    now = datetime.utcnow()
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.dimension, table.c.key],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "confidence_sum": table.c.confidence_sum + stmt.excluded.confidence_sum,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    conn.execute(stmt, [
+        {"dimension": dimension, "key": key, "count": count, "confidence_sum": total, "updated_at": now}
+        for (dimension, key), (count, total) in deltas.items()
+    ])
+
+
+def rebuild_stats(conn) -> int:
+    """
+    Recompute all aggregates from ``analytics_records`` (caller owns the transaction).
+
+    Returns:
+        Number of aggregate rows written
+    """
+    table = AnalyticsAggregateDB.__table__
+    records = AnalyticsRecordDB.__table__
+    now = datetime.utcnow()
+    conn.execute(delete(table))
+
+    groups = [(TOTAL, literal(""))] + [
+        (dimension, func.coalesce(records.c[column], "")) for dimension, column in DIMENSIONS.items()
+    ]
+    written = 0
+    for dimension, key in groups:
+        query = select(
+            literal(dimension), key, func.count(), func.total(records.c.confidence), literal(now)
+        ).select_from(records)
+        if dimension != TOTAL:
+            query = query.group_by(key)
+        result = conn.execute(
+            table.insert().from_select(["dimension", "key", "count", "confidence_sum", "updated_at"], query)
+        )
+        written += result.rowcount
+    return written
+
+
+def read_stats(conn) -> Dict[str, Any]:
+    """Dashboard statistics from the aggregate table."""
+    rows = conn.execute(
+        select(AnalyticsAggregateDB.dimension, AnalyticsAggregateDB.key,
+               AnalyticsAggregateDB.count, AnalyticsAggregateDB.confidence_sum)
+        .where(AnalyticsAggregateDB.count > 0)
+    ).all()
+
+    stats: Dict[str, Any] = {"total_events": 0, "avg_confidence": 0.0, "by_label": {}, "by_source": {}}
+    for row in rows:
+        if row.dimension == TOTAL:
+            stats["total_events"] = row.count
+            stats["avg_confidence"] = row.confidence_sum / row.count
+        else:
+            stats[f"by_{row.dimension}"][row.key] = row.count
+    return stats
+
+
+def merge_stats(parts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine ``read_stats`` results of several shards."""
+    merged: Dict[str, Any] = {"total_events": 0, "avg_confidence": 0.0, "by_label": {}, "by_source": {}}
+    confidence_sum = 0.0
+    for stats in parts:
+        merged["total_events"] += stats["total_events"]
+        confidence_sum += stats["avg_confidence"] * stats["total_events"]
+        for dimension in ("by_label", "by_source"):
+            for key, count in stats[dimension].items():
+                merged[dimension][key] = merged[dimension].get(key, 0) + count
+    if merged["total_events"]:
+        merged["avg_confidence"] = confidence_sum / merged["total_events"]
+    return merged
+
+
+def needs_rebuild(conn, table=AnalyticsAggregateDB.__table__) -> bool:
+    """True when records exist but ``table`` was never built (e.g. after an upgrade)."""
+    has_aggregates = conn.execute(select(literal(1)).select_from(table).limit(1)).first() is not None
+    has_records = conn.execute(select(AnalyticsRecordDB.id).limit(1)).first() is not None
+    return has_records and not has_aggregates
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Start of the ``resolution`` bucket containing ``timestamp``."""
+    if resolution == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+
+def histogram_bin(confidence: float) -> int:
+    """Histogram bin (0-9) of a confidence in [0, 1]."""
+    return min(HISTOGRAM_BINS - 1, max(0, int(confidence * HISTOGRAM_BINS)))
+
+
+def rollup_deltas(rows: Iterable[Dict[str, Any]], sign: int = 1) -> Dict[tuple, List[float]]:
+    """
+    Fold analytics rows into rollup deltas.
+
+    Returns:
+        ``{(resolution, bucket_start, label, source): [count, confidence_sum, hist_0..hist_9]}``
+    """
+    deltas: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0] + [0] * HISTOGRAM_BINS)
+    now = datetime.utcnow()
+    # Buckets already past retention would only be pruned again (e.g. backfills)
+    cutoffs = {resolution: now - retention for resolution, retention in ROLLUP_RETENTION.items() if retention}
+    for row in rows:
+        timestamp = row.get("timestamp") or now
+        confidence = row.get("confidence") or 0.0
+        label = row.get("detection_label") or ""
+        source = row.get("source") or ""
+        hist_index = 2 + histogram_bin(confidence)
+        for resolution in RESOLUTIONS:
+            if resolution in cutoffs and timestamp < cutoffs[resolution]:
+                continue
+            entry = deltas[(resolution, bucket_start(timestamp, resolution), label, source)]
+            entry[0] += sign
+            entry[1] += sign * confidence
+            entry[hist_index] += sign
+    return deltas
+
+
+def apply_rollup_deltas(conn, deltas: Dict[tuple, List[float]]):
+    """Add rollup deltas on an open connection (caller owns the transaction)."""
+    if not deltas:
+        return
+    table = AnalyticsRollupDB.__table__
+    stmt = sqlite_insert(table)
+    additive = ["count", "confidence_sum"] + HISTOGRAM_COLUMNS
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.resolution, table.c.bucket_start, table.c.label, table.c.source],
+        set_={column: table.c[column] + stmt.excluded[column] for column in additive},
+    )
+    conn.execute(stmt, [
+        {
+            "resolution": resolution, "bucket_start": start, "label": label, "source": source,
+            **dict(zip(additive, values)),
+        }
+        for (resolution, start, label, source), values in deltas.items()
+    ])
+
+
+def prune_rollups(conn, now: Optional[datetime] = None) -> int:
+    """
+    Drop minute and hour buckets older than their retention horizon.
+
+    Returns:
+        Number of rollup rows deleted
+    """
+    now = now or datetime.utcnow()
+    deleted = 0
+    for resolution, retention in ROLLUP_RETENTION.items():
+        if retention is None:
+            continue
+        result = conn.execute(
+            delete(AnalyticsRollupDB)
+            .where(AnalyticsRollupDB.resolution == resolution)
+            .where(AnalyticsRollupDB.bucket_start < now - retention)
+        )
+        deleted += result.rowcount
+    return deleted
+
+
+def rebuild_rollups(conn) -> int:
+    """
+    Recompute all rollups from ``analytics_records`` (caller owns the transaction).
+
+    Returns:
+        Number of rollup rows after the rebuild
+    """
+    conn.execute(delete(AnalyticsRollupDB))
+    records = AnalyticsRecordDB.__table__
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(records.c.id, records.c.timestamp, records.c.detection_label,
+                   records.c.source, records.c.confidence)
+            .where(records.c.id > last_id)
+            .order_by(records.c.id)
+            .limit(REBUILD_CHUNK)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        apply_rollup_deltas(conn, rollup_deltas(rows))
+    prune_rollups(conn)
+    return conn.execute(select(func.count()).select_from(AnalyticsRollupDB)).scalar()
+
+
+def choose_resolution(since: Optional[datetime], until: Optional[datetime],
+                      now: Optional[datetime] = None) -> str:
+    """Finest resolution that is still retained at ``since`` and keeps the range within MAX_AUTO_POINTS."""
+    now = now or datetime.utcnow()
+    since = since or now - timedelta(days=1)
+    until = until or now
+    for resolution in RESOLUTIONS:
+        retention = ROLLUP_RETENTION[resolution]
+        if retention is not None and since < now - retention:
+            continue
+        if (until - since) / RESOLUTION_STEP[resolution] <= MAX_AUTO_POINTS:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def query_timeseries(conn, resolution: str, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, label: Optional[str] = None,
+                     source: Optional[str] = None, group_by: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Range query over the rollups.
+
+    Args:
+        resolution: ``minute``, ``hour`` or ``day``
+        since: Inclusive lower bound on bucket start
+        until: Exclusive upper bound on bucket start
+        label: Only this label
+        source: Only this source
+        group_by: ``label``, ``source`` or None for one combined series
+
+    Returns:
+        ``{"resolution", "group_by", "series": {group: [point, ...]}}`` where each
+        point has ``bucket_start``, ``count``, ``avg_confidence`` and ``histogram``
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    if group_by not in (None, "label", "source"):
+        raise ValueError(f"Cannot group by: {group_by}")
+
+    table = AnalyticsRollupDB.__table__
+    group_column = table.c[group_by] if group_by else literal("all")
+    query = (
+        select(
+            table.c.bucket_start,
+            group_column.label("group"),
+            func.sum(table.c["count"]).label("count"),
+            func.sum(table.c.confidence_sum).label("confidence_sum"),
+            *[func.sum(table.c[column]).label(column) for column in HISTOGRAM_COLUMNS],
+        )
+        .where(table.c.resolution == resolution)
+        .group_by(table.c.bucket_start, group_column)
+        .order_by(table.c.bucket_start)
+    )
+    if since is not None:
+        query = query.where(table.c.bucket_start >= bucket_start(since, resolution))
+    if until is not None:
+        query = query.where(table.c.bucket_start < until)
+    if label is not None:
+        query = query.where(table.c.label == label)
+    if source is not None:
+        query = query.where(table.c.source == source)
+
+    series: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in conn.execute(query).mappings():
+        if not row["count"]:
+            continue
+        series[row["group"]].append({
+            "bucket_start": row["bucket_start"],
+            "count": row["count"],
+            "avg_confidence": row["confidence_sum"] / row["count"],
+            "histogram": [row[column] for column in HISTOGRAM_COLUMNS],
+        })
+    return {"resolution": resolution, "group_by": group_by, "series": dict(series)}
+
+
+def merge_timeseries(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine ``query_timeseries`` results of several shards (same resolution and grouping)."""
+    series: Dict[str, Dict[datetime, Dict[str, Any]]] = defaultdict(dict)
+    for part in parts:
+        for group, points in part["series"].items():
+            buckets = series[group]
+            for point in points:
+                existing = buckets.get(point["bucket_start"])
+                if existing is None:
+                    buckets[point["bucket_start"]] = dict(point, histogram=list(point["histogram"]))
+                    continue
+                count = existing["count"] + point["count"]
+                existing["avg_confidence"] = (
+                    existing["avg_confidence"] * existing["count"] + point["avg_confidence"] * point["count"]
+                ) / count
+                existing["count"] = count
+                existing["histogram"] = [a + b for a, b in zip(existing["histogram"], point["histogram"])]
+    return {
+        "resolution": parts[0]["resolution"],
+        "group_by": parts[0]["group_by"],
+        "series": {group: [buckets[start] for start in sorted(buckets)] for group, buckets in series.items()},
+    }
+
+
+def update_sketches(conn, rows: Iterable[Dict[str, Any]]):
+    """
+    Fold analytics rows into the per-bucket sketches (caller owns the transaction).
+
+    Sketches are read, updated and written back, so call this after the
+    records insert in the same transaction: the insert has already taken
+    SQLite's write lock, which keeps concurrent writers from interleaving.
+    """
+    now = datetime.utcnow()
+    cutoffs = {resolution: now - retention for resolution, retention in SKETCH_RETENTION.items() if retention}
+    # (source hash, event id hash, confidence) per row, hashed once for all resolutions
+    groups: Dict[tuple, List[tuple]] = defaultdict(list)
+    for row in rows:
+        timestamp = row.get("timestamp") or now
+        item = (hash64(row.get("source") or ""), hash64(row.get("event_id") or ""), row.get("confidence") or 0.0)
+        for resolution in SKETCH_RESOLUTIONS:
+            if resolution in cutoffs and timestamp < cutoffs[resolution]:
+                continue
+            groups[(resolution, bucket_start(timestamp, resolution), row.get("detection_label") or "")].append(item)
+    if not groups:
+        return
+
+    table = AnalyticsSketchDB.__table__
+    keys = list(groups)
+    stored: Dict[tuple, Any] = {}
+    for start in range(0, len(keys), SKETCH_LOOKUP_CHUNK):
+        chunk = keys[start:start + SKETCH_LOOKUP_CHUNK]
+        for row in conn.execute(
+            select(table).where(tuple_(table.c.resolution, table.c.bucket_start, table.c.label).in_(chunk))
+        ):
+            stored[(row.resolution, row.bucket_start, row.label)] = row
+
+    values = []
+    for key, items in groups.items():
+        existing = stored.get(key)
+        if existing is not None:
+            sources = HyperLogLog.from_bytes(existing.sources_hll)
+            events = HyperLogLog.from_bytes(existing.events_hll)
+            confidence = KLLSketch.from_bytes(existing.confidence_kll)
+            count = existing.count
+        else:
+            sources, events, confidence, count = HyperLogLog(), HyperLogLog(), KLLSketch(), 0
+        for source_hash, event_hash, value in items:
+            sources.add_hash(source_hash)
+            events.add_hash(event_hash)
+            confidence.update(value)
+        resolution, start, label = key
+        values.append({
+            "resolution": resolution, "bucket_start": start, "label": label,
+            "count": count + len(items),
+            "sources_hll": sources.to_bytes(),
+            "events_hll": events.to_bytes(),
+            "confidence_kll": confidence.to_bytes(),
+            "updated_at": now,
+        })
+
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.resolution, table.c.bucket_start, table.c.label],
+        set_={column: stmt.excluded[column]
+              for column in ("count", "sources_hll", "events_hll", "confidence_kll", "updated_at")},
+    )
+    conn.execute(stmt, values)
+
+
+def prune_sketches(conn, now: Optional[datetime] = None) -> int:
+    """Drop hour sketches older than their retention; returns the number deleted."""
+    now = now or datetime.utcnow()
+    deleted = 0
+    for resolution, retention in SKETCH_RETENTION.items():
+        if retention is None:
+            continue
+        result = conn.execute(
+            delete(AnalyticsSketchDB)
+            .where(AnalyticsSketchDB.resolution == resolution)
+            .where(AnalyticsSketchDB.bucket_start < now - retention)
+        )
+        deleted += result.rowcount
+    return deleted
+
+
+def rebuild_sketches(conn) -> int:
+    """Recompute all sketches from ``analytics_records``; returns the number of sketch rows."""
+    conn.execute(delete(AnalyticsSketchDB))
+    records = AnalyticsRecordDB.__table__
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(records.c.id, records.c.event_id, records.c.timestamp,
+                   records.c.detection_label, records.c.source, records.c.confidence)
+            .where(records.c.id > last_id)
+            .order_by(records.c.id)
+            .limit(REBUILD_CHUNK)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        update_sketches(conn, rows)
+    return conn.execute(select(func.count()).select_from(AnalyticsSketchDB)).scalar()
+
+
+def sketch_range(since: Optional[datetime] = None) -> Tuple[str, Optional[datetime]]:
+    """
+    Sketch resolution for a range starting at ``since`` and the bucket-aligned start.
+
+    Hour buckets are used when ``since`` is within their retention, otherwise day buckets.
+    """
+    now = datetime.utcnow()
+    resolution = "day"
+    hour_retention = SKETCH_RETENTION["hour"]
+    if since is not None and (hour_retention is None or since >= now - hour_retention):
+        resolution = "hour"
+    if since is not None:
+        since = bucket_start(since, resolution)
+    return resolution, since
+
+
+def sketch_rows(conn, resolution: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                label: Optional[str] = None) -> list:
+    """Stored sketch buckets of one resolution within a range."""
+    table = AnalyticsSketchDB.__table__
+    query = select(table).where(table.c.resolution == resolution)
+    if since is not None:
+        query = query.where(table.c.bucket_start >= since)
+    if until is not None:
+        query = query.where(table.c.bucket_start < until)
+    if label is not None:
+        query = query.where(table.c.label == label)
+    return conn.execute(query).all()
+
+
+def summarize_sketches(rows: Iterable, resolution: str, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> Dict[str, Any]:
+    """Merge sketch bucket rows (possibly from several shards) into the ``read_sketches`` result."""
+    merged: Dict[str, list] = {}
+    for row in rows:
+        parts = [row.count, HyperLogLog.from_bytes(row.sources_hll),
+                 HyperLogLog.from_bytes(row.events_hll), KLLSketch.from_bytes(row.confidence_kll)]
+        for group in (row.label, None):
+            if group not in merged:
+                merged[group] = [0, HyperLogLog(), HyperLogLog(), KLLSketch()]
+            target = merged[group]
+            target[0] += parts[0]
+            target[1].merge(parts[1])
+            target[2].merge(parts[2])
+            target[3].merge(parts[3])
+
+    def summarize(count, sources, events, confidence):
+        return {
+            "count": count,
+            "distinct_sources": round(sources.estimate()),
+            "distinct_events": round(events.estimate()),
+            "confidence_quantiles": {
+                f"p{int(q * 100)}": value
+                for q, value in zip(SKETCH_QUANTILES, confidence.quantiles(SKETCH_QUANTILES))
+            },
+        }
+
+    empty = [0, HyperLogLog(), HyperLogLog(), KLLSketch()]
+    return {
+        "resolution": resolution,
+        "since": since,
+        "until": until,
+        "error_bounds": {
+            "distinct_relative_std_error": round(empty[1].std_error, 4),
+            "quantile_rank_error": round(empty[3].rank_error, 4),
+        },
+        "by_label": {group: summarize(*parts) for group, parts in merged.items() if group is not None},
+        "overall": summarize(*merged.get(None, empty)),
+    }
+
+
+def read_sketches(conn, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  label: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Merge the bucket sketches covering a time range.
+
+    Uses hour buckets when ``since`` is within their retention, otherwise day
+    buckets (so the effective range starts at the bucket boundary, reported
+    as ``since`` in the result).
+
+    Returns:
+        ``{"resolution", "since", "until", "error_bounds", "by_label": {...}, "overall": {...}}``
+        where each group has ``count``, ``distinct_sources``, ``distinct_events``
+        and ``confidence_quantiles``
+    """
+    resolution, since = sketch_range(since)
+    return summarize_sketches(sketch_rows(conn, resolution, since, until, label), resolution, since, until)
@@ -0,0 +1,171 @@
+"""
+Live dashboard updates over Server-Sent Events.
+
+One `DashboardBroadcaster` per process polls `analytics_records` for rows
+newer than the last one it has seen and fans each batch out to every
+connected dashboard as a single ``delta`` event: the new records plus the
+change they make to the stats. The page applies the delta client-side, so
+any number of open dashboards costs one cheap indexed poll per interval
+instead of a full page render each.
+
+A page passes the newest record id it rendered (``after``); the broadcaster
+replays what it missed before joining the live feed, or asks it to reload
+(``resync``) when it is too far behind or its queue overflowed.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from models import AnalyticsRecord
+import aggregates
+
+# Records replayed to a connecting page before it is asked to reload instead
+CATCH_UP_LIMIT = 200
+POLL_BATCH = 500
+
+
+def _record_payload(record_id: int, record: AnalyticsRecord) -> Dict[str, Any]:
+    return {
+        "id": record_id,
+        "event_id": record.event_id,
+        "source": record.source,
+        "text_preview": record.text_preview,
+        "detection_label": record.detection_label,
+        "confidence": record.confidence,
+        "timestamp": record.timestamp.isoformat() if record.timestamp else None,
+    }
+
+
+def build_delta(rows: List[Tuple[int, AnalyticsRecord]]) -> Dict[str, Any]:
+    """Delta event for a batch of new records (oldest first)."""
+    deltas = aggregates.stats_deltas(
+        {"detection_label": record.detection_label, "source": record.source, "confidence": record.confidence}
+        for _, record in rows
+    )
+    stats: Dict[str, Any] = {"total_events": 0, "confidence_sum": 0.0, "by_label": {}, "by_source": {}}
+    for (dimension, key), (count, confidence_sum) in deltas.items():
+        if dimension == aggregates.TOTAL:
+            stats["total_events"] = count
+            stats["confidence_sum"] = confidence_sum
+        else:
+            stats[f"by_{dimension}"][key] = count
+    return {
+        "last_id": rows[-1][0],
+        "records": [_record_payload(record_id, record) for record_id, record in rows],
+        "stats": stats,
+    }
+
+
+class DashboardBroadcaster:
+    """Single poller that fans new analytics records out to SSE subscribers."""
+
+    def __init__(self, store, interval: float = 1.0, queue_size: int = 100, heartbeat: float = 15.0):
+        self.store = store
+        self.interval = interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.last_id: Optional[int] = None
+        # queue -> newest record id the subscriber already has (None = none yet)
+        self._subscribers: Dict[asyncio.Queue, Optional[int]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"polls": 0, "events": 0, "resyncs": 0}
+
+    async def subscribe(self, after: Optional[int] = None) -> asyncio.Queue:
+        """
+        Register a subscriber and start polling if this is the first one.
+
+        Args:
+            after: Newest record id the subscriber already has; missed
+                records are replayed (or a resync is queued) first
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            if self.last_id is None:
+                self.last_id = await self.store.latest_record_id()
+            if after is not None and after < self.last_id:
+                missed = await self.store.get_records_after(after, CATCH_UP_LIMIT + 1)
+                missed = [row for row in missed if row[0] <= self.last_id]
+                if len(missed) > CATCH_UP_LIMIT:
+                    queue.put_nowait(("resync", {"last_id": self.last_id}))
+                    self._stats["resyncs"] += 1
+                elif missed:
+                    queue.put_nowait(("delta", build_delta(missed)))
+            # A page rendered after our last poll already has the next few records
+            self._subscribers[queue] = after if after is not None and after > self.last_id else None
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.pop(queue, None)
+
+    async def stop(self):
+        """Stop polling (call on service shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            async with self._lock:
+                if not self._subscribers:
+                    # Forget the position so the next subscriber starts from the newest record
+                    self.last_id = None
+                    return
+                try:
+                    await self._poll()
+                except Exception as exc:  # keep serving; the next poll retries
+                    print(f"[DashboardBroadcaster] Poll failed: {exc}")
+
+    async def _poll(self):
+        """Fetch records after ``last_id`` and publish them (caller holds the lock)."""
+        rows = await self.store.get_records_after(self.last_id, POLL_BATCH)
+        self._stats["polls"] += 1
+        if not rows:
+            return
+        self.last_id = rows[-1][0]
+        self._publish(rows)
+
+    def _publish(self, rows: List[Tuple[int, AnalyticsRecord]]):
+        self._stats["events"] += 1
+        delta = build_delta(rows)
+        for queue, floor in list(self._subscribers.items()):
+            message = ("delta", delta)
+            if floor is not None:
+                if floor >= self.last_id:
+                    continue
+                self._subscribers[queue] = None
+                if floor >= rows[0][0]:
+                    message = ("delta", build_delta([row for row in rows if row[0] > floor]))
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A slow client lost updates; replace its backlog with a resync request
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("resync", {"last_id": self.last_id}))
+                self._stats["resyncs"] += 1
+
+    async def stream(self, after: Optional[int] = None) -> AsyncIterator[str]:
+        """Server-Sent Events for one client, with periodic heartbeat comments."""
+        queue = await self.subscribe(after)
+        try:
+            yield f"retry: {int(self.interval * 1000) + 1000}\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {data['last_id']}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"subscribers": len(self._subscribers), "last_id": self.last_id, **self._stats}
@@ -1,20 +1,29 @@
 """Risk analytics service main application."""
-from fastapi import FastAPI, Request, Response, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, Form, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
 import uuid
 from pathlib import Path
 import sys
 import os
-import requests
 
 # Setup path for shared schemas
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
 
-from models import AnalyticsRecord, DetectionRequest, DetectionResult, ContentEvent
+from models import AnalyticsRecord, DetectionRequest, DetectionResult, ContentEvent, EventLogBatch, JobInfo
 from sqlite_store import SQLiteAnalyticsStore
+from database import DatabaseManager, TimeRange, time_range
+from write_buffer import write_behind_from_env
+from job_queue import JobContext, JobRegistry, JobWorkerPool
+from service_client import RefreshingCache, ServiceClient
+from live_updates import DashboardBroadcaster
+from export import MEDIA_TYPES, export_filename
+from retention import RetentionManager
+from outbox import OutboxConsumer
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -24,25 +33,111 @@ app = FastAPI(title="ASTRA Risk Analytics Service", version="0.1.0")
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
-# Global store instance (SQLite for persistent storage)
-analytics_store = SQLiteAnalyticsStore()
+# Optional per-service database file (default: ASTRA_DB_PATH or data/astra.db)
+if os.getenv("ANALYTICS_DB_PATH"):
+    DatabaseManager.set_default(os.getenv("ANALYTICS_DB_PATH"))
+
+# Global store instance (SQLite for persistent storage; optional write-behind)
+analytics_store = SQLiteAnalyticsStore(write_behind=write_behind_from_env())
+
+# One poller shared by every open dashboard's live-update stream
+dashboard_broadcaster = DashboardBroadcaster(
+    analytics_store,
+    interval=float(os.getenv("DASHBOARD_STREAM_INTERVAL", "1.0")),
+)
+
+# Expiry of old records (ASTRA_RETENTION_*); stats aggregates follow the deletes
+retention = RetentionManager(
+    ["analytics_records", "detection_results", "detection_signatures"],
+    hooks={"analytics_records": analytics_store.on_records_expired},
+    db_managers=analytics_store.shards.managers,
+)
 
 # Configuration for service endpoints
 DETECTION_SERVICE_URL = os.getenv("DETECTION_SERVICE_URL", "http://localhost:8002")
 INGESTION_SERVICE_URL = os.getenv("INGESTION_SERVICE_URL", "http://localhost:8001")
 
-
-def _fetch_detector_info() -> tuple[Optional[str], list[str]]:
+# Pooled, non-blocking clients for the downstream services (per-endpoint timeouts,
+# budgeted retries and a circuit breaker per endpoint)
+SYNC_DETECT_TIMEOUT = float(os.getenv("SYNC_DETECT_TIMEOUT", "120"))
+detection_client = ServiceClient(
+    "detection",
+    DETECTION_SERVICE_URL,
+    timeouts={
+        "detect": float(os.getenv("DETECTION_TIMEOUT", "30")),
+        "detect_batch": SYNC_DETECT_TIMEOUT,
+        "detector": 5.0,
+        "set_detector": 10.0,
+    },
+)
+ingestion_client = ServiceClient(
+    "ingestion",
+    INGESTION_SERVICE_URL,
+    timeouts={"events": float(os.getenv("INGESTION_TIMEOUT", "30"))},
+)
+
+
+async def _load_detector_info() -> tuple[Optional[str], list[str]]:
     """Fetch active detector and available options from detection service."""
-    try:
-        resp = requests.get(f"{DETECTION_SERVICE_URL}/detector", timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-        active = data.get("active_detector") or data.get("default")
-        available = data.get("available_detectors") or data.get("detectors") or []
-        return active, list(available)
-    except Exception:
-        return None, []
+    resp = await detection_client.get("/detector", endpoint="detector")
+    resp.raise_for_status()
+    data = resp.json()
+    active = data.get("active_detector") or data.get("default")
+    available = data.get("available_detectors") or data.get("detectors") or []
+    return active, list(available)
+
+
+# Detector info is served from cache so dashboard renders never wait on the
+# detection service; the last-known value is kept while detection is down
+detector_info = RefreshingCache(
+    _load_detector_info,
+    ttl=float(os.getenv("DETECTOR_INFO_TTL", "30")),
+    default=(None, []),
+)
+
+
+async def _fetch_detector_info() -> tuple[Optional[str], list[str]]:
+    """Active detector and available options (cached)."""
+    return await detector_info.get()
+
+
+# Incremental sync from ingestion (offset kept as an ingestion event-log consumer group)
+SYNC_CONSUMER_GROUP = "risk-analytics-sync"
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_DETECT_BATCH = int(os.getenv("SYNC_DETECT_BATCH", "32"))
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "4"))
+_sync_lock = asyncio.Lock()
+
+# Continuous scoring of new events from the content_events outbox (needs
+# ingestion and risk analytics on the same database file)
+OUTBOX_CONSUMER_ENABLED = os.getenv("ANALYTICS_OUTBOX_CONSUMER", "1").lower() not in ("0", "false", "no")
+
+# Background workers for long-running sync jobs
+SYNC_JOB_KIND = "sync-from-ingestion"
+job_pool = JobWorkerPool(kinds=[SYNC_JOB_KIND])
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start background job workers, retention and the outbox consumer."""
+    job_pool.start()
+    retention.start()
+    if OUTBOX_CONSUMER_ENABLED:
+        for consumer in outbox_consumers:
+            consumer.start()
+
+
+@app.on_event("shutdown")
+async def drain_store():
+    """Release running jobs, flush buffered writes and close service connections."""
+    await dashboard_broadcaster.stop()
+    for consumer in outbox_consumers:
+        await consumer.stop()
+    await retention.stop()
+    await job_pool.stop()
+    await analytics_store.close()
+    await detection_client.aclose()
+    await ingestion_client.aclose()
 
 
 @app.get("/")
@@ -61,32 +156,58 @@ async def favicon() -> Response:
     return Response(status_code=204)
 
 
+async def _render_dashboard(request: Request, error: Optional[str] = None, status_code: int = 200):
+    """Render the dashboard template from one consistent store snapshot."""
+    stats, recent_records, last_record_id = await analytics_store.get_dashboard_snapshot(limit=50)
+    active_detector, available_detectors = await _fetch_detector_info()
+    return templates.TemplateResponse(
+        "dashboard.html",
+        {
+            "request": request,
+            "stats": stats,
+            "records": recent_records,
+            "last_record_id": last_record_id,
+            "active_detector": active_detector,
+            "available_detectors": available_detectors,
+            "error": error,
+        },
+        status_code=status_code,
+    )
+
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Render analytics dashboard."""
-    stats = await analytics_store.get_stats()
-    recent_records = await analytics_store.get_recent(limit=50)
-    active_detector, available_detectors = _fetch_detector_info()
+    return await _render_dashboard(request)
+
+
+@app.get("/dashboard/stream")
+async def dashboard_stream(request: Request, after: Optional[int] = None):
+    """
+    Live dashboard updates as Server-Sent Events.
     
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
-        "stats": stats,
-        "records": recent_records,
-        "active_detector": active_detector,
-        "available_detectors": available_detectors,
-        "error": None,
-    })
+    Emits ``delta`` events (new records and stat increments) and ``resync``
+    events (reload the page). All connections share one database poller.
+    
+    Args:
+        after: Newest record id the page already shows; the browser's
+            ``Last-Event-ID`` header takes precedence on reconnect
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    return StreamingResponse(
+        dashboard_broadcaster.stream(after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/dashboard/analyze-text", response_class=HTMLResponse)
 async def dashboard_analyze_text(request: Request, text: str = Form(...)):
     """Analyze ad-hoc text from the dashboard and store result."""
     try:
-        response = requests.post(
-            f"{DETECTION_SERVICE_URL}/detect",
-            json={"text": text},
-            timeout=30,
-        )
+        response = await detection_client.post("/detect", endpoint="detect", json={"text": text})
         response.raise_for_status()
         result = DetectionResult(**response.json())
 
@@ -102,21 +223,7 @@ async def dashboard_analyze_text(request: Request, text: str = Form(...)):
 
         return RedirectResponse(url="/dashboard", status_code=303)
     except Exception as exc:  # pragma: no cover - UI path
-        stats = await analytics_store.get_stats()
-        recent_records = await analytics_store.get_recent(limit=50)
-        active_detector, available_detectors = _fetch_detector_info()
-        return templates.TemplateResponse(
-            "dashboard.html",
-            {
-                "request": request,
-                "stats": stats,
-                "records": recent_records,
-                "active_detector": active_detector,
-                "available_detectors": available_detectors,
-                "error": str(exc),
-            },
-            status_code=500,
-        )
+        return await _render_dashboard(request, error=str(exc), status_code=500)
 
 
 @app.post("/dashboard/upload-file", response_class=HTMLResponse)
@@ -128,11 +235,7 @@ async def dashboard_upload_file(request: Request, file: UploadFile = File(...)):
         if not text.strip():
             raise ValueError("Uploaded file is empty or not valid text.")
 
-        response = requests.post(
-            f"{DETECTION_SERVICE_URL}/detect",
-            json={"text": text},
-            timeout=30,
-        )
+        response = await detection_client.post("/detect", endpoint="detect", json={"text": text})
         response.raise_for_status()
         result = DetectionResult(**response.json())
 
@@ -148,49 +251,19 @@ async def dashboard_upload_file(request: Request, file: UploadFile = File(...)):
 
         return RedirectResponse(url="/dashboard", status_code=303)
     except Exception as exc:  # pragma: no cover - UI path
-        stats = await analytics_store.get_stats()
-        recent_records = await analytics_store.get_recent(limit=50)
-        active_detector, available_detectors = _fetch_detector_info()
-        return templates.TemplateResponse(
-            "dashboard.html",
-            {
-                "request": request,
-                "stats": stats,
-                "records": recent_records,
-                "active_detector": active_detector,
-                "available_detectors": available_detectors,
-                "error": str(exc),
-            },
-            status_code=500,
-        )
+        return await _render_dashboard(request, error=str(exc), status_code=500)
 
 
 @app.post("/dashboard/set-detector", response_class=HTMLResponse)
 async def dashboard_set_detector(request: Request, detector_name: str = Form(...)):
     """Switch the active detector via the dashboard selector."""
     try:
-        resp = requests.post(
-            f"{DETECTION_SERVICE_URL}/detector/{detector_name}",
-            timeout=10,
-        )
+        resp = await detection_client.post(f"/detector/{detector_name}", endpoint="set_detector")
         resp.raise_for_status()
+        await detector_info.refresh()
         return RedirectResponse(url="/dashboard", status_code=303)
     except Exception as exc:  # pragma: no cover - UI path
-        stats = await analytics_store.get_stats()
-        recent_records = await analytics_store.get_recent(limit=50)
-        active_detector, available_detectors = _fetch_detector_info()
-        return templates.TemplateResponse(
-            "dashboard.html",
-            {
-                "request": request,
-                "stats": stats,
-                "records": recent_records,
-                "active_detector": active_detector,
-                "available_detectors": available_detectors,
-                "error": f"Failed to switch detector: {exc}",
-            },
-            status_code=500,
-        )
+        return await _render_dashboard(request, error=f"Failed to switch detector: {exc}", status_code=500)
 
 
 @app.post("/analyze", response_model=dict)
@@ -206,11 +279,7 @@ async def analyze_content(request: DetectionRequest):
     """
     try:
         # Call detection service
-        response = requests.post(
-            f"{DETECTION_SERVICE_URL}/detect",
-            json=request.dict(),
-            timeout=30
-        )
+        response = await detection_client.post("/detect", endpoint="detect", json=request.dict())
         response.raise_for_status()
         result = DetectionResult(**response.json())
         
@@ -243,54 +312,321 @@ async def get_records(limit: int = 100):
     return await analytics_store.get_recent(limit=limit)
 
 
+@app.get("/export/records")
+async def export_records(
+    format: str = "ndjson",
+    gzip: bool = False,
+    window: TimeRange = Depends(time_range),
+    label: Optional[str] = None,
+    source: Optional[str] = None,
+):
+    """
+    Stream analytics records for bulk export, oldest first.
+    
+    Rows are read through a server-side cursor and encoded batch by batch,
+    so exports of any size use constant memory.
+    
+    Args:
+        format: csv, ndjson, parquet or arrow (Arrow IPC stream); parquet
+            and arrow require pyarrow
+        gzip: Gzip-compress the stream
+        since: Only records with timestamp >= since
+        until: Only records with timestamp < until
+        label: Only this detection label
+        source: Only this source
+    """
+    try:
+        chunks = analytics_store.export_records(format, gzip, window.since, window.until, label, source)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("analytics", format, gzip)}"'}
+    )
+
+
 @app.get("/stats")
-async def get_stats():
-    """Get aggregate statistics."""
-    return await analytics_store.get_stats()
+async def get_stats(window_hours: Optional[float] = 24, label: Optional[str] = None):
+    """
+    Get aggregate statistics.
+    
+    Totals cover all records. ``sketches`` adds distinct-source and
+    distinct-event estimates and confidence quantiles (p50/p90/p95/p99) per
+    label over the last ``window_hours``, merged from per-bucket sketches,
+    with their error bounds.
+    
+    Args:
+        window_hours: Sketch window in hours (0 or less for all time)
+        label: Restrict the sketch statistics to one label
+    """
+    since = None
+    if window_hours is not None and window_hours > 0:
+        since = datetime.utcnow() - timedelta(hours=window_hours)
+    stats = await analytics_store.get_stats()
+    stats["sketches"] = await analytics_store.get_sketch_stats(since=since, label=label)
+    return stats
+
+
+@app.get("/timeseries")
+async def get_timeseries(
+    resolution: str = "auto",
+    window: TimeRange = Depends(time_range),
+    label: Optional[str] = None,
+    source: Optional[str] = None,
+    group_by: Optional[str] = "label",
+):
+    """
+    Label trends over time, answered from the minute/hour/day rollups.
+    
+    Args:
+        resolution: minute, hour, day, or auto (finest retained resolution
+            with at most 1000 buckets in the range)
+        since: Start of the range (default: 24 hours ago for auto)
+        until: End of the range (exclusive)
+        label: Only this detection label
+        source: Only this source
+        group_by: label, source, or none for one combined series
+    
+    Returns:
+        Resolution used and one series of buckets per group
+    """
+    try:
+        return await analytics_store.get_timeseries(
+            resolution, window.since, window.until, label, source,
+            None if group_by == "none" else group_by
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/metrics/write-buffer")
+async def write_buffer_metrics():
+    """Queue depth and flush statistics of the write-behind buffer."""
+    return analytics_store.buffer_metrics()
+
+
+@app.get("/metrics/database")
+async def database_metrics():
+    """Connection-pool and database-lock wait times (writer, reader pool, BEGIN IMMEDIATE)."""
+    if analytics_store.shards.sharded:
+        return analytics_store.shards.metrics()
+    return analytics_store.db_manager.metrics()
+
+
+@app.get("/metrics/retention")
+async def retention_metrics():
+    """Retention policies, the last expiry run and the database size."""
+    return await asyncio.to_thread(retention.metrics)
+
+
+@app.get("/metrics/outbox")
+async def outbox_metrics():
+    """Offset, lag and batch statistics of the content_events outbox consumer (one per shard)."""
+    if len(outbox_consumers) > 1:
+        return {"enabled": OUTBOX_CONSUMER_ENABLED, "shards": [consumer.metrics() for consumer in outbox_consumers]}
+    return {"enabled": OUTBOX_CONSUMER_ENABLED, **outbox_consumers[0].metrics()}
+
+
+@app.get("/metrics/dashboard-stream")
+async def dashboard_stream_metrics():
+    """Subscribers, polls and fan-out counters of the live dashboard broadcaster."""
+    return dashboard_broadcaster.metrics()
+
+
+@app.get("/metrics/services")
+async def service_client_metrics():
+    """Request, retry and circuit-breaker statistics of the downstream service clients."""
+    return {
+        "clients": [detection_client.metrics(), ingestion_client.metrics()],
+        "detector_info_cache": detector_info.snapshot(),
+    }
+
+
+async def _detect_batch(events: List[ContentEvent], semaphore: asyncio.Semaphore) -> List[AnalyticsRecord]:
+    """Score one batch of events via the detection service's batch endpoint."""
+    async with semaphore:
+        response = await detection_client.post(
+            "/detect/batch",
+            endpoint="detect_batch",
+            json=[{"text": event.text, "metadata": {"event_id": event.id}} for event in events]
+        )
+    response.raise_for_status()
+    results = [DetectionResult(**item) for item in response.json()]
+    return [
+        AnalyticsRecord(
+            event_id=event.id,
+            source=event.source,
+            text_preview=event.text[:200],
+            detection_label=result.label,
+            confidence=result.confidence,
+            timestamp=result.timestamp
+        )
+        for event, result in zip(events, results)
+    ]
+
+
+async def _score_events(events: List[ContentEvent]) -> Tuple[int, int]:
+    """
+    Score events that have no analytics record yet and store the records.
+    
+    Returns:
+        (events skipped as already scored, records stored)
+    """
+    existing = await analytics_store.existing_event_ids([event.id for event in events])
+    pending = [event for event in events if event.id not in existing]
+    semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+    batches = [pending[i:i + SYNC_DETECT_BATCH] for i in range(0, len(pending), SYNC_DETECT_BATCH)]
+    scored = await asyncio.gather(*(_detect_batch(batch, semaphore) for batch in batches))
+    records = [record for batch_records in scored for record in batch_records]
+    if records:
+        await analytics_store.add_records(records)
+    return len(events) - len(pending), len(records)
+
+
+async def _score_outbox_batch(events: List[ContentEvent]):
+    """Outbox handler: score newly inserted events."""
+    await _score_events(events)
+
+
+# Every shard file has its own outbox. Batches run under the sync lock, so a
+# manual sync can drain the same consumers (see _sync_from_outbox).
+outbox_consumers = [
+    OutboxConsumer(manager, "risk-analytics", _score_outbox_batch, lock=_sync_lock)
+    for manager in analytics_store.shards.managers
+]
+
+
+async def _sync_events(reset: bool = False,
+                       report: Optional[Callable[[dict], Awaitable[None]]] = None) -> dict:
+    """
+    Incrementally pull new events from ingestion and run them through detection.
+    
+    New events are read from ingestion's event log as consumer group
+    SYNC_CONSUMER_GROUP, so the position is the log sequence number, which
+    follows commit order. An event committed late with an older connector
+    timestamp still lands after the position and is scored on the next run.
+    Each page is scored in concurrent batches, bounded by SYNC_CONCURRENCY,
+    and events that already have an analytics record are skipped. The
+    group's offset is committed only after a page's records are stored, so
+    an interrupted sync resumes where it stopped without re-scoring or
+    duplicating records.
+    
+    When ingestion runs without the event log (``INGESTION_EVENT_LOG=0`` or
+    sharded), new events are read from the content_events outbox of each
+    shard file instead, from the offset the background outbox consumers keep.
+    
+    Args:
+        reset: First scan every stored event, including ones that were never
+            in the event log or outbox (already-scored events are still skipped)
+        report: Optional async callback receiving the running totals after
+            each page, used by the job handler for progress
+    
+    Raises:
+        RuntimeError: Ingestion has no event log and does not share this
+            service's database, so there is no durable position to sync from
+    """
+    async with _sync_lock:
+        totals = {"events_fetched": 0, "events_skipped": 0, "events_processed": 0, "pages": 0}
+        
+        async def score_page(events: List[ContentEvent]):
+            skipped, processed = await _score_events(events)
+            totals["pages"] += 1
+            totals["events_fetched"] += len(events)
+            totals["events_skipped"] += skipped
+            totals["events_processed"] += processed
+            if report is not None:
+                await report(totals)
+        
+        if reset:
+            await _scan_events(score_page)
+        if not await _sync_from_log(score_page):
+            await _sync_from_outbox(score_page)
+        return totals
+
+
+async def _sync_from_log(score_page: Callable[[List[ContentEvent]], Awaitable[None]]) -> bool:
+    """
+    Score event-log entries after SYNC_CONSUMER_GROUP's committed offset.
+    
+    Returns:
+        False if ingestion has no event log (nothing was read)
+    """
+    # The first page starts at the committed offset, later ones after the previous page
+    path = f"/consumers/{SYNC_CONSUMER_GROUP}/poll"
+    params = {"limit": SYNC_PAGE_SIZE}
+    while True:
+        response = await ingestion_client.get(path, endpoint="events", params=params)
+        if response.status_code == 404 and path != "/log":
+            return False  # event log disabled
+        response.raise_for_status()
+        batch = EventLogBatch(**response.json())
+        if batch.entries:
+            await score_page([entry.event for entry in batch.entries])
+        if batch.next_offset > batch.offset:
+            commit = await ingestion_client.post(f"/consumers/{SYNC_CONSUMER_GROUP}/commit", endpoint="events",
+                                                 json={"offset": batch.next_offset})
+            commit.raise_for_status()
+        if batch.next_offset >= batch.head:
+            return True
+        path = "/log"
+        params = {"after": batch.next_offset, "limit": SYNC_PAGE_SIZE}
+
+
+async def _sync_from_outbox(score_page: Callable[[List[ContentEvent]], Awaitable[None]]):
+    """
+    Score the entries after each shard's outbox offset, committing per batch.
+    
+    Must be called with ``_sync_lock`` held (the background consumers take it
+    around each of their batches).
+    
+    Raises:
+        RuntimeError: Ingestion writes to a different database, whose events
+            never reach this service's outbox
+    """
+    response = await ingestion_client.get("/events", endpoint="events", params={"limit": 1})
+    response.raise_for_status()
+    newest = response.json()
+    if newest and not await analytics_store.has_content_event(newest[0]["id"]):
+        raise RuntimeError(
+            "Ingestion has no event log and uses a different database; enable INGESTION_EVENT_LOG "
+            "or point INGESTION_DB_PATH and ANALYTICS_DB_PATH at the same file"
+        )
+    for consumer in outbox_consumers:
+        while await consumer.poll_once(score_page):
+            pass
+
+
+async def _scan_events(score_page: Callable[[List[ContentEvent]], Awaitable[None]]):
+    """Score every stored event, oldest first, following ingestion's page cursors."""
+    params = {"order": "asc", "limit": SYNC_PAGE_SIZE}
+    while True:
+        response = await ingestion_client.get("/events", endpoint="events", params=params)
+        response.raise_for_status()
+        events = [ContentEvent(**e) for e in response.json()]
+        if events:
+            await score_page(events)
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not events or not next_cursor:
+            return
+        params["cursor"] = next_cursor
 
 
 @app.post("/sync-from-ingestion")
-async def sync_from_ingestion():
+async def sync_from_ingestion(reset: bool = False):
     """
-    Pull events from ingestion service and run them through detection.
+    Pull new events from ingestion service and run them through detection.
+    
+    Runs inside the request; use ``POST /jobs/sync-from-ingestion`` for large syncs.
+    
+    Args:
+        reset: Also re-scan every stored event, not only what is new since the last sync
     
     Returns:
         Summary of sync operation
     """
     try:
-        # Fetch events from ingestion
-        response = requests.get(f"{INGESTION_SERVICE_URL}/events", timeout=10)
-        response.raise_for_status()
-        events = [ContentEvent(**e) for e in response.json()]
-        
-        processed = 0
-        for event in events:
-            # Send to detection
-            det_response = requests.post(
-                f"{DETECTION_SERVICE_URL}/detect",
-                json={"text": event.text},
-                timeout=30
-            )
-            if det_response.status_code == 200:
-                result = DetectionResult(**det_response.json())
-                
-                # Store analytics record
-                analytics_record = AnalyticsRecord(
-                    event_id=event.id,
-                    source=event.source,
-                    text_preview=event.text[:200],
-                    detection_label=result.label,
-                    confidence=result.confidence,
-                    timestamp=result.timestamp
-                )
-                await analytics_store.add_record(analytics_record)
-                processed += 1
-        
-        return {
-            "status": "success",
-            "events_fetched": len(events),
-            "events_processed": processed
-        }
+        return {"status": "success", **await _sync_events(reset)}
     except Exception as e:
         return {
             "status": "error",
@@ -298,6 +634,51 @@ async def sync_from_ingestion():
         }
 
 
+async def run_sync_job(ctx: JobContext) -> dict:
+    """Job handler: incremental sync; the committed event-log offset is the checkpoint."""
+    async def report(totals: dict):
+        await ctx.report(
+            message=f"{totals['events_processed']} events scored, {totals['events_fetched']} fetched",
+            checkpoint=totals
+        )
+    
+    return await _sync_events(bool(ctx.payload.get("reset")), report)
+
+
+JobRegistry.register(SYNC_JOB_KIND, run_sync_job)
+
+
+@app.post("/jobs/sync-from-ingestion", status_code=202)
+async def submit_sync_job(reset: bool = False):
+    """Queue a sync from ingestion as a background job and return its id."""
+    job_id = await job_pool.queue.db_manager.run_write(job_pool.queue.submit, SYNC_JOB_KIND, {"reset": reset})
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@app.get("/jobs", response_model=List[JobInfo])
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent sync jobs, newest first."""
+    return await job_pool.queue.db_manager.run_read(job_pool.queue.list, [SYNC_JOB_KIND], status, limit)
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    """Status, progress and result of a job."""
+    job = await job_pool.queue.db_manager.run_read(job_pool.queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running job to stop at its next checkpoint."""
+    job = await job_pool.queue.db_manager.run_write(job_pool.queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
@@ -0,0 +1,280 @@
+"""
+Non-blocking client for calls from risk-analytics to other ASTRA services.
+
+Each downstream service gets one `ServiceClient` that owns a pooled
+`httpx.AsyncClient` (keep-alive connections reused across requests), so
+service calls no longer block the event loop or open a connection per call.
+Calls are protected by:
+
+    - per-endpoint timeouts
+    - retries with exponential backoff for transient failures (connection
+      errors, timeouts, 429/502/503/504), limited by a retry budget so a
+      struggling service is not hammered with extra load
+    - a circuit breaker per endpoint that fails fast while the endpoint is
+      unhealthy and lets a single probe through after a cool-down, so slow
+      bulk calls cannot shut off the cheap ones
+
+`RefreshingCache` keeps the result of a lookup against another service so
+request handlers can read it without waiting on that service.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the service's circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """True if a call may proceed now."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """A call ended without an outcome (cancelled or unexpected error); a probe counts as failed."""
+        if self._probe_in_flight:
+            self.record_failure()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a fraction of recent requests.
+
+    Every request deposits ``ratio`` tokens and every retry spends one, so
+    retries add at most ``ratio`` extra load. ``min_tokens`` keeps a few
+    retries available when traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 3.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class ServiceClient:
+    """Pooled async HTTP client for one downstream service."""
+
+    def __init__(self, name: str, base_url: str, timeouts: Optional[Dict[str, float]] = None,
+                 default_timeout: float = 10.0, max_retries: int = 2, backoff: float = 0.1,
+                 max_connections: int = 50, max_keepalive: int = 20,
+                 breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+                 budget: Optional[RetryBudget] = None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.breaker_factory = breaker_factory
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.budget = budget or RetryBudget()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, created lazily on the running event loop."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, path: str, endpoint: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, endpoint=endpoint, **kwargs)
+
+    async def post(self, path: str, endpoint: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, endpoint=endpoint, **kwargs)
+
+    async def request(self, method: str, path: str, endpoint: Optional[str] = None,
+                      retry: bool = True, **kwargs) -> httpx.Response:
+        """
+        Send a request with timeout, retries and circuit breaking.
+
+        Args:
+            method: HTTP method
+            path: Path relative to the service base URL
+            endpoint: Key into ``timeouts`` and of the circuit breaker (defaults to ``path``)
+            retry: Set False for calls that must not be repeated
+
+        Returns:
+            The final response (callers decide how to treat 4xx/5xx)
+
+        Raises:
+            CircuitOpenError: if the endpoint's circuit is open
+            httpx.HTTPError: if the last attempt failed at the transport level
+        """
+        key = endpoint or path
+        timeout = self.timeouts.get(key, self.default_timeout)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = self.breaker_factory()
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} service circuit is open for {key}")
+
+            self._stats["requests"] += 1
+            error: Optional[Exception] = None
+            response: Optional[httpx.Response] = None
+            try:
+                response = await self.client.request(method, path, timeout=timeout, **kwargs)
+            except httpx.TransportError as exc:  # connect errors, timeouts, dropped connections
+                error = exc
+            except BaseException:
+                # Cancelled or failed otherwise: never leave a half-open probe in flight
+                breaker.abandon()
+                raise
+
+            transient = error is not None or response.status_code in RETRYABLE_STATUS
+            if transient or response.status_code >= 500:
+                breaker.record_failure()
+                self._stats["failures"] += 1
+            else:
+                breaker.record_success()
+
+            if transient and retry and attempt < self.max_retries and self.budget.try_spend():
+                attempt += 1
+                self._stats["retries"] += 1
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+                continue
+
+            if error is not None:
+                raise error
+            return response
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "service": self.name,
+            "base_url": self.base_url,
+            "circuits": {key: breaker.snapshot() for key, breaker in sorted(self.breakers.items())},
+            "retry_tokens": round(self.budget.tokens, 2),
+            **self._stats,
+        }
+
+
+class RefreshingCache:
+    """
+    Stale-while-revalidate cache for one value fetched from another service.
+
+    Reads return the cached value immediately; once it is older than ``ttl``
+    a single background refresh is started. If the loader fails (including
+    when the service's circuit is open) the last-known value keeps being
+    served. Callers only wait, for at most ``wait_timeout`` seconds, when
+    there is no valid value yet: before the first load and after
+    ``invalidate()``.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl: float = 30.0,
+                 default: Any = None, wait_timeout: float = 1.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._value = default
+        self._valid = False
+        self._attempted_at: Optional[float] = None
+        self._loaded_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_error: Optional[str] = None
+
+    async def get(self) -> Any:
+        """Current value; triggers a background refresh when stale."""
+        now = time.monotonic()
+        if self._task is None or self._task.done():
+            if not self._valid or self._attempted_at is None or now - self._attempted_at >= self.ttl:
+                self._attempted_at = now
+                self._task = asyncio.create_task(self._load())
+        if not self._valid and self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), self.wait_timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._value
+
+    async def refresh(self) -> Any:
+        """Reload now and return the (possibly last-known) value."""
+        if self._task is not None and not self._task.done():
+            # A load started before the change may return the old value; let it finish first
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), self.wait_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.invalidate()
+        return await self.get()
+
+    def invalidate(self):
+        """Mark the value stale so the next read reloads it."""
+        self._valid = False
+
+    async def _load(self):
+        try:
+            value = await self.loader()
+        except Exception as exc:
+            self.last_error = str(exc) or exc.__class__.__name__
+            return
+        self._value = value
+        self._valid = True
+        self._loaded_at = time.monotonic()
+        self.last_error = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        age = None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1)
+        return {"valid": self._valid, "age_seconds": age, "ttl": self.ttl, "last_error": self.last_error}
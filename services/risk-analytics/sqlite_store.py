@@ -1,26 +1,145 @@
 """
 SQLite-based analytics store for persistent data storage.
 """
-from typing import List, Dict
+from typing import Any, Iterator, List, Dict, Optional, Tuple
+from itertools import chain
 import sys
 import os
+import threading
+import time
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, select, text
 
 # Setup path for database models
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'schemas')))
 
 from models import AnalyticsRecord
-from database import DatabaseManager, AnalyticsRecordDB
+from database import (AnalyticsAggregateDB, AnalyticsRecordDB, AnalyticsRollupDB,
+                      AnalyticsSketchDB, ContentEventDB, SyncStateDB, insert_chunked)
+from write_buffer import WriteBehindBuffer
+from export import export_stream
+from sharding import ShardSet, merge_sorted
+import aggregates
+
+# Keep IN (...) lookups well below SQLite's bound-parameter limit
+ID_LOOKUP_CHUNK = 500
+# How often inserts also drop rollup and sketch buckets past their retention (seconds)
+ROLLUP_PRUNE_INTERVAL = 600
+# Dashboard snapshot reads retried while sharded writes land in between
+SNAPSHOT_ATTEMPTS = 3
+# sync_state row holding the last reserved record id while sharded
+ID_COUNTER = "analytics_records:last_id"
+
+
+def _row_to_record(row) -> AnalyticsRecord:
+    """Build an AnalyticsRecord from an ``analytics_records`` row mapping."""
+    return AnalyticsRecord(
+        event_id=row["event_id"],
+        source=row["source"],
+        text_preview=row["text_preview"],
+        detection_label=row["detection_label"],
+        confidence=row["confidence"],
+        timestamp=row["timestamp"]
+    )
+
+
+def _recent_rows(conn, limit: int) -> list:
+    return conn.execute(
+        select(AnalyticsRecordDB.__table__)
+        .order_by(AnalyticsRecordDB.timestamp.desc())
+        .limit(limit)
+    ).mappings().all()
+
+
+def _rows_after(conn, after_id: int, limit: int) -> list:
+    return conn.execute(
+        select(AnalyticsRecordDB.__table__)
+        .where(AnalyticsRecordDB.id > after_id)
+        .order_by(AnalyticsRecordDB.id)
+        .limit(limit)
+    ).mappings().all()
+
+
+def _max_record_id(conn) -> int:
+    return conn.execute(select(func.max(AnalyticsRecordDB.id))).scalar() or 0
+
+
+def _read_snapshot(conn, limit: int) -> Tuple[Dict, list, int]:
+    conn.exec_driver_sql("BEGIN")  # WAL read snapshot across the three queries
+    try:
+        return aggregates.read_stats(conn), _recent_rows(conn, limit), _max_record_id(conn)
+    finally:
+        conn.rollback()
 
 
 class SQLiteAnalyticsStore:
     """
     SQLite-based analytics store for persistent record storage.
+    
+    With ``write_behind`` settings (see ``write_buffer.write_behind_from_env``)
+    records are written by a background ``WriteBehindBuffer``.
+    
+    Dashboard stats, time series and sketch statistics come from
+    ``analytics_aggregates``, ``analytics_rollups`` and ``analytics_sketches``,
+    which every insert updates in the same transaction (see ``aggregates.py``).
+    
+    The async methods run their queries through ``DatabaseManager.run_read`` /
+    ``run_write``, so concurrent requests overlap their database I/O instead
+    of blocking the event loop one after another.
+    
+    With ``ASTRA_DB_SHARDS`` > 1 records are spread over the shard files by
+    event id (see ``sharding.py``); every shard keeps the aggregates of its
+    own records and reads merge them. Record ids are then reserved in ranges
+    from a counter in shard 0 instead of each file's rowid, so they stay
+    unique and increasing across shards and processes. Reads only return ids
+    up to ``_visible_id``, below which every id this process reserved is
+    committed, so live updates never skip one of this process's records.
     """
     
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    def __init__(self, write_behind: Optional[Dict[str, Any]] = None, shards: Optional[ShardSet] = None):
+        self.shards = shards or ShardSet()
+        self.db_manager = self.shards.primary
+        self._last_prune = time.monotonic()
+        for manager in self.shards.managers:
+            with manager.engine.begin() as conn:
+                if aggregates.needs_rebuild(conn):
+                    aggregates.rebuild_stats(conn)
+                if aggregates.needs_rebuild(conn, AnalyticsRollupDB.__table__):
+                    aggregates.rebuild_rollups(conn)
+                if aggregates.needs_rebuild(conn, AnalyticsSketchDB.__table__):
+                    aggregates.rebuild_sketches(conn)
+        # Sharded record ids: last id reserved and first id -> size of each uncommitted reservation
+        self._id_lock = threading.Lock()
+        self._last_reserved = 0
+        self._in_flight: Dict[int, int] = {}
+        if self.shards.sharded:
+            self._last_reserved = max(self.shards.read_all_sync(_max_record_id))
+            with self.db_manager.engine.begin() as conn:
+                conn.execute(
+                    text("""
+                        INSERT INTO sync_state(name, value, updated_at) VALUES (:name, :value, :now)
+                        ON CONFLICT(name) DO UPDATE SET
+                            value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))
+                    """),
+                    {"name": ID_COUNTER, "value": str(self._last_reserved), "now": datetime.utcnow()},
+                )
+        self.write_buffer: Optional[WriteBehindBuffer] = None
+        if write_behind:
+            # Sharded flushes fan out to every shard's writer thread from a worker thread
+            runner = None if self.shards.sharded else self.db_manager.run_write
+            self.write_buffer = WriteBehindBuffer(self._insert_rows, name="analytics_records",
+                                                  runner=runner, **write_behind)
+    
+    async def close(self):
+        """Drain pending buffered writes (call on service shutdown)."""
+        if self.write_buffer is not None:
+            await self.write_buffer.stop()
+    
+    def buffer_metrics(self) -> Dict[str, Any]:
+        """Write-behind queue metrics, or ``enabled: False`` when writes are synchronous."""
+        if self.write_buffer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.write_buffer.metrics()}
     
     async def add_record(self, record: AnalyticsRecord):
         """
@@ -29,21 +148,101 @@ class SQLiteAnalyticsStore:
         Args:
             record: AnalyticsRecord to store
         """
-        session = self.db_manager.get_session()
-        try:
-            db_record = AnalyticsRecordDB(
-                event_id=record.event_id,
-                source=record.source,
-                text_preview=record.text_preview,
-                detection_label=record.detection_label,
-                confidence=record.confidence,
-                timestamp=record.timestamp
-            )
+        await self.add_records([record])
+    
+    async def add_records(self, records: List[AnalyticsRecord]) -> int:
+        """
+        Store many analytics records in one transaction.
+        
+        Uses Core-level ``executemany`` inserts in chunks instead of one ORM
+        object and commit per record.
+        
+        Args:
+            records: AnalyticsRecord objects to store
             
-            session.add(db_record)
-            session.commit()
+        Returns:
+            Number of records stored (or queued, in write-behind mode)
+        """
+        rows = [
+            {
+                "event_id": record.event_id,
+                "source": record.source,
+                "text_preview": record.text_preview,
+                "detection_label": record.detection_label,
+                "confidence": record.confidence,
+                "timestamp": record.timestamp
+            }
+            for record in records
+        ]
+        if self.write_buffer is not None:
+            await self.write_buffer.submit(rows)
+            return len(rows)
+        if not self.shards.sharded:
+            await self.db_manager.run_write(self._insert_rows, rows)
+            return len(rows)
+        first_id = self._assign_ids(rows, await self.db_manager.run_write(self._reserve_ids, len(rows)))
+        try:
+            await self.shards.write_parts(self._partition(rows), self._insert_shard_rows)
+        finally:
+            self._release_ids(first_id)
+        return len(rows)
+    
+    def _insert_rows(self, rows: List[Dict[str, Any]]) -> List[bool]:
+        """Insert analytics rows and update the aggregates in one transaction per shard (blocking)."""
+        if not self.shards.sharded:
+            with self.db_manager.engine.begin() as conn:
+                self._insert_shard_rows(conn, rows)
+            return [True] * len(rows)
+        reserved = self.db_manager.write_executor.submit(self._reserve_ids, len(rows)).result()
+        first_id = self._assign_ids(rows, reserved)
+        try:
+            self.shards.write_parts_sync(self._partition(rows), self._insert_shard_rows)
         finally:
-            session.close()
+            self._release_ids(first_id)
+        return [True] * len(rows)
+    
+    def _insert_shard_rows(self, conn, rows: List[Dict[str, Any]]):
+        insert_chunked(conn, AnalyticsRecordDB.__table__, rows)
+        aggregates.apply_stats_deltas(conn, aggregates.stats_deltas(rows))
+        aggregates.apply_rollup_deltas(conn, aggregates.rollup_deltas(rows))
+        aggregates.update_sketches(conn, rows)
+        if time.monotonic() - self._last_prune >= ROLLUP_PRUNE_INTERVAL:
+            aggregates.prune_rollups(conn)
+            aggregates.prune_sketches(conn)
+            self._last_prune = time.monotonic()
+    
+    def _partition(self, rows: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        return self.shards.partition(rows, lambda row: row["event_id"])
+    
+    def _reserve_ids(self, count: int) -> int:
+        """Reserve ``count`` record ids from the shard 0 counter (on its writer thread); returns the first."""
+        with self.db_manager.engine.begin() as conn:
+            conn.execute(
+                text("UPDATE sync_state SET value = CAST(value AS INTEGER) + :count, updated_at = :now "
+                     "WHERE name = :name"),
+                {"count": count, "now": datetime.utcnow(), "name": ID_COUNTER},
+            )
+            last_id = int(conn.execute(select(SyncStateDB.value).where(SyncStateDB.name == ID_COUNTER)).scalar())
+        # Reservations run one at a time on the writer thread, so they register in id order
+        with self._id_lock:
+            self._in_flight[last_id - count + 1] = count
+            self._last_reserved = last_id
+        return last_id - count + 1
+    
+    @staticmethod
+    def _assign_ids(rows: List[Dict[str, Any]], first_id: int) -> int:
+        for offset, row in enumerate(rows):
+            row["id"] = first_id + offset
+        return first_id
+    
+    def _release_ids(self, first_id: int):
+        with self._id_lock:
+            self._in_flight.pop(first_id, None)
+    
+    def _visible_id(self) -> int:
+        """Highest sharded record id with every id this process reserved up to it committed (or abandoned)."""
+        with self._id_lock:
+            return min(self._in_flight) - 1 if self._in_flight else self._last_reserved
     
     async def get_recent(self, limit: int = 100) -> List[AnalyticsRecord]:
         """
@@ -55,84 +254,167 @@ class SQLiteAnalyticsStore:
         Returns:
             List of AnalyticsRecord objects, newest first
         """
-        session = self.db_manager.get_session()
-        try:
-            db_records = (session.query(AnalyticsRecordDB)
-                         .order_by(AnalyticsRecordDB.timestamp.desc())
-                         .limit(limit)
-                         .all())
-            
-            records = []
-            for db_record in db_records:
-                records.append(AnalyticsRecord(
-                    event_id=db_record.event_id,
-                    source=db_record.source,
-                    text_preview=db_record.text_preview,
-                    detection_label=db_record.detection_label,
-                    confidence=db_record.confidence,
-                    timestamp=db_record.timestamp
-                ))
-            
-            return records
-        finally:
-            session.close()
+        parts = await self.shards.read_all(_recent_rows, limit)
+        rows = merge_sorted(parts, key=lambda row: row["timestamp"], reverse=True, limit=limit)
+        return [_row_to_record(row) for row in rows]
+    
+    async def get_dashboard_snapshot(self, limit: int = 50) -> Tuple[Dict, List[AnalyticsRecord], int]:
+        """
+        Stats, recent records and the newest record id from one read snapshot.
+        
+        Reading all three in a single transaction lets live updates continue
+        exactly after ``last_record_id`` without missing or double-counting
+        records written while the page was rendered.
+        
+        Returns:
+            (stats, records newest first, last_record_id)
+        """
+        if not self.shards.sharded:
+            stats, rows, last_record_id = (await self.shards.read_all(_read_snapshot, limit))[0]
+            return stats, [_row_to_record(row) for row in rows], last_record_id
+        
+        # Shards are read in separate snapshots; retry until no record past
+        # the visible id was included, so stats and live updates line up
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            visible = self._visible_id()
+            parts = await self.shards.read_all(_read_snapshot, limit)
+            if max(last for _, _, last in parts) <= visible:
+                break
+        stats = aggregates.merge_stats(stats for stats, _, _ in parts)
+        rows = merge_sorted([rows for _, rows, _ in parts], key=lambda row: row["timestamp"],
+                            reverse=True, limit=limit)
+        return stats, [_row_to_record(row) for row in rows], visible
+    
+    async def get_records_after(self, after_id: int, limit: int = 500) -> List[Tuple[int, AnalyticsRecord]]:
+        """
+        Records with an id greater than ``after_id``, oldest first.
+        
+        Returns:
+            List of (record id, AnalyticsRecord)
+        """
+        visible = self._visible_id() if self.shards.sharded else None
+        parts = await self.shards.read_all(_rows_after, after_id, limit)
+        rows = merge_sorted(parts, key=lambda row: row["id"], limit=limit)
+        if visible is not None:
+            rows = [row for row in rows if row["id"] <= visible]
+        return [(row["id"], _row_to_record(row)) for row in rows]
+    
+    async def latest_record_id(self) -> int:
+        """Id of the newest analytics record (0 when empty)."""
+        if self.shards.sharded:
+            return self._visible_id()
+        return (await self.shards.read_all(_max_record_id))[0]
     
     async def get_stats(self) -> Dict:
         """
         Get aggregate statistics from stored records.
         
+        Reads the maintained aggregates, so the cost depends on the number of
+        distinct labels and sources, not on the number of records.
+        
         Returns:
             Dictionary with statistics
         """
-        session = self.db_manager.get_session()
-        try:
-            total_events = session.query(AnalyticsRecordDB).count()
-            
-            if total_events == 0:
-                return {
-                    "total_events": 0,
-                    "avg_confidence": 0.0,
-                    "by_label": {},
-                    "by_source": {}
-                }
-            
-            # Average confidence
-            avg_confidence = session.query(func.avg(AnalyticsRecordDB.confidence)).scalar() or 0.0
-            
-            # Count by label
-            label_counts = (session.query(
-                AnalyticsRecordDB.detection_label,
-                func.count(AnalyticsRecordDB.id)
-            )
-            .group_by(AnalyticsRecordDB.detection_label)
-            .all())
-            
-            by_label = {label: count for label, count in label_counts}
-            
-            # Count by source
-            source_counts = (session.query(
-                AnalyticsRecordDB.source,
-                func.count(AnalyticsRecordDB.id)
+        return aggregates.merge_stats(await self.shards.read_all(aggregates.read_stats))
+    
+    async def get_timeseries(self, resolution: str, since: Optional[datetime] = None,
+                             until: Optional[datetime] = None, label: Optional[str] = None,
+                             source: Optional[str] = None, group_by: Optional[str] = None) -> Dict:
+        """
+        Counts, average confidence and confidence histogram per time bucket.
+        
+        Answered from the rollups; see ``aggregates.query_timeseries``.
+        
+        Args:
+            resolution: ``minute``, ``hour``, ``day`` or ``auto``
+            since: Start of the range (inclusive)
+            until: End of the range (exclusive)
+            label: Only this detection label
+            source: Only this source
+            group_by: ``label``, ``source`` or None for one series
+        """
+        if resolution == "auto":
+            resolution = aggregates.choose_resolution(since, until)
+        parts = await self.shards.read_all(aggregates.query_timeseries, resolution, since, until, label,
+                                           source, group_by)
+        return parts[0] if len(parts) == 1 else aggregates.merge_timeseries(parts)
+    
+    async def get_sketch_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                               label: Optional[str] = None) -> Dict:
+        """
+        Distinct sources/events and confidence quantiles over a time range.
+        
+        Merges the persisted per-bucket sketches; see ``aggregates.read_sketches``
+        for the result shape and ``sketches.py`` for the error bounds.
+        """
+        resolution, since = aggregates.sketch_range(since)
+        parts = await self.shards.read_all(aggregates.sketch_rows, resolution, since, until, label)
+        return aggregates.summarize_sketches(chain.from_iterable(parts), resolution, since, until)
+    
+    def export_records(self, fmt: str = "ndjson", compress: bool = False,
+                       since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       label: Optional[str] = None, source: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Stream matching analytics records as encoded chunks (see ``export.py``).
+        
+        Raises:
+            ValueError: Unknown format, or pyarrow missing for parquet/arrow
+        """
+        return export_stream([manager.streamer for manager in self.shards.managers], "analytics", fmt, compress,
+                             since, until, label, source)
+    
+    def on_records_expired(self, conn, rows: List[Dict[str, Any]]):
+        """
+        Retention hook: take deleted records out of the stats aggregates.
+        
+        Rollups and sketches are left alone; they keep summarising history
+        past raw-record retention and expire on their own schedule.
+        """
+        aggregates.apply_stats_deltas(conn, aggregates.stats_deltas(rows, sign=-1))
+    
+    async def rebuild_aggregates(self) -> Dict[str, int]:
+        """Recompute stats aggregates, rollups and sketches from all records."""
+        parts = await self.shards.write_parts(dict.fromkeys(range(self.shards.count)), self._rebuild_shard)
+        return {key: sum(part[key] for part in parts.values()) for key in ("aggregates", "rollups", "sketches")}
+    
+    def _rebuild_shard(self, conn, _=None) -> Dict[str, int]:
+        return {
+            "aggregates": aggregates.rebuild_stats(conn),
+            "rollups": aggregates.rebuild_rollups(conn),
+            "sketches": aggregates.rebuild_sketches(conn),
+        }
+    
+    async def existing_event_ids(self, event_ids: List[str]) -> set:
+        """Return the subset of ``event_ids`` that already have an analytics record."""
+        parts = await self.shards.read_keys(event_ids, self._existing_event_ids)
+        return set().union(*parts.values())
+    
+    @staticmethod
+    def _existing_event_ids(conn, event_ids: List[str]) -> set:
+        found = set()
+        for start in range(0, len(event_ids), ID_LOOKUP_CHUNK):
+            chunk = event_ids[start:start + ID_LOOKUP_CHUNK]
+            rows = conn.execute(
+                select(AnalyticsRecordDB.event_id)
+                .where(AnalyticsRecordDB.event_id.in_(chunk))
+                .distinct()
             )
-            .group_by(AnalyticsRecordDB.source)
-            .all())
-            
-            by_source = {source: count for source, count in source_counts}
-            
-            return {
-                "total_events": total_events,
-                "avg_confidence": float(avg_confidence),
-                "by_label": by_label,
-                "by_source": by_source
-            }
-        finally:
-            session.close()
+            found.update(row.event_id for row in rows)
+        return found
+    
+    async def has_content_event(self, event_id: str) -> bool:
+        """Whether ``event_id`` is in this database's content_events, i.e. ingestion writes to it too."""
+        return await self.shards.read_key(event_id, self._has_content_event, event_id)
+    
+    @staticmethod
+    def _has_content_event(conn, event_id: str) -> bool:
+        return conn.execute(select(ContentEventDB.id).where(ContentEventDB.id == event_id)).first() is not None
     
     async def clear_all(self):
         """Clear all analytics records (for testing)."""
-        session = self.db_manager.get_session()
-        try:
-            session.query(AnalyticsRecordDB).delete()
-            session.commit()
-        finally:
-            session.close()
+        await self.shards.write_parts(dict.fromkeys(range(self.shards.count)), self._clear_shard)
+    
+    @staticmethod
+    def _clear_shard(conn, _=None):
+        for model in (AnalyticsRecordDB, AnalyticsAggregateDB, AnalyticsRollupDB, AnalyticsSketchDB):
+            conn.execute(model.__table__.delete())
@@ -0,0 +1,142 @@
+/* ASTRA Risk Analytics - live dashboard updates
+   Subscribes to /dashboard/stream (Server-Sent Events) and applies each
+   delta (new records + stat increments) to the rendered page, so the
+   dashboard stays current without reloading.
+*/
+(function () {
+    "use strict";
+
+    const MAX_ROWS = 50;
+
+    function formatTimestamp(iso) {
+        return iso ? iso.slice(0, 19).replace("T", " ") : "N/A";
+    }
+
+    function badgeClass(label) {
+        if (label.includes("AI")) return "badge badge-ai";
+        if (label.includes("human")) return "badge badge-human";
+        return "badge badge-suspicious";
+    }
+
+    function confidenceClass(confidence) {
+        if (confidence > 0.7) return "confidence high-confidence";
+        if (confidence > 0.4) return "confidence medium-confidence";
+        return "confidence low-confidence";
+    }
+
+    function cell(text, className) {
+        const td = document.createElement("td");
+        if (className) td.className = className;
+        td.textContent = text;
+        return td;
+    }
+
+    function spanCell(text, className) {
+        const td = document.createElement("td");
+        const span = document.createElement("span");
+        span.className = className;
+        span.textContent = text;
+        td.appendChild(span);
+        return td;
+    }
+
+    function recordRow(record) {
+        const row = document.createElement("tr");
+        row.appendChild(cell(record.event_id.slice(0, 8) + "..."));
+        row.appendChild(cell(record.source));
+        row.appendChild(cell(record.text_preview, "text-preview"));
+        row.appendChild(spanCell(record.detection_label, badgeClass(record.detection_label)));
+        row.appendChild(spanCell((record.confidence * 100).toFixed(1) + "%", confidenceClass(record.confidence)));
+        row.appendChild(cell(formatTimestamp(record.timestamp)));
+        return row;
+    }
+
+    function setBarWidths(container) {
+        container.querySelectorAll(".bar[data-percent]").forEach(function (bar) {
+            bar.style.width = parseFloat(bar.dataset.percent) + "%";
+        });
+    }
+
+    function renderLabels(stats) {
+        const breakdown = document.getElementById("label-breakdown");
+        const bars = document.getElementById("label-bars");
+        bars.replaceChildren();
+        Object.entries(stats.by_label).forEach(function ([label, count]) {
+            const item = document.createElement("div");
+            item.className = "label-bar";
+            const name = document.createElement("div");
+            name.className = "label-name";
+            const labelSpan = document.createElement("span");
+            labelSpan.textContent = label;
+            const countSpan = document.createElement("span");
+            countSpan.textContent = count + " events";
+            name.append(labelSpan, countSpan);
+            const bar = document.createElement("div");
+            bar.className = "bar";
+            bar.dataset.percent = stats.total_events ? (count / stats.total_events * 100) : 0;
+            item.append(name, bar);
+            bars.appendChild(item);
+        });
+        setBarWidths(bars);
+        breakdown.hidden = Object.keys(stats.by_label).length === 0;
+    }
+
+    function applyDelta(state, delta) {
+        const stats = state.stats;
+        stats.total_events += delta.stats.total_events;
+        state.confidenceSum += delta.stats.confidence_sum;
+        stats.avg_confidence = stats.total_events ? state.confidenceSum / stats.total_events : 0;
+        ["by_label", "by_source"].forEach(function (key) {
+            Object.entries(delta.stats[key]).forEach(function ([name, count]) {
+                stats[key][name] = (stats[key][name] || 0) + count;
+            });
+        });
+        state.last_record_id = delta.last_id;
+
+        document.getElementById("stat-total").textContent = stats.total_events;
+        document.getElementById("stat-avg").textContent = (stats.avg_confidence * 100).toFixed(2) + "%";
+        renderLabels(stats);
+
+        const body = document.getElementById("records-body");
+        delta.records.forEach(function (record) {
+            body.insertBefore(recordRow(record), body.firstChild);
+        });
+        while (body.rows.length > MAX_ROWS) {
+            body.deleteRow(body.rows.length - 1);
+        }
+        document.getElementById("records-table").hidden = body.rows.length === 0;
+        document.getElementById("records-empty").hidden = body.rows.length > 0;
+    }
+
+    function connect() {
+        const stateElement = document.getElementById("dashboard-state");
+        const status = document.getElementById("live-status");
+        setBarWidths(document);
+        if (!stateElement || !window.EventSource) {
+            status.textContent = "Live updates unavailable; reload to refresh.";
+            return;
+        }
+
+        const state = JSON.parse(stateElement.textContent);
+        state.confidenceSum = state.stats.avg_confidence * state.stats.total_events;
+
+        const source = new EventSource("/dashboard/stream?after=" + state.last_record_id);
+        source.onopen = function () {
+            status.textContent = "Live updates on";
+            status.classList.add("connected");
+        };
+        source.onerror = function () {
+            status.textContent = "Live updates: reconnecting…";
+            status.classList.remove("connected");
+        };
+        source.addEventListener("delta", function (event) {
+            applyDelta(state, JSON.parse(event.data));
+        });
+        source.addEventListener("resync", function () {
+            source.close();
+            window.location.reload();
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", connect);
+}());
@@ -0,0 +1,54 @@
+"""
+Shared pytest setup for ASTRA unit tests.
+
+Services are not packages, so their directories are put on ``sys.path`` the
+same way the services and tools/scripts do it. Run from the repository root:
+
+    python -m pytest -q tests
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+
+
+def add_service_path(service: str):
+    """Put a service directory first on ``sys.path`` (e.g. ``"ingestion"``)."""
+    path = os.path.join(workspace_root, 'services', service)
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+
+
+def load_service_main(service: str):
+    """
+    Import a service's ``main.py`` as a fresh module named ``<service>_main``.
+
+    Services read their settings at import time, so set environment variables
+    (e.g. with ``monkeypatch.setenv``) before calling this.
+    """
+    add_service_path(service)
+    path = os.path.join(workspace_root, 'services', service, 'main.py')
+    spec = importlib.util.spec_from_file_location(f"{service.replace('-', '_')}_main", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of a fresh SQLite database file; managers opened under it (shards too) are disposed afterwards."""
+    from database import DatabaseManager
+
+    yield str(tmp_path / "astra.db")
+    prefix = str(tmp_path)
+    for path, manager in list(DatabaseManager._instances.items()):
+        if path.startswith(prefix):
+            manager.dispose()
+            DatabaseManager._instances.pop(path, None)
+            if DatabaseManager._default is manager:
+                DatabaseManager._default = None
@@ -0,0 +1,106 @@
+"""Tests for the coordination cluster engine (services/graph-intelligence/coordination.py)."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import add_service_path
+
+add_service_path("graph-intelligence")
+
+from coordination import CoordinationEngine, Post  # noqa: E402
+
+CAMPAIGN = "Breaking: officials confirm the bridge closure was planned weeks ago, share before it is deleted"
+OTHER = "Local bakery wins regional award for its sourdough after twenty years of family recipes"
+UNRELATED = "Weather service expects light rain tomorrow morning with clearing skies by the afternoon"
+
+# Synthetic timestamps well in the past, so the window never waits for the clock
+START = datetime.utcnow() - timedelta(days=1)
+
+
+def at(seconds: float) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def post(key: str, seconds: float, text: str = CAMPAIGN, source: str = None, event_id: str = None) -> Post:
+    return Post(key, event_id or key, source or f"src-{key}", at(seconds), text, event_id is not None)
+
+
+@pytest.fixture
+def engine():
+    return CoordinationEngine(window_seconds=600, text_threshold=0.8, semantic_threshold=0.9)
+
+
+def test_copies_form_one_cluster_with_one_exemplar(engine):
+    assert engine.add([post(f"e{i}", i) for i in range(5)] + [post("u", 5, UNRELATED)]) == 6
+    (cluster,) = engine.clusters(min_size=2, min_sources=1)
+    assert cluster.size == 5 and len(cluster.sources) == 5
+    assert engine.cluster_of("u") is None
+    # Exact copies match the first post perfectly, so only it and the unrelated post are indexed
+    assert engine.metrics()["text_exemplars"] == 2
+
+
+def test_redelivered_and_late_posts_are_skipped(engine):
+    engine.add([post("e1", 700), post("e2", 701)])
+    assert engine.add([post("e1", 700), post("e2", 701)]) == 0
+    assert engine.add([post("old", 50)]) == 0  # more than 600 s behind the newest post
+    metrics = engine.metrics()
+    assert metrics["posts"] == 2 and metrics["late"] == 1 and metrics["posts_in_window"] == 2
+
+
+def test_expired_exemplar_is_replaced_and_cluster_dissolves(engine):
+    engine.add([post("a", 0), post("b", 100), post("c", 200)])
+    cluster_id = engine.cluster_of("a")
+    assert "a" in engine._text_index and "c" not in engine._text_index
+
+    # "a" leaves the window; the newest member becomes the exemplar
+    engine.add([post("u1", 650, UNRELATED)])
+    assert "a" not in engine and "c" in engine._text_index
+    assert engine.cluster(cluster_id).size == 2
+
+    # New copies still find the cluster through the promoted exemplar
+    engine.add([post("d", 700)])
+    assert engine.cluster_of("d") == cluster_id
+
+    # Down to one post: the cluster dissolves and the post is kept on its own
+    engine.add([post("u2", 1250, OTHER)])
+    assert engine.cluster(cluster_id) is None
+    assert engine.cluster_of("d") is None and "d" in engine
+    assert engine.metrics()["clusters"] == 0
+
+
+def test_sightings_join_their_event_and_keep_it_findable(engine):
+    engine.add([post("e1", 0), post("sighting:0:1", 500, event_id="e1"), post("e2", 550)])
+    cluster_id = engine.cluster_of_event("e1")
+    assert cluster_id is not None and engine.cluster(cluster_id).size == 3
+
+    # The event's own post leaves the window; its repeat keeps it in the cluster
+    engine.add([post("u", 650, UNRELATED)])
+    assert "e1" not in engine and engine.has_event("e1")
+    assert engine.cluster_of("e1") is None
+    assert engine.cluster_of_event("e1") == cluster_id
+
+
+def test_embeddings_merge_clusters(engine):
+    np = pytest.importorskip("numpy")
+    engine.add([post("a1", 0), post("a2", 1), post("b1", 2, OTHER), post("b2", 3, OTHER)])
+    first, second = engine.cluster_of("a1"), engine.cluster_of("b1")
+    assert first != second
+
+    vector = np.random.default_rng(0).standard_normal(32)
+    assert engine.add_vectors({"a1": vector, "b1": vector + 0.01}) == 1
+    assert engine.cluster_of("a1") == engine.cluster_of("b2")
+    assert engine.metrics()["clusters"] == 1 and engine.metrics()["merges"] == 1
+    assert engine.cluster(engine.cluster_of("a1")).size == 4
+
+
+def test_score_components(engine):
+    engine.add([post(f"e{i}", i) for i in range(5)])
+    engine.set_labels({"e0": "AI-generated", "e1": "AI-generated", "e2": "human-written", "e3": "human-written"})
+    (cluster,) = engine.clusters(min_size=2)
+    assert cluster.labeled == 4 and cluster.ai_ratio == 0.5
+    assert cluster.components["source_diversity"] == 1.0
+    assert cluster.components["time_compression"] == pytest.approx(1 - 4 / 600, abs=1e-4)
+    assert cluster.score == pytest.approx(
+        0.3 * cluster.components["size"] + 0.3 + 0.2 * cluster.components["time_compression"] + 0.2 * 0.5, abs=1e-3
+    )
+    assert [member.event_id for member in engine.cluster(cluster.id, member_limit=2).members] == ["e0", "e1"]
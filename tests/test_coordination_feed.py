@@ -0,0 +1,115 @@
+"""Tests for the graph-intelligence feed (services/graph-intelligence/stream.py) and its API."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import add_service_path, load_service_main
+
+add_service_path("ingestion")
+add_service_path("graph-intelligence")
+
+from database import AnalyticsRecordDB  # noqa: E402
+from models import ContentEvent  # noqa: E402
+from sharding import ShardSet  # noqa: E402
+from sqlite_publisher import SQLitePublisher  # noqa: E402
+from coordination import CoordinationEngine  # noqa: E402
+from stream import CoordinationFeed  # noqa: E402
+
+CAMPAIGN = "Breaking: officials confirm the bridge closure was planned weeks ago, share before it is deleted"
+
+
+def _events(count: int, start: datetime, text: str = CAMPAIGN, prefix: str = "e"):
+    return [ContentEvent(id=f"{prefix}{i}", source=f"feed-{i}", text=text, timestamp=start + timedelta(seconds=i))
+            for i in range(count)]
+
+
+async def _drain(feed: CoordinationFeed):
+    for consumer in feed.consumers:
+        while await consumer.poll_once():
+            pass
+    return await feed.poll_once()
+
+
+def _insert_record(manager, record_id: int, event_id: str, label: str):
+    with manager.engine.begin() as conn:
+        conn.execute(AnalyticsRecordDB.__table__.insert(), {
+            "id": record_id, "event_id": event_id, "source": "test", "text_preview": "x",
+            "detection_label": label, "confidence": 0.9, "timestamp": datetime.utcnow(),
+        })
+
+
+def test_warm_up_then_tail_events_and_repeats(db_path):
+    shards = ShardSet(db_path)
+    publisher = SQLitePublisher(shards=shards)
+    start = datetime.utcnow() - timedelta(minutes=10)
+    engine = CoordinationEngine(window_seconds=3600)
+    feed = CoordinationFeed(engine, shards, semantic=False)
+
+    async def scenario():
+        # The first event and two repeats of it (stored as sightings) exist before start-up
+        await publisher.publish_batch(_events(3, start))
+        await feed.warm_up()
+        assert len(engine) == 3 and engine.metrics()["clusters"] == 1
+        # The outbox redelivers the warmed-up event: skipped
+        await _drain(feed)
+        assert engine.metrics()["posts"] == 3
+        # A new repeat arrives as a sighting, an edited copy as a new event
+        await publisher.publish_batch(_events(1, start + timedelta(minutes=1), prefix="late") + [
+            ContentEvent(id="edited", source="feed-x", text=CAMPAIGN.replace("weeks", "months"),
+                         timestamp=start + timedelta(minutes=2))
+        ])
+        counts = await _drain(feed)
+        await feed.stop()
+        return counts
+
+    counts = asyncio.run(scenario())
+    assert counts["sightings"] == 1
+    assert engine.metrics()["posts"] == 5
+    cluster = engine.cluster(engine.cluster_of_event("e0"))
+    assert cluster.size == 5 and engine.cluster_of("edited") == cluster.id
+
+
+def test_sharded_records_committed_late_are_read_again(db_path):
+    shards = ShardSet(db_path, 2)
+    engine = CoordinationEngine(window_seconds=3600)
+    feed = CoordinationFeed(engine, shards, semantic=False)
+    manager = shards.managers[1]
+
+    async def scenario():
+        _insert_record(manager, 5, "a", "AI-generated")
+        await feed.poll_once()
+        # Id 3 was reserved before id 5 but committed after it was read
+        _insert_record(manager, 3, "b", "human-written")
+        await feed.poll_once()
+
+    asyncio.run(scenario())
+    assert engine._labels == {"a": "AI-generated", "b": "human-written"}
+    assert feed.metrics()["record_marks"][1] == 5
+
+
+@pytest.fixture
+def graph(db_path, monkeypatch):
+    monkeypatch.setenv("GRAPH_DB_PATH", db_path)
+    monkeypatch.setenv("GRAPH_SEMANTIC", "0")
+    return load_service_main("graph-intelligence")
+
+
+def test_cluster_endpoints(graph):
+    from coordination import Post
+
+    start = datetime.utcnow() - timedelta(days=1)
+    graph.engine.add([Post(f"e{i}", f"e{i}", f"src{i}", start + timedelta(seconds=i), CAMPAIGN) for i in range(3)])
+    # Later, only a repeat of e0 is left in the window
+    graph.engine.add([Post("sighting:0:1", "e0", "src9", start + timedelta(seconds=4000), CAMPAIGN, True),
+                      Post("e9", "e9", "src8", start + timedelta(seconds=4001), CAMPAIGN)])
+    client = TestClient(graph.app)
+
+    response = client.get("/events/e0/cluster")
+    assert response.status_code == 200 and response.json()["size"] == 2
+    cluster_id = response.json()["id"]
+    assert client.get(f"/clusters/{cluster_id}", params={"members": 1}).json()["members"][0]["source"] == "src9"
+    for path in (f"/clusters/{cluster_id}", "/events/e0/cluster", "/clusters"):
+        assert client.get(path, params={"members": -1}).status_code == 400
+    assert client.get("/events/e1/cluster").status_code == 404
@@ -0,0 +1,45 @@
+"""Tests for DatabaseManager connection pools (data/schemas/database.py)."""
+import asyncio
+import sqlite3
+
+from sqlalchemy import text
+
+from database import STREAM_POOL_SIZE, DatabaseManager, compute_content_hash
+
+
+def _select_one(manager: DatabaseManager) -> int:
+    with manager.reader.connect() as conn:
+        return conn.execute(text("SELECT 1")).scalar()
+
+
+def test_open_streams_do_not_take_reader_connections(db_path):
+    manager = DatabaseManager(db_path)
+    streams = [manager.streamer.connect() for _ in range(STREAM_POOL_SIZE)]
+    try:
+        # Every streaming connection is checked out; pooled reads still run
+        assert asyncio.run(manager.run_read(_select_one, manager)) == 1
+        metrics = manager.metrics()
+        assert metrics["streamer"]["checked_out"] == STREAM_POOL_SIZE
+        assert metrics["reader"]["checked_out"] == 0
+    finally:
+        for conn in streams:
+            conn.close()
+
+
+def test_upgrade_backfills_content_hashes(db_path, monkeypatch):
+    # content_events as created before deduplication, with one text stored twice
+    conn = sqlite3.connect(db_path)
+    conn.execute("""CREATE TABLE content_events (id VARCHAR(36) PRIMARY KEY, source VARCHAR(100) NOT NULL,
+                    text TEXT NOT NULL, metadata_json TEXT, timestamp DATETIME)""")
+    conn.executemany("INSERT INTO content_events (id, source, text, timestamp) VALUES (?, 'test', ?, ?)", [
+        (f"e{i}", f"post {i % 5}", f"2026-10-18 12:00:{i:02d}.000000") for i in range(7)
+    ])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr("database.HASH_BACKFILL_BATCH", 3)
+
+    manager = DatabaseManager(db_path)
+    with manager.reader.connect() as conn:
+        hashes = dict(conn.execute(text("SELECT id, content_hash FROM content_events")).all())
+    # The first copy of each text is canonical; later copies keep no hash
+    assert hashes == {**{f"e{i}": compute_content_hash(f"post {i}") for i in range(5)}, "e5": None, "e6": None}
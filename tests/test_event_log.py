@@ -0,0 +1,36 @@
+"""Tests for the ingestion event log (services/ingestion/event_log.py)."""
+import asyncio
+
+import pytest
+
+from conftest import add_service_path
+
+add_service_path("ingestion")
+
+from models import ContentEvent  # noqa: E402
+from sharding import ShardSet  # noqa: E402
+from event_log import EventLogPublisher  # noqa: E402
+
+
+@pytest.fixture
+def log(db_path):
+    return EventLogPublisher(shards=ShardSet(db_path))
+
+
+def test_read_and_commit_by_offset(log):
+    asyncio.run(log.publish_batch([ContentEvent(id=f"e{i}", source="test", text=f"post {i}") for i in range(3)]))
+    batch = log.read(0, limit=2)
+    assert [entry.seq for entry in batch.entries] == [1, 2]
+    assert log.commit("g", batch.next_offset) == 2
+    assert log.commit("g", 1) == 2  # never moves backwards
+    assert [entry.event.text for entry in log.read(log.get_offset("g")).entries] == ["post 2"]
+
+
+def test_commit_rejects_offsets_outside_the_log(log):
+    asyncio.run(log.publish_batch([ContentEvent(id="e0", source="test", text="only post")]))
+    with pytest.raises(ValueError):
+        log.commit("g", 2)
+    with pytest.raises(ValueError):
+        log.commit("g", -1)
+    assert log.get_offset("g") == 0
+    assert log.commit("g", 1) == 1
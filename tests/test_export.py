@@ -0,0 +1,51 @@
+"""Tests for the bulk export endpoints (GET /export/events, GET /export/records)."""
+import asyncio
+import gzip
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from conftest import load_service_main
+from models import AnalyticsRecord, ContentEvent
+
+NOON = datetime(2026, 10, 18, 12)
+# 13:00+02:00 is 11:00Z and 14:30+02:00 is 12:30Z, so the range holds NOON
+AWARE_RANGE = {"since": "2026-10-18T13:00:00+02:00", "until": "2026-10-18T14:30:00+02:00"}
+
+
+def _ndjson(body: bytes):
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+def test_event_export_filters_in_utc(db_path, monkeypatch):
+    monkeypatch.setenv("INGESTION_DB_PATH", db_path)
+    ingestion = load_service_main("ingestion")
+    asyncio.run(ingestion.publisher.publish_batch([
+        ContentEvent(id="noon", source="test", text="posted at noon", timestamp=NOON),
+        ContentEvent(id="evening", source="test", text="posted in the evening", timestamp=datetime(2026, 10, 18, 19)),
+    ]))
+    with TestClient(ingestion.app) as client:
+        rows = _ndjson(client.get("/export/events", params=AWARE_RANGE).content)
+        compressed = client.get("/export/events", params={"gzip": "true"})
+        csv = client.get("/export/events", params={"format": "csv"})
+        unknown = client.get("/export/events", params={"format": "xml"})
+
+    assert [row["id"] for row in rows] == ["noon"]
+    assert rows[0]["text"] == "posted at noon"
+    assert [row["id"] for row in _ndjson(gzip.decompress(compressed.content))] == ["noon", "evening"]
+    assert len(csv.text.splitlines()) == 3  # header and two rows
+    assert unknown.status_code == 400
+
+
+def test_record_export_filters_in_utc(db_path, monkeypatch):
+    monkeypatch.setenv("ANALYTICS_DB_PATH", db_path)
+    analytics = load_service_main("risk-analytics")
+    asyncio.run(analytics.analytics_store.add_records([
+        AnalyticsRecord(event_id=event_id, source="test", text_preview="x", detection_label="Human-generated",
+                        confidence=0.8, timestamp=timestamp)
+        for event_id, timestamp in (("noon", NOON), ("evening", datetime(2026, 10, 18, 19)))
+    ]))
+    with TestClient(analytics.app) as client:
+        rows = _ndjson(client.get("/export/records", params=AWARE_RANGE).content)
+    assert [row["event_id"] for row in rows] == ["noon"]
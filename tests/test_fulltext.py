@@ -0,0 +1,94 @@
+"""Tests for the FTS5 index over content_events and GET /search."""
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import fulltext
+from conftest import load_service_main
+from database import ContentEventDB, DatabaseManager
+from models import ContentEvent
+
+
+def _search_ids(manager: DatabaseManager, query: str, **filters):
+    with manager.reader.connect() as conn:
+        return [hit["id"] for hit in fulltext.search(conn, query, **filters)["hits"]]
+
+
+def _insert(manager: DatabaseManager, event_id: str, body: str, source: str = "test",
+            timestamp: datetime = datetime(2026, 10, 18, 12)):
+    with manager.engine.begin() as conn:
+        conn.execute(ContentEventDB.__table__.insert(), [{
+            "id": event_id, "source": source, "content_type": "text", "text": body,
+            "content_hash": event_id, "timestamp": timestamp,
+        }])
+
+
+def test_inserts_updates_and_deletes_keep_the_index_in_sync(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a", "the harbour bridge opened today")
+    _insert(manager, "b", "a quiet day at the harbour")
+    assert sorted(_search_ids(manager, "harbour")) == ["a", "b"]
+    assert _search_ids(manager, '"harbour bridge"') == ["a"]
+
+    with manager.engine.begin() as conn:
+        conn.execute(text("UPDATE content_events SET text = 'rain over the market' WHERE id = 'b'"))
+    assert _search_ids(manager, "harbour") == ["a"]
+    assert _search_ids(manager, "market") == ["b"]
+
+    with manager.engine.begin() as conn:
+        conn.execute(text("DELETE FROM content_events WHERE id = 'a'"))
+    assert _search_ids(manager, "harbour") == []
+    with manager.engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {fulltext.FTS_TABLE}({fulltext.FTS_TABLE}) VALUES ('integrity-check')"))
+
+
+def test_filters_and_snippets(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "early", "storm warning for the coast", source="rss", timestamp=datetime(2026, 10, 18, 9))
+    _insert(manager, "late", "storm warning lifted", source="api", timestamp=datetime(2026, 10, 18, 15))
+
+    assert _search_ids(manager, "storm", source="api") == ["late"]
+    assert _search_ids(manager, "storm", since=datetime(2026, 10, 18, 12)) == ["late"]
+    assert _search_ids(manager, "storm", until=datetime(2026, 10, 18, 12)) == ["early"]
+    with manager.reader.connect() as conn:
+        hits = fulltext.search(conn, "coast")["hits"]
+    assert "<mark>coast</mark>" in hits[0]["snippet"]
+
+
+def test_rebuild_restores_a_cleared_index(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a", "lighthouse keeper")
+    with manager.engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {fulltext.FTS_TABLE}({fulltext.FTS_TABLE}) VALUES ('delete-all')"))
+    assert _search_ids(manager, "lighthouse") == []
+    with manager.engine.begin() as conn:
+        fulltext.rebuild(conn)
+    assert _search_ids(manager, "lighthouse") == ["a"]
+
+
+def test_malformed_query_is_a_value_error(db_path):
+    manager = DatabaseManager(db_path)
+    with manager.reader.connect() as conn:
+        with pytest.raises(ValueError):
+            fulltext.search(conn, '"unterminated')
+        with pytest.raises(ValueError):
+            fulltext.search(conn, "   ")
+
+
+def test_search_endpoint_compares_timezone_aware_range_in_utc(db_path, monkeypatch):
+    monkeypatch.setenv("INGESTION_DB_PATH", db_path)
+    ingestion = load_service_main("ingestion")
+    asyncio.run(ingestion.publisher.publish_batch(
+        [ContentEvent(id="noon", source="test", text="hello from noon", timestamp=datetime(2026, 10, 18, 12))]
+    ))
+    with TestClient(ingestion.app) as client:
+        # 13:00+02:00 is 11:00Z
+        hits = client.get("/search", params={"q": "hello", "since": "2026-10-18T13:00:00+02:00"}).json()["hits"]
+        later = client.get("/search", params={"q": "hello", "since": "2026-10-18T14:30:00+02:00"}).json()["hits"]
+        bad = client.get("/search", params={"q": "NEAR("})
+    assert [hit["id"] for hit in hits] == ["noon"]
+    assert later == []
+    assert bad.status_code == 400
@@ -0,0 +1,52 @@
+"""Tests for keyset-paginated event reads of the ingestion service."""
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load_service_main
+
+
+@pytest.fixture
+def ingestion(db_path, monkeypatch):
+    monkeypatch.setenv("INGESTION_DB_PATH", db_path)
+    return load_service_main("ingestion")
+
+
+def test_ndjson_rejects_bad_arguments_before_streaming(ingestion):
+    with pytest.raises(ValueError):
+        ingestion.publisher.iter_events(cursor="not-a-cursor")
+    with TestClient(ingestion.app) as client:
+        assert client.get("/events", params={"format": "ndjson", "cursor": "not-a-cursor"}).status_code == 400
+        assert client.get("/events", params={"format": "ndjson", "order": "sideways"}).status_code == 400
+        assert client.get("/events", params={"format": "ndjson", "limit": -3}).status_code == 400
+
+
+def test_ndjson_streams_every_match_in_order(ingestion):
+    from models import ContentEvent
+
+    asyncio.run(ingestion.publisher.publish_batch(
+        [ContentEvent(id=f"e{i}", source="test", text=f"post {i}") for i in range(5)]
+    ))
+    with TestClient(ingestion.app) as client:
+        response = client.get("/events", params={"format": "ndjson", "order": "asc", "limit": 0})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 5
+
+
+def test_timezone_aware_range_is_compared_in_utc(ingestion):
+    from models import ContentEvent
+
+    asyncio.run(ingestion.publisher.publish_batch(
+        [ContentEvent(id="noon", source="test", text="stored at noon UTC", timestamp=datetime(2026, 10, 18, 12))]
+    ))
+    # 13:00+02:00 is 11:00Z, 14:00+02:00 is 12:00Z
+    window = {"since": "2026-10-18T13:00:00+02:00", "until": "2026-10-18T14:30:00+02:00"}
+    with TestClient(ingestion.app) as client:
+        page = client.get("/events", params=window)
+        stream = client.get("/events", params={**window, "format": "ndjson"})
+        empty = client.get("/events", params={"since": "2026-10-18T12:00:01Z"})
+    assert [event["id"] for event in page.json()] == ["noon"]
+    assert len(stream.text.splitlines()) == 1
+    assert empty.json() == []
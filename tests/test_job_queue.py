@@ -0,0 +1,116 @@
+"""Tests for the SQLite-backed job queue and worker pool (job_queue.py)."""
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import job_queue
+from database import DatabaseManager
+from job_queue import (STATUS_CANCELLED, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED,
+                       JobCancelled, JobContext, JobLeaseLost, JobQueue, JobRegistry, JobWorkerPool)
+
+
+@pytest.fixture
+def queue(db_path):
+    DatabaseManager.set_default(db_path)
+    return JobQueue(visibility_timeout=0.2)
+
+
+def test_claimed_job_is_leased_to_one_worker(queue):
+    job_id = queue.submit("test", {"n": 1})
+    job = queue.claim("w1", ["test"])
+    assert job.id == job_id and job.status == STATUS_RUNNING and job.attempts == 1
+    assert job.payload == {"n": 1}
+    assert queue.claim("w2", ["test"]) is None
+    assert queue.claim("w1", ["other"]) is None
+
+
+def test_expired_lease_is_reclaimed_with_its_checkpoint(queue):
+    job_id = queue.submit("test")
+    queue.claim("w1", ["test"])
+    queue.heartbeat(job_id, "w1", progress=0.5, checkpoint={"done": 10})
+
+    time.sleep(0.25)  # w1 died: its lease runs out
+    job = queue.claim("w2", ["test"])
+    assert job.id == job_id and job.attempts == 2
+    assert job.checkpoint == {"done": 10} and job.progress == 0.5
+    with pytest.raises(JobLeaseLost):
+        queue.heartbeat(job_id, "w1")
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_job(queue):
+    job_id = queue.submit("test", max_attempts=1)
+    queue.claim("w1", ["test"])
+    time.sleep(0.25)
+    assert queue.claim("w2", ["test"]) is None
+    job = queue.get(job_id)
+    assert job.status == STATUS_FAILED and job.error == "Visibility timeout exceeded"
+
+
+def test_failures_back_off_then_fail_for_good(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF_BASE", 0.1)
+    job_id = queue.submit("test", max_attempts=2)
+    queue.claim("w1", ["test"])
+    queue.fail(job_id, "w1", "boom")
+
+    job = queue.get(job_id)
+    assert job.status == STATUS_QUEUED and job.error == "boom" and job.run_after > datetime.utcnow()
+    assert queue.claim("w1", ["test"]) is None  # still backing off
+    time.sleep(0.15)
+    assert queue.claim("w1", ["test"]).attempts == 2
+    queue.fail(job_id, "w1", "boom again")
+    assert queue.get(job_id).status == STATUS_FAILED
+
+
+def test_release_does_not_count_the_attempt(queue):
+    job_id = queue.submit("test")
+    queue.claim("w1", ["test"])
+    queue.release(job_id, "w1")
+    assert queue.get(job_id).status == STATUS_QUEUED
+    assert queue.claim("w2", ["test"]).attempts == 1
+
+
+def test_cancel_queued_and_running_jobs(queue):
+    queued = queue.submit("test")
+    assert queue.cancel(queued).status == STATUS_CANCELLED
+    assert queue.claim("w1", ["test"]) is None
+
+    running = queue.submit("test")
+    job = queue.claim("w1", ["test"])
+    assert queue.cancel(running).status == STATUS_RUNNING
+    with pytest.raises(JobCancelled):
+        asyncio.run(JobContext(queue, job, "w1").report(progress=0.1))
+
+
+def test_worker_pool_runs_retries_and_resumes_handlers(db_path, monkeypatch):
+    DatabaseManager.set_default(db_path)
+    monkeypatch.setattr(job_queue, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF_BASE", 0.01)
+    calls = []
+
+    async def flaky(ctx: JobContext):
+        calls.append(dict(ctx.checkpoint))
+        if not ctx.checkpoint:
+            await ctx.report(progress=0.5, checkpoint={"step": 1})
+            raise RuntimeError("first attempt fails")
+        return {"resumed_from": ctx.checkpoint["step"]}
+
+    JobRegistry.register("test-flaky", flaky)
+
+    async def run():
+        pool = JobWorkerPool(kinds=["test-flaky"], workers=1)
+        job_id = pool.queue.submit("test-flaky")
+        pool.start()
+        try:
+            for _ in range(200):
+                job = pool.queue.get(job_id)
+                if job.status in job_queue.FINAL_STATUSES:
+                    return job
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+
+    job = asyncio.run(run())
+    assert job.status == STATUS_SUCCEEDED and job.result == {"resumed_from": 1}
+    assert job.attempts == 2 and calls == [{}, {"step": 1}]
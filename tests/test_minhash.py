@@ -0,0 +1,75 @@
+"""Tests for MinHash signatures and the LSH index (data/schemas/minhash.py)."""
+import random
+
+import pytest
+
+from minhash import BYTE_CHUNK, LSHIndex, MinHasher, normalize, similarity
+
+np = pytest.importorskip("numpy")
+
+_MASK64 = (1 << 64) - 1
+
+
+def _text(rng: random.Random, length: int) -> str:
+    """Lower-case words of exactly ``length`` characters (unchanged by ``normalize``)."""
+    chars = [rng.choice("abcdefghij klmnopqrstuvwxyz") for _ in range(length)]
+    chars[0] = chars[-1] = "x"
+    return "".join(chars).replace("  ", " x")[:length]
+
+
+def _reference(hasher: MinHasher, text: str, min_shingles: int):
+    """Plain-Python byte-shingle MinHash, one text at a time."""
+    data = normalize(text).encode("utf-8")
+    size = hasher.shingle_size
+    if len(data) - size + 1 < max(1, min_shingles):
+        return None
+    grams = {int.from_bytes(data[index:index + size], "big") for index in range(len(data) - size + 1)}
+    return [min(((a * gram + b) & _MASK64) >> 32 for gram in grams) for a, b in zip(hasher._a, hasher._b)]
+
+
+def test_byte_signatures_match_reference_across_chunk_boundaries():
+    hasher = MinHasher(num_perm=8)
+    rng = random.Random(0)
+    shingle = hasher.shingle_size
+    texts = [
+        _text(rng, BYTE_CHUNK - 10 + shingle - 1),   # nearly fills a chunk
+        _text(rng, 30),                              # does not fit after it: starts the next chunk
+        _text(rng, BYTE_CHUNK - 26 + shingle - 1),   # fills that chunk exactly
+        "abc",                                       # too short: None, not in any chunk
+        "",
+        _text(rng, 2 * BYTE_CHUNK + 7),              # longer than a chunk on its own
+        "Ünïcödé   words — with MIXED case and   spacing, ünïcödé",
+        _text(rng, 40),
+    ]
+    signatures = hasher.byte_signatures(texts, min_shingles=8)
+
+    assert signatures[3] is None and signatures[4] is None
+    for text, signature in zip(texts, signatures):
+        expected = _reference(hasher, text, 8)
+        assert (None if signature is None else list(signature)) == expected
+        # The same values when signed alone, i.e. independent of the batch layout
+        alone = hasher.byte_signatures([text], min_shingles=8)[0]
+        assert (None if alone is None else list(alone)) == expected
+
+
+def test_byte_signatures_estimate_similarity():
+    hasher = MinHasher()
+    base = "officials confirm the bridge closure was planned weeks ago, share before it is deleted"
+    edited, unrelated = hasher.byte_signatures([base, base.replace("weeks", "months")]), hasher.byte_signatures(
+        ["local bakery wins a regional award for its sourdough after twenty years"])[0]
+    assert similarity(*edited) > 0.6
+    assert similarity(edited[0], unrelated) < 0.2
+
+
+def test_lsh_index_finds_near_duplicates_only():
+    hasher = MinHasher()
+    index = LSHIndex(hasher.num_perm, threshold=0.8)
+    base = "officials confirm the bridge closure was planned weeks ago, share before it is deleted"
+    index.add("base", hasher.signature(base))
+    index.add("other", hasher.signature("local bakery wins a regional award for its sourdough"))
+
+    found = index.query(hasher.signature(base.upper() + "  "))
+    assert found is not None and found[0] == "base" and found[1] == 1.0
+    assert index.query(hasher.signature("weather service expects light rain tomorrow morning")) is None
+    index.remove("base")
+    assert index.query(hasher.signature(base)) is None and len(index) == 1
@@ -0,0 +1,123 @@
+"""Tests for the content_events change-data-capture outbox (outbox.py)."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import outbox
+from database import ContentEventDB, DatabaseManager
+from outbox import OutboxConsumer
+from retention import RetentionManager
+
+
+def _insert(manager: DatabaseManager, *event_ids: str):
+    with manager.engine.begin() as conn:
+        conn.execute(ContentEventDB.__table__.insert(), [
+            {"id": event_id, "source": "test", "content_type": "text", "text": f"post {event_id}",
+             "content_hash": event_id, "timestamp": datetime.utcnow()}
+            for event_id in event_ids
+        ])
+
+
+def _outbox_size(manager: DatabaseManager) -> int:
+    with manager.reader.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {outbox.OUTBOX_TABLE}")).scalar()
+
+
+def _drain(consumer: OutboxConsumer):
+    async def run():
+        while await consumer.poll_once():
+            pass
+    asyncio.run(run())
+
+
+class Recorder:
+    def __init__(self):
+        self.event_ids = []
+
+    async def __call__(self, events):
+        self.event_ids.extend(event.id for event in events)
+
+
+def test_delivers_in_insert_order_and_resumes_from_the_committed_offset(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "c", "a", "b")
+    first = Recorder()
+    _drain(OutboxConsumer(manager, "test", first, batch_size=2))
+    assert first.event_ids == ["c", "a", "b"]
+
+    _insert(manager, "d")
+    # A new instance of the same consumer starts after its committed offset
+    resumed = Recorder()
+    consumer = OutboxConsumer(manager, "test", resumed)
+    _drain(consumer)
+    assert resumed.event_ids == ["d"]
+    assert consumer.metrics()["offset"] == consumer.metrics()["head"] == 4
+
+
+def test_consumer_registered_later_still_sees_every_entry(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a", "b")
+    _drain(OutboxConsumer(manager, "early", Recorder()))
+
+    late = Recorder()
+    _drain(OutboxConsumer(manager, "late", late))
+    assert late.event_ids == ["a", "b"]
+    assert _outbox_size(manager) == 2
+
+
+def test_failed_batch_is_not_committed(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a")
+
+    async def fail(events):
+        raise RuntimeError("handler down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(OutboxConsumer(manager, "test", fail).poll_once())
+    retried = Recorder()
+    _drain(OutboxConsumer(manager, "test", retried))
+    assert retried.event_ids == ["a"]
+
+
+def test_handler_override_and_deleted_events(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a", "b")
+    with manager.engine.begin() as conn:
+        conn.execute(text("DELETE FROM content_events WHERE id = 'a'"))
+    own, override = Recorder(), Recorder()
+    consumer = OutboxConsumer(manager, "test", own)
+    assert asyncio.run(consumer.poll_once(override)) == 2
+    assert own.event_ids == [] and override.event_ids == ["b"]
+
+
+def test_background_task_holds_the_lock_around_each_batch(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a")
+    seen = Recorder()
+
+    async def run():
+        lock = asyncio.Lock()
+        consumer = OutboxConsumer(manager, "test", seen, poll_interval=0.01, lock=lock)
+        async with lock:
+            consumer.start()
+            await asyncio.sleep(0.05)
+            assert seen.event_ids == []  # waiting for the lock
+        await asyncio.sleep(0.05)
+        await consumer.stop()
+
+    asyncio.run(run())
+    assert seen.event_ids == ["a"]
+
+
+def test_retention_keeps_entries_a_consumer_has_not_committed(db_path):
+    manager = DatabaseManager(db_path)
+    _insert(manager, "a", "b", "c")
+    consumer = OutboxConsumer(manager, "test", Recorder(), batch_size=2)
+    asyncio.run(consumer.poll_once())  # commits offset 2
+
+    retention = RetentionManager(["content_outbox"], db_managers=[manager])
+    result = retention.expire("content_outbox", datetime.utcnow() + timedelta(days=1))
+    assert result["deleted"] == 2
+    assert _outbox_size(manager) == 1
@@ -0,0 +1,112 @@
+"""Tests for per-table retention (retention.py)."""
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, text
+
+import fulltext
+import retention
+from database import ContentEventDB, ConsumerOffsetDB, DatabaseManager, EventLogDB, JobDB
+from retention import RetentionManager
+
+NOW = datetime(2026, 10, 18, 12)
+
+
+def _count(manager: DatabaseManager, model) -> int:
+    with manager.reader.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar()
+
+
+def _insert_events(manager: DatabaseManager, ages_in_days):
+    with manager.engine.begin() as conn:
+        conn.execute(ContentEventDB.__table__.insert(), [
+            {"id": f"e{i}", "source": "test", "content_type": "text", "text": f"archived post {i}",
+             "content_hash": f"h{i}", "timestamp": NOW - timedelta(days=age)}
+            for i, age in enumerate(ages_in_days)
+        ])
+
+
+def test_expires_old_rows_in_batches_and_archives_them_first(db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "BATCH_PAUSE", 0)
+    manager = DatabaseManager(db_path)
+    _insert_events(manager, [40] * 7 + [5] * 3)
+    expired_batches = []
+    retention_manager = RetentionManager(
+        ["content_events"], retention={"content_events": 30}, batch_size=3, db_managers=[manager],
+        archive_dir=str(tmp_path / "archive"), hooks={"content_events": lambda conn, rows: expired_batches.append(rows)}
+    )
+
+    result = retention_manager.run_once(now=NOW)["tables"]["content_events"]
+    assert result["deleted"] == 7
+    assert [len(rows) for rows in expired_batches] == [3, 3, 1]
+    assert _count(manager, ContentEventDB) == 3
+
+    with gzip.open(result["archive"], "rt", encoding="utf-8") as archive:
+        archived = [json.loads(line) for line in archive]
+    assert sorted(row["id"] for row in archived) == [f"e{i}" for i in range(7)]
+    assert archived[0]["text"].startswith("archived post")
+    # The full-text index follows the deletes
+    with manager.reader.connect() as conn:
+        assert len(fulltext.search(conn, "archived")["hits"]) == 3
+
+
+def test_nothing_expires_without_a_policy(db_path):
+    manager = DatabaseManager(db_path)
+    _insert_events(manager, [400])
+    retention_manager = RetentionManager(["content_events"], retention={"content_events": None},
+                                         db_managers=[manager])
+    assert not retention_manager.enabled
+    assert retention_manager.run_once(now=NOW)["tables"] == {}
+    assert _count(manager, ContentEventDB) == 1
+
+
+def test_event_log_keeps_entries_a_consumer_group_has_not_committed(db_path):
+    manager = DatabaseManager(db_path)
+    with manager.engine.begin() as conn:
+        conn.execute(EventLogDB.__table__.insert(), [
+            {"event_id": f"e{i}", "source": "test", "appended_at": NOW - timedelta(days=10)} for i in range(5)
+        ])
+        conn.execute(ConsumerOffsetDB.__table__.insert(), [
+            {"consumer_group": "fast", "committed_seq": 5}, {"consumer_group": "slow", "committed_seq": 2},
+        ])
+    RetentionManager(["event_log"], db_managers=[manager]).expire("event_log", NOW)
+    with manager.reader.connect() as conn:
+        assert [row.seq for row in conn.execute(select(EventLogDB.seq).order_by(EventLogDB.seq))] == [3, 4, 5]
+
+
+def test_only_finished_jobs_expire(db_path):
+    manager = DatabaseManager(db_path)
+    old = NOW - timedelta(days=10)
+    with manager.engine.begin() as conn:
+        conn.execute(JobDB.__table__.insert(), [
+            {"id": status, "kind": "test", "status": status, "attempts": 1, "max_attempts": 3,
+             "cancel_requested": 0, "run_after": old, "created_at": old, "updated_at": old, "finished_at": old}
+            for status in ("succeeded", "failed", "cancelled", "running", "queued")
+        ])
+    RetentionManager(["jobs"], db_managers=[manager]).expire("jobs", NOW)
+    with manager.reader.connect() as conn:
+        assert sorted(conn.execute(select(JobDB.id)).scalars()) == ["queued", "running"]
+
+
+def test_reclaim_space_releases_free_pages(db_path):
+    manager = DatabaseManager(db_path)
+    with manager.engine.begin() as conn:
+        conn.execute(ContentEventDB.__table__.insert(), [
+            {"id": f"e{i}", "source": "test", "content_type": "text", "text": f"{i} " + "x" * 2000,
+             "content_hash": f"h{i}", "timestamp": NOW - timedelta(days=40)}
+            for i in range(200)
+        ])
+    retention_manager = RetentionManager(["content_events"], retention={"content_events": 30},
+                                         db_managers=[manager])
+    result = retention_manager.run_once(now=NOW)
+    assert result["tables"]["content_events"]["deleted"] == 200
+    assert result["vacuumed_pages"] > 0
+    with manager.reader.connect() as conn:
+        assert conn.execute(text("PRAGMA freelist_count")).scalar() == 0
+
+
+def test_unknown_table_is_rejected():
+    with pytest.raises(ValueError):
+        RetentionManager(["not_a_table"])
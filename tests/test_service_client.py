@@ -0,0 +1,70 @@
+"""Tests for risk analytics' downstream service client (retries and circuit breaking)."""
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import add_service_path
+
+add_service_path("risk-analytics")
+
+from service_client import CircuitBreaker, CircuitOpenError, RetryBudget, ServiceClient  # noqa: E402
+
+
+def _client(handler, **kwargs) -> ServiceClient:
+    client = ServiceClient("detection", "http://detection", max_retries=0, **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://detection")
+    return client
+
+
+def test_breaker_opens_and_recovers_through_one_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()          # cool-down over: the probe goes through
+    assert not breaker.allow()      # ...and only the probe
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_cancelled_probe_does_not_wedge_the_breaker():
+    async def scenario():
+        async def hang(request):
+            await asyncio.sleep(10)
+
+        client = _client(hang)
+        breaker = client.breakers["detector"] = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        probe = asyncio.get_running_loop().create_task(client.get("/detector", endpoint="detector"))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # The cancelled probe counts as failed; after the cool-down the next probe is allowed
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow()
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_failing_endpoint_does_not_open_the_others():
+    async def scenario():
+        def handler(request):
+            return httpx.Response(503 if request.url.path == "/detect/batch" else 200, json={})
+
+        client = _client(handler, breaker_factory=lambda: CircuitBreaker(failure_threshold=2, reset_timeout=60),
+                         budget=RetryBudget(min_tokens=0))
+        for _ in range(2):
+            assert (await client.post("/detect/batch", endpoint="detect_batch")).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            await client.post("/detect/batch", endpoint="detect_batch")
+        assert (await client.get("/detector", endpoint="detector")).status_code == 200
+        metrics = client.metrics()
+        await client.aclose()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["circuits"]["detect_batch"]["state"] == CircuitBreaker.OPEN
+    assert metrics["circuits"]["detector"]["state"] == CircuitBreaker.CLOSED
@@ -0,0 +1,41 @@
+"""Tests for content deduplication across shard files (SQLitePublisher)."""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from conftest import add_service_path
+
+add_service_path("ingestion")
+
+from database import ContentEventDB, ContentSightingDB  # noqa: E402
+from models import ContentEvent  # noqa: E402
+from sharding import ShardSet  # noqa: E402
+from sqlite_publisher import SQLitePublisher  # noqa: E402
+
+
+def _count(shards: ShardSet, table) -> int:
+    total = 0
+    for manager in shards.managers:
+        with manager.reader.connect() as conn:
+            total += conn.execute(select(func.count()).select_from(table)).scalar()
+    return total
+
+
+def test_concurrent_batches_store_each_text_once(db_path):
+    shards = ShardSet(db_path, 4)
+    publisher = SQLitePublisher(shards=shards)
+    texts = [f"shared post {i}" for i in range(40)]
+    # Every batch repeats the same texts under its own event ids, which route to different shards
+    batches = [
+        [ContentEvent(id=f"b{batch}-{i}", source=f"feed-{batch}", text=text) for i, text in enumerate(texts)]
+        for batch in range(8)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(publisher._write_events, batches))
+
+    assert _count(shards, ContentEventDB) == len(texts)
+    assert _count(shards, ContentSightingDB) == len(texts) * (len(batches) - 1)
+    # Every batch resolves a text to the same canonical id
+    canonical = [[event_id for event_id, _ in batch_results] for batch_results in results]
+    assert all(ids == canonical[0] for ids in canonical)
+    assert not publisher._hashes_in_flight
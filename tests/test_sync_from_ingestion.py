@@ -0,0 +1,109 @@
+"""Tests for risk analytics' incremental sync from ingestion."""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from conftest import load_service_main
+
+
+def _detect_batch(request: httpx.Request) -> httpx.Response:
+    items = json.loads(request.content)
+    return httpx.Response(200, json=[
+        {"event_id": item["metadata"]["event_id"], "label": "human-written", "confidence": 0.9, "model_name": "stub"}
+        for item in items
+    ])
+
+
+def _load_services(monkeypatch, ingestion_db: str, analytics_db: str, event_log: bool = True):
+    monkeypatch.setenv("INGESTION_DB_PATH", ingestion_db)
+    monkeypatch.setenv("ANALYTICS_DB_PATH", analytics_db)
+    monkeypatch.setenv("INGESTION_EVENT_LOG", "1" if event_log else "0")
+    monkeypatch.setenv("SYNC_PAGE_SIZE", "2")
+    ingestion = load_service_main("ingestion")
+    analytics = load_service_main("risk-analytics")
+    return ingestion, analytics
+
+
+@pytest.fixture
+def services(db_path, monkeypatch):
+    return _load_services(monkeypatch, db_path, db_path)
+
+
+@pytest.fixture
+def services_without_log(db_path, monkeypatch):
+    return _load_services(monkeypatch, db_path, db_path, event_log=False)
+
+
+def _sync(ingestion, analytics, reset: bool = False) -> dict:
+    from models import ContentEvent  # noqa: F401 (schemas path is set by conftest)
+
+    async def run():
+        analytics.ingestion_client._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=ingestion.app), base_url="http://ingestion")
+        analytics.detection_client._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(_detect_batch), base_url="http://detection")
+        try:
+            return await analytics._sync_events(reset)
+        finally:
+            await analytics.ingestion_client.aclose()
+            await analytics.detection_client.aclose()
+
+    return asyncio.run(run())
+
+
+def _publish(ingestion, *events):
+    asyncio.run(ingestion.publisher.publish_batch(list(events)))
+
+
+def test_late_event_with_older_timestamp_is_scored(services):
+    from models import ContentEvent
+
+    ingestion, analytics = services
+    now = datetime.utcnow()
+    _publish(ingestion, *(ContentEvent(id=f"e{i}", source="test", text=f"post {i}", timestamp=now) for i in range(3)))
+    assert _sync(ingestion, analytics)["events_processed"] == 3
+
+    # Committed after the first sync, but timestamped before everything already synced
+    _publish(ingestion, ContentEvent(id="late", source="test", text="late post", timestamp=now - timedelta(hours=1)))
+    totals = _sync(ingestion, analytics)
+    assert totals["events_fetched"] == 1 and totals["events_processed"] == 1
+    assert asyncio.run(analytics.analytics_store.existing_event_ids(["late"])) == {"late"}
+
+    assert _sync(ingestion, analytics)["events_fetched"] == 0
+
+
+def test_reset_rescans_without_rescoring(services):
+    from models import ContentEvent
+
+    ingestion, analytics = services
+    _publish(ingestion, *(ContentEvent(id=f"e{i}", source="test", text=f"post {i}") for i in range(3)))
+    _sync(ingestion, analytics)
+    totals = _sync(ingestion, analytics, reset=True)
+    assert totals["events_fetched"] == 3 and totals["events_processed"] == 0
+
+
+def test_without_event_log_sync_resumes_from_the_outbox(services_without_log):
+    from models import ContentEvent
+
+    ingestion, analytics = services_without_log
+    _publish(ingestion, *(ContentEvent(id=f"e{i}", source="test", text=f"post {i}") for i in range(3)))
+    assert _sync(ingestion, analytics)["events_processed"] == 3
+
+    # Nothing new: no event is fetched again
+    assert _sync(ingestion, analytics)["events_fetched"] == 0
+
+    _publish(ingestion, ContentEvent(id="new", source="test", text="new post"))
+    totals = _sync(ingestion, analytics)
+    assert totals["events_fetched"] == 1 and totals["events_processed"] == 1
+
+
+def test_without_event_log_or_shared_database_sync_fails(db_path, tmp_path, monkeypatch):
+    from models import ContentEvent
+
+    ingestion, analytics = _load_services(monkeypatch, db_path, str(tmp_path / "analytics.db"), event_log=False)
+    _publish(ingestion, ContentEvent(id="e0", source="test", text="post"))
+    with pytest.raises(RuntimeError, match="INGESTION_EVENT_LOG"):
+        _sync(ingestion, analytics)
@@ -0,0 +1,89 @@
+"""Tests for transparent content_events.text compression (text_codec.py)."""
+import pytest
+from sqlalchemy import select, text
+
+import fulltext
+import text_codec
+from database import ContentEventDB, DatabaseManager
+
+LONG_TEXT = "Breaking: the harbour bridge reopens after repairs, officials say. " * 4
+
+
+@pytest.fixture
+def codec(monkeypatch):
+    """Isolate the module-level codec settings, dictionaries and loader."""
+    monkeypatch.setattr(text_codec, "_settings", {"mode": text_codec.MODE_OFF, "min_bytes": 64,
+                                                  "dictionary_id": None})
+    monkeypatch.setattr(text_codec, "_dictionaries", {})
+    monkeypatch.setattr(text_codec, "_dictionary_loader", None)
+    return text_codec
+
+
+def _store(manager: DatabaseManager, event_id: str, body: str):
+    with manager.engine.begin() as conn:
+        conn.execute(ContentEventDB.__table__.insert(), [{
+            "id": event_id, "source": "test", "content_type": "text", "text": body, "content_hash": event_id,
+        }])
+
+
+def _raw(manager: DatabaseManager, event_id: str):
+    with manager.reader.connect() as conn:
+        return conn.execute(text("SELECT text FROM content_events WHERE id = :id"), {"id": event_id}).scalar()
+
+
+def test_zlib_round_trip_and_plain_fallbacks(codec):
+    codec.configure(mode=codec.MODE_ZLIB)
+    encoded = codec.compress_text(LONG_TEXT)
+    assert codec.is_compressed(encoded) and len(encoded) < len(LONG_TEXT)
+    assert codec.decompress_text(encoded) == LONG_TEXT
+
+    # Below the size threshold, or not smaller when compressed: stored as is
+    assert codec.compress_text("short") == "short"
+    incompressible = "".join(chr(0x4e00 + (i * 7919) % 20000) for i in range(40))
+    assert codec.compress_text(incompressible) == incompressible
+    # Plain str and plain UTF-8 BLOBs written before compression still decode
+    assert codec.decompress_text("plain") == "plain"
+    assert codec.decompress_text("café".encode("utf-8")) == "café"
+
+
+def test_dictionary_round_trip_loads_missing_dictionaries(codec):
+    dictionary = codec.train_dictionary([LONG_TEXT, LONG_TEXT.upper(), LONG_TEXT])
+    codec.register_dictionary(7, dictionary)
+    encoded = codec.compress_text(LONG_TEXT, mode=codec.MODE_DICT, dictionary_id=7)
+    assert encoded[:3] == codec.MAGIC + codec.CODEC_DICT
+
+    codec._dictionaries.clear()
+    with pytest.raises(LookupError):
+        codec.decompress_text(encoded)
+    codec.set_dictionary_loader({7: dictionary}.get)
+    assert codec.decompress_text(encoded) == LONG_TEXT
+
+
+def test_compressed_rows_read_back_through_orm_sql_and_search(db_path, codec):
+    manager = DatabaseManager.set_default(db_path)
+    _store(manager, "plain", LONG_TEXT)
+    codec.configure(mode=codec.MODE_ZLIB)
+    _store(manager, "zipped", LONG_TEXT.replace("harbour", "river"))
+
+    assert isinstance(_raw(manager, "plain"), str)
+    assert codec.is_compressed(_raw(manager, "zipped"))
+    with manager.reader.connect() as conn:
+        by_orm = dict(conn.execute(select(ContentEventDB.id, ContentEventDB.text)).all())
+        by_sql = dict(conn.execute(text("SELECT id, astra_text(text) FROM content_events")).all())
+        hits = fulltext.search(conn, "river")["hits"]
+    assert by_orm == by_sql == {"plain": LONG_TEXT, "zipped": LONG_TEXT.replace("harbour", "river")}
+    assert [hit["id"] for hit in hits] == ["zipped"]
+    assert "<mark>river</mark>" in hits[0]["snippet"]
+
+
+def test_dictionary_compressed_rows_decode_after_restart(db_path, codec):
+    manager = DatabaseManager.set_default(db_path)
+    dictionary_id = manager.save_compression_dictionary(codec.train_dictionary([LONG_TEXT] * 3), 3)
+    codec.configure(mode=codec.MODE_DICT, dictionary_id=dictionary_id)
+    _store(manager, "e1", LONG_TEXT)
+
+    # A new process has no dictionaries registered; they are loaded from the database
+    codec._dictionaries.clear()
+    with manager.reader.connect() as conn:
+        assert conn.execute(text("SELECT astra_text(text) FROM content_events")).scalar() == LONG_TEXT
+    assert codec.is_compressed(_raw(manager, "e1"))
@@ -0,0 +1,37 @@
+"""Tests for GET /timeseries of the risk-analytics service."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load_service_main
+from database import to_naive_utc
+
+
+@pytest.fixture
+def analytics(db_path, monkeypatch):
+    monkeypatch.setenv("ANALYTICS_DB_PATH", db_path)
+    return load_service_main("risk-analytics")
+
+
+def test_to_naive_utc():
+    aware = datetime(2026, 10, 18, 2, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert to_naive_utc(aware) == datetime(2026, 10, 18, 0, 0)
+    assert to_naive_utc(datetime(2026, 10, 18)) == datetime(2026, 10, 18)
+    assert to_naive_utc(None) is None
+
+
+def test_timeseries_accepts_timezone_aware_range(analytics):
+    from models import AnalyticsRecord
+
+    now = datetime.utcnow()
+    asyncio.run(analytics.analytics_store.add_records([
+        AnalyticsRecord(event_id="e1", source="test", text_preview="x", detection_label="AI-generated",
+                        confidence=0.9, timestamp=now)
+    ]))
+    since = (now - timedelta(hours=2)).replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+    response = TestClient(analytics.app).get("/timeseries", params={"resolution": "auto", "since": since})
+    assert response.status_code == 200
+    series = response.json()["series"]
+    assert sum(bucket["count"] for buckets in series.values() for bucket in buckets) == 1
@@ -0,0 +1,51 @@
+"""Tests for the write-behind buffer (data/schemas/write_buffer.py)."""
+import asyncio
+
+import pytest
+
+from write_buffer import DURABILITY_COMMIT, WriteBehindBuffer
+
+
+def test_commit_mode_returns_per_row_results():
+    async def scenario():
+        buffer = WriteBehindBuffer(lambda rows: [row * 2 for row in rows], flush_size=2, flush_interval=0.01)
+        results = await asyncio.gather(buffer.submit([1]), buffer.submit([2, 3]))
+        await buffer.stop()
+        return results, buffer.metrics()
+
+    results, metrics = asyncio.run(scenario())
+    assert results == [[2], [4, 6]]
+    assert metrics["queue_depth"] == 0
+    assert metrics["flushed_rows"] == 3
+
+
+def test_failed_flush_with_cancelled_caller_resolves_the_rest():
+    async def scenario():
+        release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        async def runner(fn, rows):
+            await release.wait()
+            return fn(rows)
+
+        def fail(rows):
+            raise RuntimeError("disk full")
+
+        buffer = WriteBehindBuffer(fail, flush_size=10, flush_interval=0.01,
+                                   durability=DURABILITY_COMMIT, runner=runner)
+        cancelled = loop.create_task(buffer.submit([1]))
+        waiting = loop.create_task(buffer.submit([2, 3]))
+        await asyncio.sleep(0.05)  # both entries are in the flush that is blocked in the runner
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(RuntimeError, match="disk full"):
+            await asyncio.wait_for(waiting, 2)
+        task = buffer._task
+        await asyncio.wait_for(buffer.stop(), 2)
+        return task, buffer.metrics()
+
+    task, metrics = asyncio.run(scenario())
+    assert task.done() and task.exception() is None
+    assert metrics["queue_depth"] == 0
+    assert metrics["failed_flushes"] == 1
@@ -0,0 +1,91 @@
+"""
+Expire old rows, archive them and reclaim space, outside the services.
+
+The ingestion and risk-analytics services apply the `ASTRA_RETENTION_*`
+policies in the background (see `data/schemas/retention.py`). Use this
+script for a one-off cleanup, to archive before changing a policy, or to
+switch a database created before incremental vacuum was enabled (one full
+VACUUM; stop the services first).
+
+Usage:
+    # Apply the policies configured in the environment
+    python tools/scripts/apply_retention.py
+
+    # Explicit policies, archiving expired rows first
+    python tools/scripts/apply_retention.py --keep content_events=90 --keep analytics_records=365 \\
+        --archive-dir data/archive
+
+    # One-time switch of an existing database to incremental vacuum
+    python tools/scripts/apply_retention.py --enable-incremental-vacuum
+"""
+import argparse
+import os
+import sys
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'risk-analytics'))
+
+from sharding import ShardSet
+from retention import DEFAULT_ARCHIVE_DIR, DEFAULT_BATCH, RETENTION_POLICIES, RetentionManager, \
+    enable_incremental_vacuum
+import aggregates
+
+
+def parse_keep(value: str):
+    table, _, days = value.partition('=')
+    if table not in RETENTION_POLICIES or not days:
+        raise argparse.ArgumentTypeError(
+            f"expected TABLE=DAYS with TABLE one of {', '.join(RETENTION_POLICIES)}"
+        )
+    return table, float(days)
+
+
+def expire_analytics(conn, rows):
+    """Keep the stats aggregates in step with deleted analytics records."""
+    aggregates.apply_stats_deltas(conn, aggregates.stats_deltas(rows, sign=-1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply table retention policies and reclaim space")
+    parser.add_argument('--db-path', type=str, help='Database path (default: data/astra.db)')
+    parser.add_argument('--keep', type=parse_keep, action='append', default=[], metavar='TABLE=DAYS',
+                        help='Retention for a table in days (overrides ASTRA_RETENTION_<TABLE>_DAYS)')
+    parser.add_argument('--archive-dir', type=str, default=DEFAULT_ARCHIVE_DIR,
+                        help='Write expired rows to gzip NDJSON files here before deleting')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH, help='Rows deleted per transaction')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Switch the database to auto_vacuum=INCREMENTAL (full VACUUM, needs exclusive access)')
+    args = parser.parse_args()
+
+    shards = ShardSet(args.db_path)  # policies apply to every shard file (ASTRA_DB_SHARDS)
+    if args.enable_incremental_vacuum:
+        for db_manager in shards.managers:
+            changed = enable_incremental_vacuum(db_manager)
+            print(f"✓ {os.path.basename(db_manager.db_path)}: " +
+                  ("switched to incremental vacuum" if changed else "incremental vacuum already enabled"))
+
+    manager = RetentionManager(
+        list(RETENTION_POLICIES),
+        retention=dict(args.keep),
+        hooks={"analytics_records": expire_analytics},
+        batch_size=args.batch_size,
+        archive_dir=args.archive_dir,
+        db_managers=shards.managers,
+    )
+    if not manager.enabled:
+        print("No retention configured (set ASTRA_RETENTION_<TABLE>_DAYS or pass --keep TABLE=DAYS)")
+        return
+
+    before = manager.database_size()
+    result = manager.run_once()
+    after = manager.database_size()
+    for table, outcome in result["tables"].items():
+        archive = f" -> {outcome['archive']}" if outcome["archive"] else ""
+        print(f"✓ {table}: expired {outcome['deleted']:,} rows in {outcome['seconds']:.2f} s{archive}")
+    print(f"✓ Released {result['vacuumed_pages']:,} pages; database {before['bytes'] / 1e6:,.1f} MB "
+          f"-> {after['bytes'] / 1e6:,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
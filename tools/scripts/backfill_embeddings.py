@@ -0,0 +1,60 @@
+"""
+Embed content events stored before the ingestion embedding stage was enabled.
+
+The embedding stage (``INGESTION_EMBEDDINGS=1``) only sees events inserted
+while it tails the outbox. This script streams all stored events, oldest
+first, through the same stage in batches; texts already in the embedding
+store are skipped, so it can be rerun or interrupted at any time.
+
+Usage:
+    python tools/scripts/backfill_embeddings.py
+    python tools/scripts/backfill_embeddings.py --db-path /path/to/astra.db --batch-size 256
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'ingestion'))
+
+from sharding import ShardSet
+from sqlite_publisher import SQLitePublisher
+from embedding_stage import EmbeddingStage
+
+
+async def backfill(stage: EmbeddingStage, publisher: SQLitePublisher, batch_size: int) -> int:
+    events = publisher.iter_events(order="asc")
+    total = 0
+    while True:
+        batch = list(itertools.islice(events, batch_size))
+        if not batch:
+            return total
+        await stage.embed_events(batch)
+        total += len(batch)
+        print(f"  {total:,} events")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed stored content events into the embedding store")
+    parser.add_argument('--db-path', type=str, help='Database path (default: data/astra.db)')
+    parser.add_argument('--batch-size', type=int, default=512, help='Events per embedding batch')
+    args = parser.parse_args()
+
+    shards = ShardSet(args.db_path)
+    stage = EmbeddingStage(shards)
+    started = time.perf_counter()
+    total = asyncio.run(backfill(stage, SQLitePublisher(shards=shards), args.batch_size))
+    metrics = stage.store.metrics()
+    print(f"✓ Embedded {metrics['encoded']:,} new texts of {total:,} events with {stage.model} "
+          f"in {time.perf_counter() - started:.2f} s")
+    print(f"✓ {metrics['path']}: {metrics['file_bytes'] / 1024 / 1024:.1f} MB")
+    stage.store.close()
+    shards.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark the SQLite write paths used by ingestion and risk-analytics.
+
+Compares the original per-row ORM writes (default SQLite settings, one ORM
+object per row, one commit per analytics record) against the bulk Core path
+(`SQLitePublisher.publish_batch`, `SQLiteAnalyticsStore.add_records`) running
+on a `DatabaseManager` engine with the throughput pragmas enabled.
+
+Each run uses fresh database files in a temporary directory.
+
+Usage:
+    python tools/scripts/benchmark_bulk_write.py --rows 50000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'ingestion'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'risk-analytics'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import ContentEvent, AnalyticsRecord
+from database import Base, DatabaseManager, ContentEventDB, AnalyticsRecordDB, compute_content_hash
+
+
+def make_events(count: int):
+    """Generate distinct synthetic content events."""
+    return [
+        ContentEvent(
+            id=str(uuid.uuid4()),
+            source="bench",
+            text=f"Synthetic benchmark document number {i}. " * 8,
+            metadata={"seq": i},
+        )
+        for i in range(count)
+    ]
+
+
+def make_records(count: int):
+    """Generate synthetic analytics records."""
+    labels = ["AI-generated", "human-written", "suspicious"]
+    now = datetime.utcnow()
+    return [
+        AnalyticsRecord(
+            event_id=str(uuid.uuid4()),
+            source="bench",
+            text_preview=f"Synthetic preview {i}",
+            detection_label=labels[i % len(labels)],
+            confidence=(i % 100) / 100.0,
+            timestamp=now,
+        )
+        for i in range(count)
+    ]
+
+
+def bench_legacy(db_path: str, events, records, batch_size: int):
+    """Per-row ORM writes on a default-configured engine (pre-bulk behaviour)."""
+    engine = create_engine(f'sqlite:///{db_path}', connect_args={'check_same_thread': False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    start = time.perf_counter()
+    for offset in range(0, len(events), batch_size):
+        session = SessionLocal()
+        try:
+            for event in events[offset:offset + batch_size]:
+                session.add(ContentEventDB(
+                    id=event.id,
+                    source=event.source,
+                    text=event.text,
+                    content_hash=compute_content_hash(event.text),
+                    metadata_json=None,
+                    timestamp=event.timestamp,
+                ))
+            session.commit()
+        finally:
+            session.close()
+    events_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for record in records:
+        session = SessionLocal()
+        try:
+            session.add(AnalyticsRecordDB(**record.model_dump()))
+            session.commit()
+        finally:
+            session.close()
+    records_elapsed = time.perf_counter() - start
+
+    engine.dispose()
+    return events_elapsed, records_elapsed
+
+
+def bench_bulk(db_path: str, events, records, batch_size: int):
+    """Bulk Core writes through the service store classes."""
+    DatabaseManager(db_path=db_path)
+    from sqlite_publisher import SQLitePublisher
+    from sqlite_store import SQLiteAnalyticsStore
+
+    publisher = SQLitePublisher()
+    store = SQLiteAnalyticsStore()
+
+    async def run():
+        start = time.perf_counter()
+        for offset in range(0, len(events), batch_size):
+            await publisher.publish_batch(events[offset:offset + batch_size])
+        events_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, len(records), batch_size):
+            await store.add_records(records[offset:offset + batch_size])
+        records_elapsed = time.perf_counter() - start
+        return events_elapsed, records_elapsed
+
+    return asyncio.run(run())
+
+
+def report(name: str, rows: int, elapsed: float):
+    print(f"  {name:<28} {rows:>9,} rows  {elapsed:8.2f} s  {rows / elapsed:>12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ASTRA SQLite write throughput")
+    parser.add_argument('--rows', type=int, default=20000, help='Content events to write')
+    parser.add_argument('--records', type=int, default=2000,
+                        help='Analytics records for the legacy per-record path (commit per row is slow)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Events per publish_batch call')
+    args = parser.parse_args()
+
+    events = make_events(args.rows)
+    records = make_records(args.records)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("Before (per-row ORM, default pragmas):")
+        ev_time, rec_time = bench_legacy(os.path.join(tmp, 'legacy.db'), events, records, args.batch_size)
+        report("content_events", len(events), ev_time)
+        report("analytics_records", len(records), rec_time)
+
+        bulk_records = make_records(args.rows)
+        print("After (bulk Core executemany, tuned pragmas):")
+        ev_time, rec_time = bench_bulk(os.path.join(tmp, 'bulk.db'), events, bulk_records, args.batch_size)
+        report("content_events", len(events), ev_time)
+        report("analytics_records", len(bulk_records), rec_time)
+
+        DatabaseManager().dispose()
+
+
+if __name__ == "__main__":
+    main()
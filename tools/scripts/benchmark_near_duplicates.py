@@ -0,0 +1,168 @@
+"""
+Benchmark near-duplicate detection reuse on a synthetic campaign corpus.
+
+Builds a corpus of unique texts plus campaigns of lightly edited copies
+(a swapped word, an added hashtag or link, changed case or punctuation),
+shuffles it and sends it through the detection service's
+`detect_with_reuse` in batches, once with exact (content-hash) reuse only
+and once per near-duplicate threshold. Every run starts from a fresh
+database. Reports:
+
+- detector calls and the fraction of model calls avoided,
+- the cost of signing and looking up a text in the LSH index,
+- how often an inherited result comes from the copy's own campaign, and
+  how often its label agrees with detecting the copy itself.
+
+The `simple` detector keeps the run fast; the calls avoided are what a
+model-backed detector would save.
+
+Usage:
+    python tools/scripts/benchmark_near_duplicates.py --campaigns 50 --copies 40 --unique 2000
+    python tools/scripts/benchmark_near_duplicates.py --thresholds 0.7 0.8 0.9
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'detection'))
+
+from models import DetectionRequest
+from database import DatabaseManager, compute_content_hash
+
+WORDS = ("the government report confirms new evidence about election fraud vaccine policy climate crisis "
+         "leaked documents show officials hid the truth share this before it gets deleted experts warn "
+         "citizens should act now media refuses to cover massive protest downtown tonight").split()
+EXTRAS = ["#truth", "#wakeup", "!!", "https://t.co/x1y2", "RT:", "Please share.", "(via @newsdesk)"]
+
+
+def make_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(25, 60))).capitalize() + "."
+
+
+def edit(text: str, rng: random.Random) -> str:
+    """One to three light edits of ``text``."""
+    words = text.split()
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.randrange(4)
+        if kind == 0:
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+        elif kind == 1:
+            words.append(rng.choice(EXTRAS))
+        elif kind == 2:
+            words.insert(0, rng.choice(EXTRAS))
+        else:
+            index = rng.randrange(len(words))
+            words[index] = words[index].upper()
+    return " ".join(words)
+
+
+def make_corpus(campaigns: int, copies: int, unique: int, seed: int):
+    """Shuffled texts and, per text, its campaign (unique texts are their own)."""
+    rng = random.Random(seed)
+    corpus = [(make_text(rng), f"unique-{index}") for index in range(unique)]
+    for campaign in range(campaigns):
+        original = make_text(rng)
+        corpus += [(original, f"campaign-{campaign}")]
+        corpus += [(edit(original, rng), f"campaign-{campaign}") for _ in range(copies - 1)]
+    rng.shuffle(corpus)
+    return [text for text, _ in corpus], {compute_content_hash(text): group for text, group in corpus}
+
+
+async def run(main, texts, batch_size: int):
+    """Detect ``texts`` in batches; returns (results, detector calls, seconds)."""
+    detector = main.get_detector()
+    calls = 0
+    detect_batch = detector.detect_batch
+
+    async def counting(requests):
+        nonlocal calls
+        calls += len(requests)
+        return await detect_batch(requests)
+
+    detector.detect_batch = counting
+    results = []
+    started = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        requests = [DetectionRequest(text=text) for text in texts[offset:offset + batch_size]]
+        results += await main.detect_with_reuse(detector, requests)
+    elapsed = time.perf_counter() - started
+    detector.detect_batch = detect_batch
+    return results, calls, elapsed
+
+
+def fresh_state(main, db_path: str, threshold):
+    """Point the detection module at a new database (and index) for one run."""
+    from result_store import SQLiteDetectionStore
+    from near_duplicates import NearDuplicateIndex
+
+    DatabaseManager.set_default(db_path)
+    main.result_store = SQLiteDetectionStore()
+    main.NEAR_DUP_ENABLED = threshold is not None
+    main.near_duplicates = NearDuplicateIndex(main.result_store.db_manager, threshold=threshold or 0.9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate detection reuse")
+    parser.add_argument('--campaigns', type=int, default=50, help='Campaigns of edited copies')
+    parser.add_argument('--copies', type=int, default=40, help='Texts per campaign (original + edits)')
+    parser.add_argument('--unique', type=int, default=2000, help='Unrelated texts')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.8, 0.9], help='Similarity thresholds')
+    parser.add_argument('--batch-size', type=int, default=32, help='Texts per detect_with_reuse call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DETECTOR_NAME", "simple")
+    texts, groups = make_corpus(args.campaigns, args.copies, args.unique, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DETECTION_DB_PATH"] = os.path.join(tmp, "setup.db")
+        import main as detection
+
+        print(f"{len(texts):,} texts: {args.unique:,} unique, {args.campaigns} campaigns x {args.copies} copies")
+        fresh_state(detection, os.path.join(tmp, "exact.db"), None)
+        baseline, baseline_calls, elapsed = asyncio.run(run(detection, texts, args.batch_size))
+        print(f"  exact reuse only    {baseline_calls:>7,} detector calls  "
+              f"{1 - baseline_calls / len(texts):6.1%} avoided  {elapsed:6.2f} s")
+
+        for threshold in args.thresholds:
+            fresh_state(detection, os.path.join(tmp, f"near-{threshold}.db"), threshold)
+            results, calls, elapsed = asyncio.run(run(detection, texts, args.batch_size))
+            asyncio.run(detection.near_duplicates.persist())
+            inherited = [(text, result, truth) for text, result, truth in zip(texts, results, baseline)
+                         if "near_duplicate" in result.metadata]
+            same_campaign = sum(
+                1 for text, result, _ in inherited
+                if groups[result.metadata["near_duplicate"]["representative_hash"]] == groups[compute_content_hash(text)]
+            )
+            agree = sum(1 for _, result, truth in inherited if result.label == truth.label)
+            metrics = detection.near_duplicates.metrics()
+            print(f"  near-dup >= {threshold:<6}  {calls:>7,} detector calls  {1 - calls / len(texts):6.1%} avoided  "
+                  f"{elapsed:6.2f} s  ({1 - calls / baseline_calls:.1%} fewer than exact reuse)")
+            print(f"    {len(inherited):,} inherited, {same_campaign / max(1, len(inherited)):.1%} from their own campaign, "
+                  f"label agrees with own detection for {agree / max(1, len(inherited)):.1%}")
+            print(f"    sign + lookup {metrics['avg_query_us']:.0f} µs/text in detect_with_reuse, "
+                  f"{sum(metrics['representatives'].values()):,} representatives")
+            lookup_cost(detection.near_duplicates, detection.get_detector().version, texts)
+
+
+def lookup_cost(index, detector_version: str, texts):
+    """Time signing and the LSH query separately against the final index."""
+    lsh = index.loaded_index(detector_version)
+    started = time.perf_counter()
+    signatures = [index.hasher.signature(text) for text in texts]
+    signed = time.perf_counter() - started
+    started = time.perf_counter()
+    for signature in signatures:
+        lsh.query(signature)
+    queried = time.perf_counter() - started
+    print(f"    signature {signed / len(texts) * 1e6:.0f} µs/text, LSH query {queried / len(texts) * 1e6:.0f} µs/text "
+          f"({lsh.bands} bands x {lsh.rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark write throughput of content events and analytics records by shard count.
+
+For each shard count a fresh set of shard files is created in a temporary
+directory and written through the service store classes
+(`SQLitePublisher.publish_batch`, `SQLiteAnalyticsStore.add_records`) by
+``--processes`` writer processes (like several service workers sharing the
+files), each running ``--writers`` concurrent writers.
+
+SQLite admits one writer per file, so with one shard the processes queue
+behind each other's transactions; with N shards up to N of them commit at
+the same time. Throughput therefore grows with the shard count as long as
+there are processes and CPU cores to run them. Within one process the
+shards are also written in parallel, but row encoding holds the GIL, so a
+single process gains little.
+
+Usage:
+    python tools/scripts/benchmark_sharding.py --shards 1 2 4 --processes 4 --rows 40000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'ingestion'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'risk-analytics'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sharding import ShardSet
+from benchmark_bulk_write import make_events, make_records
+
+DATASETS = ("content_events", "analytics_records")
+
+
+async def write_concurrently(write, items, batch_size: int, writers: int):
+    """Write ``items`` in batches from ``writers`` concurrent tasks."""
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    async def writer(index: int):
+        for batch in batches[index::writers]:
+            await write(batch)
+
+    await asyncio.gather(*(writer(index) for index in range(writers)))
+
+
+def writer_process(db_path: str, count: int, dataset: str, items, batch_size: int, writers: int, barrier):
+    """One writer process: open the shards, wait for the others, then write its share."""
+    from sqlite_publisher import SQLitePublisher
+    from sqlite_store import SQLiteAnalyticsStore
+
+    shards = ShardSet(db_path, count)
+    if dataset == "content_events":
+        write = SQLitePublisher(shards=shards).publish_batch
+    else:
+        write = SQLiteAnalyticsStore(shards=shards).add_records
+    barrier.wait()
+    asyncio.run(write_concurrently(write, items, batch_size, writers))
+    shards.dispose()
+
+
+def bench(db_path: str, count: int, dataset: str, items, batch_size: int, writers: int, processes: int) -> float:
+    """Write ``items`` from ``processes`` processes; returns elapsed seconds."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes + 1)
+    workers = [
+        context.Process(target=writer_process,
+                        args=(db_path, count, dataset, items[index::processes], batch_size, writers, barrier))
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()  # start timing once every process has opened the shards
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    if any(worker.exitcode for worker in workers):
+        raise RuntimeError(f"A writer process failed writing {dataset}")
+    return elapsed
+
+
+def stored_rows(db_path: str, count: int):
+    from sqlite_publisher import SQLitePublisher
+    from sqlite_store import SQLiteAnalyticsStore
+
+    shards = ShardSet(db_path, count)
+
+    async def run():
+        events = await SQLitePublisher(shards=shards).count_events()
+        records = (await SQLiteAnalyticsStore(shards=shards).get_stats())["total_events"]
+        return events, records
+
+    try:
+        return asyncio.run(run())
+    finally:
+        shards.dispose()
+
+
+def report(name: str, rows: int, elapsed: float, baseline: float):
+    print(f"  {name:<20} {rows:>9,} rows  {elapsed:8.2f} s  {rows / elapsed:>12,.0f} rows/s  "
+          f"x{baseline / elapsed:4.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ASTRA write throughput by shard count")
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4], help='Shard counts to compare')
+    parser.add_argument('--rows', type=int, default=40000, help='Content events and analytics records to write')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per publish_batch / add_records call')
+    parser.add_argument('--processes', type=int, default=4, help='Writer processes')
+    parser.add_argument('--writers', type=int, default=2, help='Concurrent writers per process')
+    args = parser.parse_args()
+
+    data = {"content_events": make_events(args.rows), "analytics_records": make_records(args.rows)}
+    baseline = {}
+    print(f"{os.cpu_count()} CPU core(s), {args.processes} writer process(es) x {args.writers} writers")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.shards:
+            db_path = os.path.join(tmp, f'shards-{count}.db')
+            ShardSet(db_path, count).dispose()  # create the files before the writers start
+            elapsed = {
+                dataset: bench(db_path, count, dataset, data[dataset], args.batch_size, args.writers,
+                               args.processes)
+                for dataset in DATASETS
+            }
+            stored = stored_rows(db_path, count)
+            if stored != (args.rows, args.rows):
+                print(f"⚠ Expected {args.rows:,} events and records, found {stored}")
+            baseline = baseline or elapsed
+            print(f"{count} shard(s):")
+            for dataset in DATASETS:
+                report(dataset, args.rows, elapsed[dataset], baseline[dataset])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Compress existing `content_events.text` rows in place and report the savings.
+
+Rows are processed in rowid order in small batches, one short transaction per
+batch, so services can keep writing while the migration runs. Rows already in
+the target encoding are left untouched, which makes the script safe to re-run.
+
+Usage:
+    # Report current storage and the ratio zlib would reach, without writing
+    python tools/scripts/compress_text.py --report
+
+    # Compress with plain zlib
+    python tools/scripts/compress_text.py --mode zlib
+
+    # Train a shared dictionary from 5000 rows, then compress with it
+    python tools/scripts/compress_text.py --mode dict --train-dict --samples 5000
+
+    # Restore plain text
+    python tools/scripts/compress_text.py --mode off
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Optional
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+
+from sqlalchemy import text
+
+import text_codec
+from database import DatabaseManager
+
+
+def stored_size(value) -> int:
+    """Bytes a stored value occupies (BLOB or UTF-8 text)."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(value)
+
+
+def train(db_manager: DatabaseManager, samples: int) -> int:
+    """Train a dictionary from a random sample of rows and store it."""
+    with db_manager.reader.connect() as conn:
+        rows = conn.execute(
+            text("SELECT text FROM content_events ORDER BY random() LIMIT :n"), {"n": samples}
+        ).all()
+    texts = [text_codec.decompress_text(row[0]) for row in rows]
+    started = time.perf_counter()
+    dictionary = text_codec.train_dictionary(texts)
+    dictionary_id = db_manager.save_compression_dictionary(dictionary, len(texts))
+    print(f"✓ Trained dictionary {dictionary_id}: {len(dictionary):,} bytes "
+          f"from {len(texts):,} samples in {time.perf_counter() - started:.2f} s")
+    return dictionary_id
+
+
+def migrate(db_manager: DatabaseManager, mode: str, batch_size: int,
+            dictionary_id: Optional[int], dry_run: bool):
+    """Re-encode every row with the requested mode and print a report."""
+    last_rowid = 0
+    rows_seen = rows_changed = 0
+    bytes_before = bytes_after = plain_bytes = 0
+    encode_seconds = decode_seconds = write_seconds = 0.0
+
+    while True:
+        with db_manager.reader.connect() as conn:
+            rows = conn.execute(
+                text("SELECT rowid, text FROM content_events WHERE rowid > :after ORDER BY rowid LIMIT :n"),
+                {"after": last_rowid, "n": batch_size},
+            ).all()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+
+        updates = []
+        for rowid, stored in rows:
+            rows_seen += 1
+            before = stored_size(stored)
+            bytes_before += before
+
+            started = time.perf_counter()
+            plain = text_codec.decompress_text(stored)
+            decode_seconds += time.perf_counter() - started
+            plain_bytes += len(plain.encode("utf-8"))
+
+            started = time.perf_counter()
+            encoded = plain if mode == text_codec.MODE_OFF else text_codec.compress_text(plain, mode, dictionary_id)
+            encode_seconds += time.perf_counter() - started
+
+            bytes_after += stored_size(encoded)
+            if type(encoded) is not type(stored) or encoded != stored:
+                updates.append({"rowid": rowid, "text": encoded})
+
+        if updates and not dry_run:
+            started = time.perf_counter()
+            with db_manager.engine.begin() as conn:
+                conn.execute(text("UPDATE content_events SET text = :text WHERE rowid = :rowid"), updates)
+            write_seconds += time.perf_counter() - started
+        rows_changed += len(updates)
+
+    plain_mb = plain_bytes / 1e6 or 1e-9
+    print(f"\n📊 Compression report ({mode}{' dry run' if dry_run else ''})")
+    print(f"  Rows scanned:        {rows_seen:,}")
+    print(f"  Rows rewritten:      {rows_changed:,}")
+    print(f"  Uncompressed text:   {plain_bytes / 1e6:,.2f} MB")
+    print(f"  Stored before:       {bytes_before / 1e6:,.2f} MB")
+    print(f"  Stored after:        {bytes_after / 1e6:,.2f} MB")
+    if bytes_after:
+        print(f"  Compression ratio:   {plain_bytes / bytes_after:.2f}x (plain / stored)")
+    print(f"  Encode overhead:     {encode_seconds * 1000 / plain_mb:,.1f} ms per MB")
+    print(f"  Decode overhead:     {decode_seconds * 1000 / plain_mb:,.1f} ms per MB")
+    if not dry_run:
+        print(f"  Update time:         {write_seconds:,.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress content_events.text in place")
+    parser.add_argument('--db-path', type=str, help='Database path (default: data/astra.db)')
+    parser.add_argument('--mode', choices=['zlib', 'dict', 'off'], default='zlib',
+                        help='Target encoding (off restores plain text)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+    parser.add_argument('--train-dict', action='store_true', help='Train a new shared dictionary first')
+    parser.add_argument('--samples', type=int, default=5000, help='Rows sampled for dictionary training')
+    parser.add_argument('--dict-id', type=int, help='Existing dictionary to use in dict mode')
+    parser.add_argument('--min-bytes', type=int, help='Leave values shorter than this uncompressed')
+    parser.add_argument('--report', action='store_true', help='Only report; do not modify rows')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(db_path=args.db_path)
+    if args.min_bytes is not None:
+        text_codec.configure(min_bytes=args.min_bytes)
+
+    dictionary_id = args.dict_id
+    if args.mode == text_codec.MODE_DICT:
+        if args.train_dict:
+            dictionary_id = train(db_manager, args.samples)
+        dictionary_id = (dictionary_id or text_codec.settings()["dictionary_id"]
+                         or db_manager.latest_compression_dictionary_id())
+        if dictionary_id is None:
+            parser.error("dict mode needs --train-dict or an existing --dict-id")
+
+    migrate(db_manager, args.mode, args.batch_size, dictionary_id, dry_run=args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Bulk export of analytics records or content events straight from the database.
+
+Streams rows through a server-side cursor and writes them batch by batch, so
+memory use stays constant for exports of any size. Parquet and Arrow IPC
+output require pyarrow.
+
+Usage:
+    python tools/scripts/export_data.py --dataset analytics --format csv --output records.csv
+    python tools/scripts/export_data.py --dataset content --format parquet --since 2024-01-01 \\
+        --label AI --output ai-events.parquet
+    python tools/scripts/export_data.py --format ndjson --gzip > records.ndjson.gz
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+
+from sharding import ShardSet
+from export import EXPORT_BATCH_SIZE, EXPORT_DATASETS, EXPORT_FORMATS, export_stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream analytics records or content events to a file")
+    parser.add_argument('--dataset', choices=EXPORT_DATASETS, default='analytics',
+                        help='analytics (analytics_records) or content (content_events)')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson', help='Output format')
+    parser.add_argument('--gzip', action='store_true', help='Gzip-compress the output')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Only rows with timestamp >= SINCE (ISO 8601)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Only rows with timestamp < UNTIL (ISO 8601)')
+    parser.add_argument('--label', type=str, help='Only rows with this detection label')
+    parser.add_argument('--source', type=str, help='Only rows from this source')
+    parser.add_argument('--output', '-o', type=str, help='Output file (default: stdout)')
+    parser.add_argument('--db-path', type=str, help='Database path (default: data/astra.db)')
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE, help='Rows fetched per batch')
+    args = parser.parse_args()
+
+    shards = ShardSet(args.db_path)  # all shard files, merged in timestamp order (ASTRA_DB_SHARDS)
+    try:
+        chunks = export_stream([manager.streamer for manager in shards.managers], args.dataset, args.format,
+                               args.gzip, args.since, args.until, args.label, args.source, args.batch_size)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    written = 0
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"✓ Exported {args.dataset} as {args.format}{' (gzip)' if args.gzip else ''}: "
+          f"{written / 1e6:,.1f} MB in {elapsed:.2f} s ({written / 1e6 / max(elapsed, 1e-9):,.1f} MB/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Move content and analytics rows to their shard after the shard count changed.
+
+Rows live in the shard chosen by a hash of their event id modulo the shard
+count (see `data/schemas/sharding.py`), so changing `ASTRA_DB_SHARDS`
+leaves most existing rows in the wrong file. This script walks every
+existing shard file, moves `analytics_records`, `content_sightings` and
+`content_events` rows whose shard differs under the new count, and then
+rebuilds the analytics aggregates of the shards that changed.
+
+Rows are copied to the target shard before they are deleted from the source,
+batch by batch, so an interrupted run can simply be repeated: events and
+records already copied are skipped (sightings, which get new ids in the
+target file, may be copied twice for the interrupted batch). Stop the
+services first: rows written while they move may land in or be read from
+the wrong shard.
+
+Rebuilt aggregates only cover the records still present; rollup and sketch
+buckets kept past raw-record retention are lost on the shards that changed.
+Shard files past the new count are left empty and can be deleted.
+
+Usage:
+    # Grow from the current number of shard files to 4
+    python tools/scripts/rebalance_shards.py --shards 4
+
+    # Report what would move without changing anything
+    python tools/scripts/rebalance_shards.py --shards 4 --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+sys.path.insert(0, os.path.join(workspace_root, 'services', 'risk-analytics'))
+
+from sqlalchemy import literal_column, select
+
+from database import DatabaseManager, AnalyticsRecordDB, ContentEventDB, ContentSightingDB, default_db_path
+from sharding import shard_index, shard_paths
+import aggregates
+
+# table, routing column, copy the primary key (False: renumbered in the target file)
+# Analytics records move first so outbox consumers of the target shard find
+# the moved events already scored.
+MOVES = [
+    (AnalyticsRecordDB.__table__, "event_id", True),
+    (ContentSightingDB.__table__, "event_id", False),
+    (ContentEventDB.__table__, "id", True),
+]
+
+
+def existing_shard_count(base_path: str) -> int:
+    """Number of consecutive shard files present next to ``base_path``."""
+    count = 1
+    while os.path.exists(shard_paths(base_path, count + 1)[-1]):
+        count += 1
+    return count
+
+
+def move_table(source: DatabaseManager, targets, table, key: str, keep_id: bool, source_index: int,
+               batch_size: int, dry_run: bool):
+    """
+    Move the rows of one table out of ``source`` that belong to another shard.
+
+    Returns:
+        rows moved per target shard index
+    """
+    rowid = literal_column(f"{table.name}.rowid")
+    moved = {}
+    last = 0
+    while True:
+        with source.reader.connect() as conn:
+            rows = conn.execute(
+                select(rowid.label("_rowid"), table).where(rowid > last).order_by(rowid).limit(batch_size)
+            ).mappings().all()
+        if not rows:
+            break
+        last = rows[-1]["_rowid"]
+
+        parts = {}
+        for row in rows:
+            index = shard_index(row[key], len(targets))
+            if index != source_index:
+                parts.setdefault(index, []).append(row)
+        for index, part in parts.items():
+            moved[index] = moved.get(index, 0) + len(part)
+            if dry_run:
+                continue
+            values = [
+                {name: value for name, value in row.items() if name != "_rowid" and (keep_id or name != "id")}
+                for row in part
+            ]
+            with targets[index].engine.begin() as conn:
+                conn.execute(table.insert().prefix_with("OR IGNORE"), values)
+            with source.engine.begin() as conn:
+                conn.execute(table.delete().where(rowid.in_([row["_rowid"] for row in part])))
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move rows to their shard after changing ASTRA_DB_SHARDS")
+    parser.add_argument('--shards', type=int, required=True, help='New shard count')
+    parser.add_argument('--db-path', type=str, help='Shard 0 database path (default: data/astra.db)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows read and moved per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would move')
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+
+    base_path = os.path.abspath(args.db_path or default_db_path())
+    current = existing_shard_count(base_path)
+    paths = shard_paths(base_path, max(current, args.shards))
+    managers = [DatabaseManager(path) for path in paths]
+    targets = managers[:args.shards]
+    print(f"Rebalancing {current} shard file(s) to {args.shards}{' (dry run)' if args.dry_run else ''}")
+
+    started = time.perf_counter()
+    changed = set()
+    for table, key, keep_id in MOVES:
+        total = 0
+        for source_index, source in enumerate(managers):
+            moved = move_table(source, targets, table, key, keep_id, source_index, args.batch_size, args.dry_run)
+            if moved and table is AnalyticsRecordDB.__table__:
+                changed.update([source_index, *moved])
+            total += sum(moved.values())
+        print(f"✓ {table.name}: {total:,} rows {'to move' if args.dry_run else 'moved'}")
+
+    if not args.dry_run:
+        for index in sorted(changed):
+            with managers[index].engine.begin() as conn:
+                aggregates.rebuild_stats(conn)
+                aggregates.rebuild_rollups(conn)
+                aggregates.rebuild_sketches(conn)
+        if changed:
+            print(f"✓ Rebuilt analytics aggregates on shard(s) {', '.join(map(str, sorted(changed)))}")
+    if len(managers) > args.shards:
+        print(f"Shard files past the new count are now empty: {', '.join(paths[args.shards:])}")
+    print(f"Done in {time.perf_counter() - started:.2f} s; set ASTRA_DB_SHARDS={args.shards} for the services")
+
+
+if __name__ == "__main__":
+    main()
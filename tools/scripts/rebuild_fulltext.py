@@ -0,0 +1,45 @@
+"""
+Rebuild and optimize the full-text index over `content_events`.
+
+The ingestion database keeps `content_fts` in sync through triggers and
+builds it automatically the first time it opens a database without one.
+Run this after a full ``VACUUM`` (which may renumber the rowids the index is
+keyed by), after restoring `content_events` from a backup, or after a large
+ingest to merge the index segments.
+
+Usage:
+    python tools/scripts/rebuild_fulltext.py
+    python tools/scripts/rebuild_fulltext.py --db-path /path/to/astra.db --optimize-only
+"""
+import argparse
+import os
+import sys
+import time
+
+workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(workspace_root, 'data', 'schemas'))
+
+from sharding import ShardSet
+import fulltext
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the content_events full-text index")
+    parser.add_argument('--db-path', type=str, help='Database path (default: data/astra.db)')
+    parser.add_argument('--optimize-only', action='store_true',
+                        help='Only merge index segments, without re-reading content_events')
+    args = parser.parse_args()
+
+    shards = ShardSet(args.db_path)  # every shard file has its own index (ASTRA_DB_SHARDS)
+    started = time.perf_counter()
+    for db_manager in shards.managers:
+        with db_manager.engine.begin() as conn:
+            if not args.optimize_only:
+                fulltext.rebuild(conn)
+            fulltext.optimize(conn)
+    action = "Optimized" if args.optimize_only else "Rebuilt and optimized"
+    print(f"✓ {action} {fulltext.FTS_TABLE} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()